@@ -21,6 +21,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.RequestProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -34,7 +35,9 @@ ROOT_URLCONF = 'FPLManager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the Django backend, timing each render for the request profile
+        'BACKEND': 'main.template_backend.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'FPLManager', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -46,7 +49,7 @@ TEMPLATES = [
                 'FPLManager.context_processors.add_login_modal',
             ],
             'libraries':{
-                'getattribute': 'main.templatetags.getattribute'
+                'player_rows': 'main.templatetags.player_rows',
             }
         },
     },
@@ -87,11 +90,208 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'FPLManager', 'static'),
 ]
 
+# FPL_STATIC_BUILD=local collects hashed, precompressed files into STATIC_ROOT and serves them from the app.
+# Otherwise production uploads them to S3 (see settings_prod). Either way collectstatic only picks up the
+# project files referenced by the templates, not the unminified copies and source maps next to them.
+STATIC_BUILD = os.environ.get('FPL_STATIC_BUILD', '')
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+# for static files without a content hash in their name, which keep it across deploys
+UNHASHED_STATIC_MAX_AGE = 60
+STATICFILES_FINDERS = [
+    'main.staticfiles.ReferencedFileSystemFinder',
+    'main.staticfiles.ReferencedAppDirectoriesFinder',
+]
+
+if STATIC_BUILD == 'local':
+    STATICFILES_STORAGE = 'custom_storages.LocalStaticStorage'
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'main.middleware.PrecompressedStaticMiddleware')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR
 
 # SESSION LENGTH
 SESSION_COOKIE_AGE = 3600
+
+# SESSION STORAGE
+# FPL_SESSION_CACHE selects the cache that sits in front of the sessions table:
+#   'redis'  - shared Redis compatible server at REDIS_URL, use this when running more than one worker
+#   'locmem' - per process memory, only safe with a single worker (default in development)
+#   'db'     - no cache, every request reads the sessions table
+# Cached sessions are written through to the database, so sessions created before the cache was enabled
+# (or evicted from it) are still read from the sessions table and nobody is logged out.
+# Only 'redis' takes the sessions query off every request in production: without REDIS_URL production falls
+# back to 'db', which still costs a query per request, and `warm_session_cache` only fills the redis cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+SESSION_CACHE = os.environ.get(
+    'FPL_SESSION_CACHE', 'redis' if REDIS_URL else ('db' if os.environ.get('IS_PROD') else 'locmem'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+if SESSION_CACHE == 'redis':
+    CACHES['sessions'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': SESSION_COOKIE_AGE,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 2,
+            'SOCKET_TIMEOUT': 2,
+            # fall back to the database if the cache server is unavailable
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+elif SESSION_CACHE == 'locmem':
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'TIMEOUT': SESSION_COOKIE_AGE,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+
+if 'sessions' in CACHES:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessions'
+
+# UPSTREAM RESPONSE CACHE
+# persistent cache for public FPL API responses (see main/entry_cache.py), shared by every worker.
+# the database backend needs `python manage.py createcachetable`
+if REDIS_URL:
+    CACHES['upstream'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'upstream',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 2,
+            'SOCKET_TIMEOUT': 2,
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+else:
+    CACHES['upstream'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'upstream_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+
+# UPSTREAM APIS
+# the FPL API and its login service, pointed at the local stand-in for load tests (see settings_loadtest)
+FPL_API_URL = os.environ.get('FPL_API_URL', 'https://fantasy.premierleague.com')
+FPL_LOGIN_URL = os.environ.get('FPL_LOGIN_URL', 'https://users.premierleague.com/accounts/login/')
+
+# SIMULATION WORKERS
+# the optimiser runs in SIMULATION_WORKERS separate processes (see main/workers.py), 0 runs it in the request's
+# own thread, the default under gunicorn's sync workers.
+SIMULATION_WORKERS = int(os.environ.get('FPL_SIMULATION_WORKERS', 0))
+
+# SIMULATION API
+# scripts call /api/v1/simulate/ with `Authorization: Bearer <token>`, one of the comma separated
+# FPL_SIMULATION_API_TOKENS, the site's own pages with their session (see main/api_auth.py).
+SIMULATION_API_TOKENS = [t.strip() for t in os.environ.get('FPL_SIMULATION_API_TOKENS', '').split(',') if t.strip()]
+# each token or session (or address, without one) gets SIMULATION_RATE_LIMIT simulations every
+# SIMULATION_RATE_WINDOW seconds, counted in the upstream cache so the limit holds across workers
+# (see main/throttle.py).
+SIMULATION_RATE_LIMIT = int(os.environ.get('FPL_SIMULATION_RATE_LIMIT', 10))
+SIMULATION_RATE_WINDOW = int(os.environ.get('FPL_SIMULATION_RATE_WINDOW', 60))
+
+# INGEST METRICS
+# every ingest stage is logged as a line of JSON, and the latest run of each is served to Prometheus at
+# /metrics/ (see main/ingest_metrics.py) with `Authorization: Bearer <FPL_METRICS_TOKEN>`. Without a token it's
+# only served when DEBUG is on.
+METRICS_TOKEN = os.environ.get('FPL_METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'main': {
+            'handlers': ['console'],
+            'level': os.environ.get('FPL_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# REQUEST PROFILING
+# every response gets a Server-Timing header breaking its time down into db, http, template, pulp_build,
+# cbc_solve and lineup (see main/middleware.py). SLOW_REQUEST_SAMPLE_RATE of the requests slower than
+# SLOW_REQUEST_MS are logged as JSON to main.slow_requests, written to FPL_SLOW_REQUEST_LOG if it is set.
+SLOW_REQUEST_MS = float(os.environ.get('FPL_SLOW_REQUEST_MS', 1000))
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get('FPL_SLOW_REQUEST_SAMPLE_RATE', 1.0))
+SLOW_REQUEST_LOG = os.environ.get('FPL_SLOW_REQUEST_LOG')
+
+if SLOW_REQUEST_LOG:
+    LOGGING['handlers']['slow_requests'] = {
+        'class': 'logging.handlers.WatchedFileHandler',
+        'filename': SLOW_REQUEST_LOG,
+    }
+    LOGGING['loggers']['main.slow_requests'] = {
+        'handlers': ['slow_requests'],
+        'level': 'INFO',
+        'propagate': False,
+    }
+
+# SOLVE CAPTURE
+# solves taking longer than SLOW_SOLVE_MS to build and solve (and infeasible ones, unless
+# FPL_CAPTURE_INFEASIBLE_SOLVES=0) are stored with their model and inputs for `python manage.py replay_solves`.
+# Only the latest SOLVE_CAPTURE_LIMIT are kept. Every ingest deletes the solves' records (for the latency
+# dashboard) older than SOLVE_RECORD_DAYS, and all but the latest SOLVE_RECORD_LIMIT of them.
+SLOW_SOLVE_MS = float(os.environ.get('FPL_SLOW_SOLVE_MS', 2000))
+CAPTURE_INFEASIBLE_SOLVES = os.environ.get('FPL_CAPTURE_INFEASIBLE_SOLVES', '1') != '0'
+SOLVE_CAPTURE_LIMIT = int(os.environ.get('FPL_SOLVE_CAPTURE_LIMIT', 200))
+SOLVE_RECORD_DAYS = int(os.environ.get('FPL_SOLVE_RECORD_DAYS', 30))
+SOLVE_RECORD_LIMIT = int(os.environ.get('FPL_SOLVE_RECORD_LIMIT', 5000))
+
+# EXPECTED POINTS PROJECTION
+# ep_projected is each player's expected points over the next PROJECTION_GAMEWEEKS, worked out from
+# their stats and the fixtures of each gameweek on every ingest (see main/projection.py).
+PROJECTION_GAMEWEEKS = int(os.environ.get('FPL_PROJECTION_GAMEWEEKS', 5))
+
+# MONTE CARLO SIMULATION
+# squads' points next gameweek are sampled over MONTE_CARLO_SCENARIOS scenarios, split across the simulation
+# workers in chunks of at least MONTE_CARLO_CHUNK_MIN (see main/montecarlo.py). A risk-aware simulation
+# maximises a blend of expected points and the CVaR (the mean of the worst RISK_ALPHA share) of the squad's
+# points over RISK_SCENARIOS scenarios, which each become a constraint of the optimiser's model, over the
+# RISK_CANDIDATES best players of each position by expected points and by value.
+MONTE_CARLO_SCENARIOS = int(os.environ.get('FPL_MONTE_CARLO_SCENARIOS', 10000))
+MONTE_CARLO_CHUNK_MIN = int(os.environ.get('FPL_MONTE_CARLO_CHUNK_MIN', 2000))
+RISK_SCENARIOS = int(os.environ.get('FPL_RISK_SCENARIOS', 100))
+RISK_ALPHA = float(os.environ.get('FPL_RISK_ALPHA', 0.2))
+RISK_CANDIDATES = int(os.environ.get('FPL_RISK_CANDIDATES', 15))
+
+# PRICE CHANGE TRACKER
+# every ingest and `python manage.py track_prices` (schedule it more often than the ingest) records a tick of
+# every player's transfers (see main/price_tracker.py). FPL doesn't publish its price algorithm: a change is
+# predicted once the net transfers since a player's last change reach PRICE_CHANGE_THRESHOLD of their owners
+# (and at least PRICE_CHANGE_MIN_TRANSFERS), projecting the last PRICE_RATE_HOURS of transfers forward to
+# PRICE_CHANGE_HOUR (UTC), when FPL makes the day's changes. Ticks of the last PRICE_TICK_GAMEWEEKS are kept.
+PRICE_CHANGE_THRESHOLD = float(os.environ.get('FPL_PRICE_CHANGE_THRESHOLD', 0.05))
+PRICE_CHANGE_MIN_TRANSFERS = int(os.environ.get('FPL_PRICE_CHANGE_MIN_TRANSFERS', 5000))
+PRICE_RATE_HOURS = float(os.environ.get('FPL_PRICE_RATE_HOURS', 6))
+PRICE_CHANGE_HOUR = int(os.environ.get('FPL_PRICE_CHANGE_HOUR', 1))
+PRICE_TICK_GAMEWEEKS = int(os.environ.get('FPL_PRICE_TICK_GAMEWEEKS', 3))
+
+# MINI-LEAGUES
+# the effective ownership of a classic league is worked out from the squads of its LEAGUE_MAX_ENTRIES highest
+# ranked members, fetched LEAGUE_CRAWL_WORKERS at a time (shared by every request) within the FPL rate limit,
+# see main/league.py.
+LEAGUE_MAX_ENTRIES = int(os.environ.get('FPL_LEAGUE_MAX_ENTRIES', 100))
+LEAGUE_CRAWL_WORKERS = int(os.environ.get('FPL_LEAGUE_CRAWL_WORKERS', 8))
+
 TEMPLATE_STRING_IF_INVALID = ''
 
 ##########################################################################
@@ -0,0 +1,22 @@
+"""
+LOAD TEST SETTINGS
+Development settings served over plain HTTP, with every FPL API call sent to the local
+stand-in started by `python manage.py fpl_standin`. See `python manage.py loadtest --help`.
+"""
+import os
+from .settings_dev import *  # IMPORT DEV SETTINGS
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+FPL_API_URL = os.environ.get('FPL_API_URL', 'http://127.0.0.1:8100')
+FPL_LOGIN_URL = FPL_API_URL + '/accounts/login/'
+
+SECURE_SSL_REDIRECT = False
+SECURE_HSTS_SECONDS = 0
+CSRF_COOKIE_SECURE = False
+SESSION_COOKIE_SECURE = False
+
+# the virtual users simulate far more often than people do
+SIMULATION_RATE_LIMIT = int(os.environ.get('FPL_SIMULATION_RATE_LIMIT', 1000000))
@@ -1,11 +1,98 @@
 # custom_storages.py
+import gzip
+import mimetypes
+
 from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, StaticFilesStorage
+from django.core.files.base import ContentFile
 from storages.backends.s3boto3 import S3Boto3Storage
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class PrecompressedManifestMixin(ManifestFilesMixin):
+    """Adds content hashes to static file names and writes .gz and .br copies of text files.
+
+    Hashed names change whenever a file's content does, so they can be cached forever.
+    """
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.ttf', '.eot')
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def tolerant_converter(matchobj):
+            # leave references to files that aren't shipped (e.g. the font-awesome webfonts) untouched
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+        return tolerant_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for hashed_name in set(self.hashed_files.values()):
+                if hashed_name.endswith(self.compress_extensions):
+                    self.save_compressed(hashed_name)
+
+    def save_compressed(self, name):
+        with self.open(name) as f:
+            content = f.read()
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+class StaticStorage(PrecompressedManifestMixin, S3Boto3Storage):
+    """Uploads the collected static files to S3.
+
+    Only the files written while post-processing (the hashed names and their compressed
+    copies) are cached forever. The unhashed originals uploaded before them and the
+    manifest keep their names across deploys, so they get UNHASHED_STATIC_MAX_AGE.
+    """
+    location = getattr(settings, 'STATICFILES_LOCATION', 'static')
+    object_parameters = {
+        'CacheControl': 'public, max-age={}'.format(settings.UNHASHED_STATIC_MAX_AGE),
+    }
+    hashed_object_parameters = {
+        'CacheControl': 'public, max-age={}, immutable'.format(settings.STATIC_MAX_AGE),
+    }
+    hashing = False
+
+    def post_process(self, *args, **kwargs):
+        self.hashing = True
+        try:
+            yield from super().post_process(*args, **kwargs)
+        finally:
+            self.hashing = False
+
+    def _save_content(self, obj, content, parameters):
+        if self.hashing and obj.key != self._normalize_name(self.manifest_name):
+            parameters = dict(parameters, **self.hashed_object_parameters)
+        # S3 can't negotiate encodings, the precompressed copies are for a CDN sat in front of the bucket
+        if obj.key.endswith('.br'):
+            parameters = dict(parameters, ContentEncoding='br', ContentType=self._content_type(obj.key[:-3]))
+        return super()._save_content(obj, content, parameters)
+
+    def _content_type(self, name):
+        return mimetypes.guess_type(name)[0] or self.default_content_type
+
 
-class StaticStorage(S3Boto3Storage):
-    location = settings.STATICFILES_LOCATION
+class LocalStaticStorage(PrecompressedManifestMixin, StaticFilesStorage):
+    # local stand-in for StaticStorage, files are written to STATIC_ROOT and served by PrecompressedStaticMiddleware
+    pass
 
 
 class MediaStorage(S3Boto3Storage):
-    location = settings.MEDIAFILES_LOCATION
+    location = getattr(settings, 'MEDIAFILES_LOCATION', 'media')
@@ -1,5 +1,13 @@
+from datetime import timedelta
+
 from django.contrib import admin
-from .models import Player, Team
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from pulp import LpStatus
+
+from .models import Fixture, Player, Team, SolveCapture, SolveRecord
+from .solver_telemetry import PERCENTILES, TIMINGS, solve_latency_summary
 
 @admin.register(Player)
 class PlayerAdmin(admin.ModelAdmin):
@@ -8,3 +16,68 @@ class PlayerAdmin(admin.ModelAdmin):
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
     readonly_fields = ('updated',)
+
+@admin.register(Fixture)
+class FixtureAdmin(admin.ModelAdmin):
+    list_display = ('fixture_id', 'event', 'kickoff_time', 'team_h', 'team_a', 'team_h_difficulty', 'team_a_difficulty', 'finished')
+    list_filter = ('event', 'finished')
+    readonly_fields = ('updated',)
+
+@admin.register(SolveRecord)
+class SolveRecordAdmin(admin.ModelAdmin):
+    list_display = ('created', 'opt_param', 'mode', 'num_subs', 'include_count', 'exclude_count',
+                    'build_ms', 'solve_ms', 'status_name', 'objective')
+    list_filter = ('mode', 'opt_param', 'status')
+    date_hierarchy = 'created'
+    change_list_template = 'admin/main/solverecord/change_list.html'
+    # default window of the latency dashboard, ?days= overrides it
+    DASHBOARD_DAYS = 7
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def build_ms(self, obj):
+        return round(obj.build_time * 1000, 1)
+    build_ms.short_description = 'build (ms)'
+
+    def solve_ms(self, obj):
+        return round(obj.solve_time * 1000, 1)
+    solve_ms.short_description = 'solve (ms)'
+
+    def status_name(self, obj):
+        return LpStatus.get(obj.status, obj.status)
+    status_name.short_description = 'status'
+
+    def get_urls(self):
+        return [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='main_solverecord_dashboard'),
+        ] + super().get_urls()
+
+    def dashboard_view(self, request):
+        try:
+            days = max(1, int(request.GET.get('days', self.DASHBOARD_DAYS)))
+        except ValueError:
+            days = self.DASHBOARD_DAYS
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Solver latency',
+            opts=self.model._meta,
+            days=days,
+            timings=TIMINGS,
+            percentiles=PERCENTILES,
+            summary=solve_latency_summary(timezone.now() - timedelta(days=days)),
+        )
+        return TemplateResponse(request, 'admin/main/solverecord/dashboard.html', context)
+
+@admin.register(SolveCapture)
+class SolveCaptureAdmin(admin.ModelAdmin):
+    list_display = ('created', 'reason', 'solve')
+    list_filter = ('reason',)
+    list_select_related = ('solve',)
+    readonly_fields = ('solve', 'created', 'reason', 'inputs')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,46 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+
+
+def _bearer_token(request):
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else ''
+
+
+def api_client(request):
+    """Identifies the caller of a JSON API view, or returns None if it can't be trusted.
+
+    Scripts send one of SIMULATION_API_TOKENS as `Authorization: Bearer <token>`. The site's
+    own pages are identified by their session (or address, without one) and must send
+    X-Requested-With, which jQuery adds and which another site can't send without a CORS
+    preflight, so a forged cross-site request is refused without needing a CSRF token.
+    """
+    token = _bearer_token(request)
+    if token:
+        for i, known in enumerate(settings.SIMULATION_API_TOKENS):
+            if constant_time_compare(token, known):
+                return 'token:{}'.format(i)
+        return None
+    if request.is_ajax():
+        return 'session:{}'.format(request.session.session_key or request.META.get('REMOTE_ADDR', ''))
+    return None
+
+
+def api_view(view):
+    """Exempts a JSON API view from CSRF and authenticates it with api_client instead, answering 401 otherwise.
+
+    The caller is kept as request.api_client, e.g. for throttle_simulations.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.api_client = api_client(request)
+        if request.api_client is None:
+            response = JsonResponse({'error': 'Authentication required.'}, status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        return view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
@@ -0,0 +1,209 @@
+import copy
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from importlib import import_module
+
+import django
+import pulp
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .fpl import PlayerTable
+from .fplstatistics import FplStatistics
+from .http_client import fpl_client
+from .lineup import Lineup
+from .models import Player, Team
+from .opt import Opt
+from .records import records_from_models
+from .upstream_fixtures import replaying
+from .views import receive_sim_form, update_players, update_teams
+
+REPORT_VERSION = 1
+
+DEFAULT_PARAM = 'ep_next'
+DEFAULT_BUDGET = 100.0
+TRANSFER_SUBS = 2
+
+
+def measure(func, repeat, number=1, setup=None):
+    """Times func, returning summary statistics of the seconds per call.
+
+    setup is called before each of the repeat runs and its return value passed to func,
+    so work like copying the input isn't timed.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'repeat': repeat,
+        'number': number,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+    }
+
+
+def rolled_back(func):
+    # runs func in a savepoint that is always rolled back, so every repeat starts from the same data
+    def wrapper(*args):
+        with transaction.atomic():
+            func(*args)
+            transaction.set_rollback(True)
+    return wrapper
+
+
+def _update_changed_players():
+    # replaying the same payloads leaves every row unchanged, so first make the most volatile stats differ
+    Player.objects.update(
+        selected_by_percent=F('selected_by_percent') + 1,
+        transfers_in_event=F('transfers_in_event') + 1,
+        transfers_out_event=F('transfers_out_event') + 1,
+        form=F('form') + 1,
+    )
+    update_players()
+
+
+def _simulation_request(squad, num_subs):
+    request = RequestFactory().post(
+        reverse('receive_sim_form'),
+        {
+            'action': 'post',
+            'selected': json.dumps({
+                'opt_param': DEFAULT_PARAM,
+                'max_budget': DEFAULT_BUDGET,
+                'num_subs': num_subs,
+                'include': None,
+                'exclude': None,
+            }),
+        },
+        HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+    )
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.session['squad'] = squad
+    return request
+
+
+def _simulate(squad, num_subs):
+    response = receive_sim_form(_simulation_request(squad, num_subs))
+    if response.status_code != 200:
+        raise RuntimeError('receive_sim_form failed: {}'.format(response.content))
+
+
+def _solve(sim):
+    sim.prob.solve()
+
+
+def run_benchmarks(fixtures_dir, repeat=5, only=None):
+    """Runs every benchmark against the payloads recorded in fixtures_dir and returns the results by name.
+
+    The recorded data is ingested first so the optimiser has players to choose from,
+    and all database changes are rolled back at the end.
+    """
+    results = {}
+
+    def run(name, *args, **kwargs):
+        if not only or any(name.startswith(prefix) for prefix in only):
+            results[name] = measure(*args, **kwargs)
+
+    # every simulation comes from one address, so lift the rate limit in case the view is throttled
+    simulation_settings = override_settings(SIMULATION_WORKERS=0, SIMULATION_RATE_LIMIT=sys.maxsize)
+    with replaying(fixtures_dir), simulation_settings, transaction.atomic():
+        update_players()
+        update_teams()
+
+        # ingest
+        raw_table = fpl_client.get_json('bootstrap_static', PlayerTable.PLAYER_TABLE_URL)['elements']
+        teams = list(Team.objects.all())
+        fpl_statistics = FplStatistics()
+
+        def player_table():
+            table = PlayerTable.__new__(PlayerTable)
+            table.teams = teams
+            table.table = copy.deepcopy(raw_table)
+            table.fpl_statistics = fpl_statistics
+            return (table,)
+
+        run('ingest.process_table', PlayerTable.process_table, repeat, setup=player_table)
+        run('ingest.update_players', rolled_back(update_players), repeat)
+        run('ingest.update_players.changed', rolled_back(_update_changed_players), repeat)
+        run('ingest.update_teams', rolled_back(update_teams), repeat)
+
+        # optimiser, the wildcard squad doubles as the current squad for the transfer cases
+        wildcard = Opt(DEFAULT_PARAM, DEFAULT_BUDGET, [])
+        current_team = records_from_models(wildcard.results)
+        transfers = Opt(DEFAULT_PARAM, DEFAULT_BUDGET, current_team, TRANSFER_SUBS)
+
+        run('opt.wildcard', Opt, repeat, setup=lambda: (DEFAULT_PARAM, DEFAULT_BUDGET, []))
+        run('opt.wildcard.solve', _solve, repeat, setup=lambda: (wildcard,))
+        run('opt.transfers', Opt, repeat, setup=lambda: (DEFAULT_PARAM, DEFAULT_BUDGET, current_team, TRANSFER_SUBS))
+        run('opt.transfers.solve', _solve, repeat, setup=lambda: (transfers,))
+
+        # lineup selection
+        run('lineup.choose_optimal_lineup', lambda: Lineup(current_team, DEFAULT_PARAM).choose_optimal_lineup(),
+            repeat, number=100)
+
+        # end to end simulation, as posted by the transfers and wildcard pages
+        lineup = Lineup(current_team, DEFAULT_PARAM).choose_optimal_lineup()
+        sub_ids = {p.player_id for p in lineup['subs']}
+        squad = {
+            'picks': [[p.player_id, p.opt_cost, p.player_id in sub_ids] for p in current_team],
+            'bank': 0.0,
+        }
+        run('views.receive_sim_form.wildcard', _simulate, repeat, setup=lambda: (squad, None))
+        run('views.receive_sim_form.transfers', _simulate, repeat, setup=lambda: (squad, TRANSFER_SUBS))
+
+        transaction.set_rollback(True)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(results, fixtures_dir):
+    return {
+        'report_version': REPORT_VERSION,
+        'created': timezone.now().isoformat(),
+        'commit': _git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'pulp': getattr(pulp, 'VERSION', None),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'fixtures': os.path.abspath(fixtures_dir),
+        'results': results,
+    }
+
+
+def compare_reports(report, baseline):
+    """Returns (name, baseline median, median, relative change) for every benchmark in report."""
+    rows = []
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before:
+            rows.append((name, before['median'], result['median'], result['median'] / before['median'] - 1))
+        else:
+            rows.append((name, None, result['median'], None))
+    return rows
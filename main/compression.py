@@ -0,0 +1,51 @@
+from functools import wraps
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# responses smaller than this aren't worth compressing
+MIN_COMPRESS_LENGTH = 200
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(request):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return {e.split(';')[0].strip().lower() for e in accept_encoding.split(',')}
+
+
+def compress(request, response):
+    """Compresses the response body with Brotli or gzip depending on what the client accepts."""
+    if response.streaming or response.has_header('Content-Encoding') or len(response.content) < MIN_COMPRESS_LENGTH:
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encodings = accepted_encodings(request)
+
+    if brotli is not None and 'br' in encodings:
+        content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        encoding = 'br'
+    elif 'gzip' in encodings:
+        content = compress_string(response.content)
+        encoding = 'gzip'
+    else:
+        return response
+
+    if len(content) >= len(response.content):
+        return response
+
+    response.content = content
+    response['Content-Length'] = str(len(content))
+    response['Content-Encoding'] = encoding
+    return response
+
+
+def compress_response(view):
+    # decorator version of compress for individual views
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return compress(request, view(request, *args, **kwargs))
+    return wrapper
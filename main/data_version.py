@@ -0,0 +1,35 @@
+import time
+from django.db.models import Max
+from .models import Fixture, Player
+
+# how often (in seconds) each process checks the database for a newer ingest
+CHECK_INTERVAL = 30
+
+_state = {
+    'version': None,
+    'checked': 0.0,
+}
+
+
+def get_data_version():
+    """Returns a string identifying the latest player data ingest.
+
+    The value is derived from the most recent Player.updated or Fixture.updated timestamp
+    and is only re-read from the database every CHECK_INTERVAL seconds, so it is cheap
+    enough to call on every request and can be used to key anything derived from the
+    Player and Fixture tables.
+    """
+    now = time.monotonic()
+    if _state['version'] is None or now - _state['checked'] > CHECK_INTERVAL:
+        updated = [
+            model.objects.aggregate(latest=Max('updated'))['latest'] for model in (Player, Fixture)]
+        latest = max((u for u in updated if u is not None), default=None)
+        _state['version'] = latest.strftime('%Y%m%d%H%M%S%f') if latest else '0'
+        _state['checked'] = now
+    return _state['version']
+
+
+def refresh_data_version():
+    # forces the next get_data_version call to re-read the database, e.g. straight after an ingest
+    _state['version'] = None
+    return get_data_version()
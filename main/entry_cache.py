@@ -0,0 +1,110 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .http_client import fpl_client
+
+ENTRY_URL = settings.FPL_API_URL + '/api/entry/{}/'
+PICKS_URL = settings.FPL_API_URL + '/api/entry/{u_id}/event/{ev}/picks/'
+STANDINGS_URL = settings.FPL_API_URL + '/api/leagues-classic/{league_id}/standings/?page_standings={page}'
+
+GAMEWEEK_STATE_KEY = 'gameweek_state'
+
+# cache lifetimes in seconds
+ENTRY_MAX_TTL = 60 * 60 * 6
+# used when the gameweek state is unknown, or straight after a deadline while the game is updating
+ENTRY_SHORT_TTL = 60 * 5
+DEADLINE_UPDATE_WINDOW = 60 * 60 * 2
+# picks can't change once the gameweek's deadline has passed
+PICKS_TTL = 60 * 60 * 24 * 7
+FINISHED_PICKS_TTL = 60 * 60 * 24 * 30
+# standings move with every goal while a gameweek is being played
+STANDINGS_TTL = 60 * 5
+
+
+def upstream_cache():
+    return caches['upstream']
+
+
+def _timestamp(deadline_time):
+    return datetime.strptime(deadline_time, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
+
+
+def set_gameweek_state(events):
+    """Stores the current gameweek and the surrounding deadlines from bootstrap-static's events."""
+    current = next((e for e in events if e.get('is_current')), None)
+    upcoming = next((e for e in events if e.get('is_next')), None)
+    state = {
+        'current_event': current['id'] if current else None,
+        'current_finished': bool(current and current.get('finished')),
+        'current_deadline': _timestamp(current['deadline_time']) if current else None,
+        'next_deadline': _timestamp(upcoming['deadline_time']) if upcoming else None,
+    }
+    upstream_cache().set(GAMEWEEK_STATE_KEY, state, None)
+    return state
+
+
+def get_gameweek_state():
+    return upstream_cache().get(GAMEWEEK_STATE_KEY)
+
+
+def entry_ttl(state, now=None):
+    # an entry summary's current_event (and team value etc.) only moves on at a deadline
+    now = now or time.time()
+    if not state or not state['next_deadline']:
+        return ENTRY_SHORT_TTL
+    if state['current_deadline'] and now - state['current_deadline'] < DEADLINE_UPDATE_WINDOW:
+        return ENTRY_SHORT_TTL
+    until_deadline = state['next_deadline'] - now
+    if until_deadline <= 0:
+        return ENTRY_SHORT_TTL
+    return int(min(ENTRY_MAX_TTL, until_deadline))
+
+
+def picks_ttl(event, state):
+    if state and state['current_event'] and (event < state['current_event'] or state['current_finished']):
+        return FINISHED_PICKS_TTL
+    return PICKS_TTL
+
+
+def _cached_json(key, url, endpoint, is_valid, ttl):
+    cache = upstream_cache()
+    data = cache.get(key)
+    if data is None:
+        data = fpl_client.get_json(endpoint, url)
+        # errors (unknown ids, "the game is being updated") are never cached
+        if is_valid(data):
+            cache.set(key, data, ttl() if callable(ttl) else ttl)
+    return data
+
+
+def get_entry(unique_id):
+    return _cached_json(
+        'entry:{}'.format(unique_id),
+        ENTRY_URL.format(unique_id),
+        'entry',
+        lambda data: isinstance(data, dict) and 'current_event' in data,
+        lambda: entry_ttl(get_gameweek_state()),
+    )
+
+
+def get_entry_picks(unique_id, event):
+    return _cached_json(
+        'picks:{}:{}'.format(unique_id, event),
+        PICKS_URL.format(u_id=unique_id, ev=event),
+        'picks',
+        lambda data: isinstance(data, dict) and 'picks' in data,
+        lambda: picks_ttl(event, get_gameweek_state()),
+    )
+
+
+def get_league_standings(league_id, page=1):
+    return _cached_json(
+        'standings:{}:{}'.format(league_id, page),
+        STANDINGS_URL.format(league_id=league_id, page=page),
+        'standings',
+        lambda data: isinstance(data, dict) and 'standings' in data,
+        STANDINGS_TTL,
+    )
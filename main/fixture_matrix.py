@@ -0,0 +1,81 @@
+import numpy as np
+
+from .models import Fixture
+from .data_version import get_data_version
+
+LAST_GAMEWEEK = 38
+# the Fixture columns the matrix is built from, named as in the FPL fixtures feed
+FIELDS = ('event', 'team_h', 'team_a', 'team_h_difficulty', 'team_a_difficulty')
+
+
+class FixtureMatrix:
+    """Club x gameweek arrays of the number of fixtures each club plays and their mean difficulty.
+
+    Row i is the club with team id i and column j is gameweek j (row and column 0 are
+    unused), so a club's fixtures over any range of gameweeks is a slice. Blank and
+    double gameweeks and each club's opponents are worked out once up front. Fixtures
+    without a gameweek yet are left out.
+    """
+
+    def __init__(self, fixtures, version=None, num_teams=0):
+        # fixtures are dicts with the FIELDS of the FPL fixtures feed
+        self.version = version
+        scheduled = sorted((f for f in fixtures if f['event'] is not None), key=lambda f: f['event'])
+        self.teams = sorted({f['team_h'] for f in scheduled} | {f['team_a'] for f in scheduled})
+        num_teams = max([num_teams] + self.teams)
+
+        events = np.array([f['event'] for f in scheduled] * 2, dtype=int)
+        teams = np.array([f['team_h'] for f in scheduled] + [f['team_a'] for f in scheduled], dtype=int)
+        difficulties = np.array(
+            [f['team_h_difficulty'] for f in scheduled] + [f['team_a_difficulty'] for f in scheduled], dtype=float)
+        self.counts = np.zeros((num_teams + 1, LAST_GAMEWEEK + 1))
+        total_difficulty = np.zeros_like(self.counts)
+        np.add.at(self.counts, (teams, events), 1)
+        np.add.at(total_difficulty, (teams, events), difficulties)
+        self.difficulty = np.divide(
+            total_difficulty, self.counts, out=np.zeros_like(self.counts), where=self.counts > 0)
+
+        # (opponent, is_home, difficulty) of each club's fixtures in each gameweek
+        self.opponents = {}
+        for f in scheduled:
+            self.opponents.setdefault((f['team_h'], f['event']), []).append((f['team_a'], True, f['team_h_difficulty']))
+            self.opponents.setdefault((f['team_a'], f['event']), []).append((f['team_h'], False, f['team_a_difficulty']))
+
+        # clubs with no fixture or more than one in each gameweek
+        self.blank = {}
+        self.double = {}
+        for gameweek in range(1, LAST_GAMEWEEK + 1):
+            counts = self.counts[self.teams, gameweek]
+            blank = [team for team, count in zip(self.teams, counts) if count == 0]
+            double = [team for team, count in zip(self.teams, counts) if count > 1]
+            if blank:
+                self.blank[gameweek] = blank
+            if double:
+                self.double[gameweek] = double
+
+    @classmethod
+    def from_database(cls, version=None):
+        return cls(Fixture.objects.values(*FIELDS), version)
+
+    def window(self, gameweeks):
+        # the counts and difficulties of just these gameweeks, columns in the same order
+        return self.counts[:, gameweeks], self.difficulty[:, gameweeks]
+
+    def fixtures(self, team, gameweek):
+        return self.opponents.get((team, gameweek), [])
+
+    def ticker(self, gameweeks):
+        # each club's fixtures in each of the gameweeks, for a fixture ticker
+        return {team: [self.fixtures(team, gameweek) for gameweek in gameweeks] for team in self.teams}
+
+
+_matrix = None
+
+
+def get_fixture_matrix():
+    # rebuilds the matrix whenever a newer ingest is detected
+    global _matrix
+    version = get_data_version()
+    if _matrix is None or _matrix.version != version:
+        _matrix = FixtureMatrix.from_database(version)
+    return _matrix
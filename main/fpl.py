@@ -1,50 +1,68 @@
-import requests
-import json
 import unidecode
-from .models import Player, Team
+from django.conf import settings
+from .models import Fixture, Team
 from .fplstatistics import FplStatistics
+from .http_client import fpl_client
+from .ingest_metrics import ingest_stage
 
 class PlayerTable:
-    PLAYER_TABLE_URL = 'https://fantasy.premierleague.com/api/bootstrap-static/'
+    PLAYER_TABLE_URL = settings.FPL_API_URL + '/api/bootstrap-static/'
+    FIXTURES_URL = settings.FPL_API_URL + '/api/fixtures/'
 
     def __init__(self):
-        self.session = requests.Session()
-
         self.teams = Team.objects.all()
 
         self.table = self.get_player_table()
+        self.fixtures = self.get_fixtures()
         self.fpl_statistics = FplStatistics()
         self.process_table()
 
     def get_player_table(self):
-        master_table_s = self.session.get(self.PLAYER_TABLE_URL).text
-        master_table = json.loads(master_table_s)
+        with ingest_stage('bootstrap_static') as stage:
+            master_table = fpl_client.get_json('bootstrap_static', self.PLAYER_TABLE_URL)
+            stage.rows = len(master_table['elements'])
+        # gameweek info, used to decide how long upstream responses can be cached for
+        self.events = master_table['events']
+        # FPL managers, for the price change tracker's share of owners
+        self.total_players = master_table.get('total_players', 0)
         return master_table['elements']
 
+    def get_fixtures(self):
+        # every fixture of the season, used for the expected points projection
+        with ingest_stage('fixtures') as stage:
+            fixtures = fpl_client.get_json('fixtures', self.FIXTURES_URL)
+            stage.rows = len(fixtures)
+        return fixtures
+
     def process_table(self):
+        rows = len(self.table)
 
         # lookup player position i.e. G, D, M or F
-        self.add_player_positions()
+        with ingest_stage('player_positions', rows):
+            self.add_player_positions()
 
         # get team name from team_id
-        self.add_team_name()
+        with ingest_stage('team_names', rows):
+            self.add_team_name()
 
         # correct pricing on players. For example - where £5.0 is 50
-        self.correct_pricing_values()
+        with ingest_stage('pricing_values', rows):
+            self.correct_pricing_values()
 
         # this was a temporary fix for an issue with a player have None on ep_next and ep_this
         # might need to be developed into something more permanent
-        self.remove_nonetype()
+        with ingest_stage('remove_nonetype', rows):
+            self.remove_nonetype()
 
         # removes diacritical characters from players names to aid searching
-        self.add_raw_name()
-
-        # gets price change data from fplstatistics.com
-        self.get_price_change()
+        with ingest_stage('raw_names', rows):
+            self.add_raw_name()
 
-        self.get_top_50_count()
+        with ingest_stage('top_50_count', rows):
+            self.get_top_50_count()
 
-        self.get_kpi()
+        with ingest_stage('kpi', rows):
+            self.get_kpi()
 
     def get_kpi(self):
         for p in self.table:
@@ -66,17 +84,6 @@ class PlayerTable:
                     p['top_50_count'] = int(player_top_50_count[0])
                     break
 
-    def get_price_change(self):
-        for p in self.table:
-            player_found = False
-            for player_price_info in self.fpl_statistics.player_price_data:
-                if player_price_info[1] == p['web_name'] and player_price_info[2] == p['team_name']:
-                    player_found = True
-                    p['price_change'] = (float(player_price_info[8]) * 100) + float(player_price_info[11])
-                    break
-            if not player_found:
-                p['price_change'] = -300
-    
     def add_raw_name(self):
         for p in self.table:
             p['name_raw'] = unidecode.unidecode(p['web_name'])
@@ -90,9 +97,11 @@ class PlayerTable:
 
     def add_team_name(self):
         if self.teams:
+            teams = {t.team_id: t for t in self.teams}
             for p in self.table:
-                p['team_name'] = next((t.team_name for t in self.teams if str(p['team']) == t.team_id), None)
-                p['team_name_short'] = next((t.team_name_short for t in self.teams if str(p['team']) == t.team_id), None)
+                team = teams.get(p['team'])
+                p['team_name'] = team.team_name if team else None
+                p['team_name_short'] = team.team_name_short if team else None
 
     def add_player_positions(self):
         for p in self.table:
@@ -111,68 +120,41 @@ class PlayerTable:
 
 
 class TeamTable:
-    TEAM_TABLE_URL = 'https://fantasy.premierleague.com/api/bootstrap-static/'
-    PLAYER_TABLE_URL = 'https://fantasy.premierleague.com/api/bootstrap-static/'
-    PLAYER_INFO_URL_TEMPLATE = 'https://fantasy.premierleague.com/api/element-summary/{}/'
+    TEAM_TABLE_URL = settings.FPL_API_URL + '/api/bootstrap-static/'
 
     def __init__(self):
-        self.session = requests.Session()
-
-        self.players = Player.objects.all()
+        # written by the player ingest, unplayed ones in kick off order
+        self.fixtures = Fixture.objects.filter(finished=False, event__isnull=False).order_by(
+            'kickoff_time', 'fixture_id').values_list('team_h', 'team_a', 'team_h_difficulty', 'team_a_difficulty')
 
         self.table = self.get_team_table()
         self.process_table()
 
     def get_team_table(self):
-        team_table_s = self.session.get(self.TEAM_TABLE_URL).text
-        team_table = json.loads(team_table_s)
+        with ingest_stage('bootstrap_static') as stage:
+            team_table = fpl_client.get_json('bootstrap_static', self.TEAM_TABLE_URL)
+            stage.rows = len(team_table['teams'])
         return team_table['teams']
 
     def process_table(self):
-        self.get_next_games()
+        with ingest_stage('next_games', len(self.table)):
+            self.get_next_games()
 
     def get_next_games(self):
-        if self.players:
-            # construct a lookup for team name against team id
-            team_id_list = [t['id'] for t in self.table]
-            team_name_list = [t['name'] for t in self.table]
-            team_names = dict(zip(team_id_list, team_name_list))
-
-            # get the first player id for each team (it doesn't matter which)
-            # then lookup this ID to get information for their next game
-            player_id_list = [self._get_any_player_id_from_team_id(t_id) for t_id in team_id_list]
-            next_team_id_list = []
-            next_team_diff_list = []
-            for p_id in player_id_list:
-                next_team, next_diff = self._extract_fixture_data_from_player_id(p_id)
-                next_team_id_list.append(next_team)
-                next_team_diff_list.append(next_diff)
-
-            # construct a lookup for next opponent's team id and difficulty
-            team_next_game_id = dict(zip(team_id_list, next_team_id_list))
-            team_next_game_diff = dict(zip(team_id_list, next_team_diff_list))
-
-            # append new values to table using previously created lookups
-            for t in self.table:
-                t['next_team_id'] = team_next_game_id[t['id']]
+        # construct a lookup for team name against team id
+        team_names = {t['id']: t['name'] for t in self.table}
+
+        # the first unplayed fixture of each team gives its next opponent and difficulty
+        next_games = {}
+        for team_h, team_a, team_h_difficulty, team_a_difficulty in self.fixtures:
+            next_games.setdefault(team_h, (team_a, team_h_difficulty))
+            next_games.setdefault(team_a, (team_h, team_a_difficulty))
+
+        # append new values to table using previously created lookups
+        for t in self.table:
+            if t['id'] in next_games:
+                t['next_team_id'], t['next_team_diff'] = next_games[t['id']]
                 t['next_team_name'] = team_names[t['next_team_id']]
-                t['next_team_diff'] = team_next_game_diff[t['id']]
-
-    def _get_any_player_id_from_team_id(self, team_id):
-        return next((p.player_id for p in self.players if team_id == p.team_id), None)
-
-    def _extract_fixture_data_from_player_id(self, player_id):
-        fixtures_data = json.loads(self.session.get(self.PLAYER_INFO_URL_TEMPLATE.format(player_id)).text)['fixtures'][0]
-
-        # get next team ID based on is_home attribute
-        if fixtures_data['is_home']:
-            next_team = fixtures_data['team_a']
-        else:
-            next_team = fixtures_data['team_h']
-
-        difficulty = fixtures_data['difficulty']
-
-        return next_team, difficulty
 
 
 if __name__ == "__main__":
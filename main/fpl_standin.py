@@ -0,0 +1,187 @@
+import json
+import random
+import time
+import zlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse, urlencode
+
+from .models import Player
+
+# starting eleven in a 4-4-2, followed by the bench
+SQUAD_POSITIONS = ['G'] + ['D'] * 4 + ['M'] * 4 + ['F'] * 2 + ['G', 'D', 'M', 'F']
+MAX_PER_TEAM = 3
+# the password the stand-in rejects, to exercise the failed login path
+BAD_PASSWORD = 'wrong'
+STANDINGS_PAGE_SIZE = 50
+
+
+def entry_id_for(username):
+    return zlib.crc32(username.encode('utf-8')) % 9000000 + 1
+
+
+class StandinData:
+    """Repeatable fake FPL accounts, each one owning a valid squad of players from the Player table."""
+
+    def __init__(self, gameweek):
+        self.gameweek = gameweek
+        self.players = defaultdict(list)
+        for player_id, position, team_id, now_cost in Player.objects.values_list(
+                'player_id', 'position', 'team_id', 'now_cost').order_by('player_id'):
+            self.players[position].append((player_id, team_id, now_cost))
+        if any(len(self.players[pos]) < SQUAD_POSITIONS.count(pos) for pos in 'GDMF'):
+            raise ValueError('The Player table needs populating before the stand-in can make up squads.')
+
+    def squad(self, entry_id):
+        rng = random.Random(entry_id)
+        per_team = defaultdict(int)
+        chosen = set()
+        picks = []
+        for idx, position in enumerate(SQUAD_POSITIONS, start=1):
+            candidates = self.players[position][:]
+            rng.shuffle(candidates)
+            player_id, team_id, now_cost = next(
+                p for p in candidates if p[0] not in chosen and per_team[p[1]] < MAX_PER_TEAM)
+            chosen.add(player_id)
+            per_team[team_id] += 1
+            picks.append({
+                'element': player_id,
+                'position': idx,
+                'is_captain': idx == 2,
+                'is_vice_captain': idx == 3,
+                'multiplier': 2 if idx == 2 else (1 if idx <= 11 else 0),
+                'selling_price': int(round(now_cost * 10)),
+            })
+        return picks
+
+    def entry(self, entry_id):
+        return {
+            'id': entry_id,
+            'name': 'Load Test {}'.format(entry_id),
+            'current_event': self.gameweek,
+            'player_first_name': 'Load',
+            'player_last_name': 'Test',
+        }
+
+    def public_picks(self, entry_id):
+        picks = [dict(p) for p in self.squad(entry_id)]
+        for p in picks:
+            del p['selling_price']
+        return {'picks': picks, 'entry_history': {'event': self.gameweek, 'bank': 5}}
+
+    def my_team(self, entry_id):
+        return {'picks': self.squad(entry_id), 'transfers': {'bank': 5, 'limit': 1, 'made': 0}}
+
+    def standings(self, league_id, page):
+        # league n has n members (up to 10000), every one a made up entry
+        size = league_id % 10000
+        first = (page - 1) * STANDINGS_PAGE_SIZE
+        results = [
+            {'entry': league_id * 10000 + rank, 'entry_name': 'Load Test {}'.format(rank), 'rank': rank}
+            for rank in range(first + 1, min(size, first + STANDINGS_PAGE_SIZE) + 1)
+        ]
+        return {
+            'league': {'id': league_id, 'name': 'Load Test League {}'.format(league_id)},
+            'standings': {'has_next': first + STANDINGS_PAGE_SIZE < size, 'page': page, 'results': results},
+        }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Mimics the FPL login, me, my-team, entry, picks and classic league standings endpoints.
+
+    Every request waits for the configured latency (plus jitter) first and then fails
+    with a 503 at the configured error rate, like the real game does around deadlines.
+    """
+    server_version = 'FplStandin/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def delay_or_fail(self):
+        config = self.server
+        time.sleep(max(0.0, random.gauss(config.latency, config.jitter)) / 1000)
+        if random.random() < config.error_rate:
+            self.send_json({'detail': 'The game is being updated.'}, status=503)
+            return True
+        return False
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+
+    def logged_in_entry(self):
+        for cookie in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == 'standin_entry' and value.isdigit():
+                return int(value)
+        return None
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/accounts/login':
+            self.send_json({'detail': 'Not found.'}, status=404)
+            return
+        form = self.read_form()
+        if self.delay_or_fail():
+            return
+
+        # the real service redirects back to redirect_uri with the outcome in the query string
+        success = bool(form.get('login')) and form.get('password') != BAD_PASSWORD
+        location = '{}?{}'.format(form.get('redirect_uri', '/a/login'), urlencode({
+            'state': 'success' if success else 'fail',
+        }))
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        if success:
+            self.send_header('Set-Cookie', 'standin_entry={}; Path=/'.format(entry_id_for(form['login'])))
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        data = self.server.data
+
+        if parts == ['a', 'login']:
+            self.send_json({})
+            return
+        if self.delay_or_fail():
+            return
+
+        entry_id = self.logged_in_entry()
+        if parts == ['api', 'me']:
+            self.send_json({'player': {'entry': entry_id} if entry_id else None})
+        elif len(parts) == 3 and parts[:2] == ['api', 'my-team'] and parts[2].isdigit():
+            if int(parts[2]) != entry_id:
+                self.send_json({'detail': 'Authentication credentials were not provided.'}, status=403)
+            else:
+                self.send_json(data.my_team(entry_id))
+        elif len(parts) == 3 and parts[:2] == ['api', 'entry'] and parts[2].isdigit():
+            self.send_json(data.entry(int(parts[2])))
+        elif len(parts) == 6 and parts[:2] == ['api', 'entry'] and parts[3] == 'event' and parts[5] == 'picks':
+            self.send_json(data.public_picks(int(parts[2])))
+        elif len(parts) == 4 and parts[:2] == ['api', 'leagues-classic'] and parts[2].isdigit():
+            page = parse_qs(url.query).get('page_standings', ['1'])[0]
+            self.send_json(data.standings(int(parts[2]), int(page) if page.isdigit() else 1))
+        else:
+            self.send_json({'detail': 'Not found.'}, status=404)
+
+
+def make_server(host, port, gameweek=1, latency=150.0, jitter=50.0, error_rate=0.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.data = StandinData(gameweek)
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.verbose = verbose
+    return server
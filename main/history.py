@@ -0,0 +1,64 @@
+import json
+from collections import defaultdict
+
+from .models import Player, PlayerHistory
+
+# Player columns that change over a season, names and the like are left to the Player table
+UNTRACKED_FIELDS = ('player_id', 'name', 'name_raw', 'team_code', 'team_name', 'team_name_short', 'position', 'opt_cost')
+HISTORY_FIELDS = tuple(
+    f.attname for f in Player._meta.concrete_fields if f.attname not in UNTRACKED_FIELDS + ('id', 'updated'))
+
+INSERT_BATCH_SIZE = 500
+
+
+def record_history(gameweek, rows):
+    """Appends a snapshot of each ingested player row to PlayerHistory.
+
+    Must run before the rows are written to the Player table, whose current values are
+    the previous snapshot. Players without a snapshot in this gameweek yet get every
+    tracked field, so a range of gameweeks can be rebuilt without reading earlier ones.
+    Players whose stats haven't changed get no new row at all.
+    """
+    ids = [row['player_id'] for row in rows]
+    previous = {
+        values[0]: dict(zip(HISTORY_FIELDS, values[1:]))
+        for values in Player.objects.filter(player_id__in=ids).values_list('player_id', *HISTORY_FIELDS)
+    }
+    recorded = set(
+        PlayerHistory.objects.filter(player_id__in=ids, gameweek=gameweek).values_list('player_id', flat=True))
+
+    history = []
+    for row in rows:
+        stats = {field: row[field] for field in HISTORY_FIELDS if field in row}
+        if row['player_id'] in recorded:
+            last = previous.get(row['player_id'], {})
+            stats = {field: value for field, value in stats.items() if last.get(field) != value}
+            if not stats:
+                continue
+        history.append(PlayerHistory(
+            player_id=row['player_id'],
+            gameweek=gameweek,
+            stats=json.dumps(stats, separators=(',', ':')),
+        ))
+    PlayerHistory.objects.bulk_create(history, batch_size=INSERT_BATCH_SIZE)
+    return len(history)
+
+
+def gameweek_history(player_ids, first_gameweek, last_gameweek=None):
+    """Returns {player_id: {gameweek: stats}} with each player's stats as of their last snapshot in each gameweek.
+
+    Reads the range with one query on the (player_id, gameweek) index, e.g. the last
+    six gameweeks for a whole squad or every player.
+    """
+    snapshots = PlayerHistory.objects.filter(player_id__in=player_ids, gameweek__gte=first_gameweek)
+    if last_gameweek is not None:
+        snapshots = snapshots.filter(gameweek__lte=last_gameweek)
+
+    history = defaultdict(dict)
+    for player_id, gameweek, stats in snapshots.order_by('player_id', 'gameweek', 'id').values_list(
+            'player_id', 'gameweek', 'stats'):
+        gameweeks = history[player_id]
+        if gameweek not in gameweeks:
+            gameweeks[gameweek] = {}
+        gameweeks[gameweek].update(json.loads(stats))
+    return dict(history)
@@ -0,0 +1,158 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .timing import profile_step
+
+logger = logging.getLogger(__name__)
+
+# timeouts are in seconds, retries is the number of extra attempts after the first one
+Endpoint = namedtuple('Endpoint', ['limiter', 'connect_timeout', 'read_timeout', 'retries'])
+
+ENDPOINTS = {
+    'bootstrap_static': Endpoint('fpl', 3.05, 30, 2),
+    'entry': Endpoint('fpl', 3.05, 5, 2),
+    'picks': Endpoint('fpl', 3.05, 5, 2),
+    'standings': Endpoint('fpl', 3.05, 5, 2),
+    'me': Endpoint('fpl', 3.05, 5, 2),
+    'my_team': Endpoint('fpl', 3.05, 5, 2),
+    # never retried, the credentials may already have been accepted
+    'login': Endpoint('fpl', 3.05, 10, 0),
+    'fixtures': Endpoint('fpl', 3.05, 30, 2),
+    'fplstatistics': Endpoint('fplstatistics', 3.05, 30, 2),
+}
+
+# requests per second and burst size for each upstream host
+RATE_LIMITS = {
+    'fpl': (20, 40),
+    'fplstatistics': (2, 5),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 2.0
+POOL_SIZE = 20
+
+
+class TokenBucket:
+    """Thread safe token bucket, acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EndpointStats:
+    """Per-endpoint request, error and latency counters."""
+
+    FIELDS = ('requests', 'errors', 'retries', 'bytes', 'latency_total', 'latency_max')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def record(self, endpoint, latency, error=False, size=0):
+        with self.lock:
+            c = self.counters[endpoint]
+            c['requests'] += 1
+            c['errors'] += int(error)
+            c['bytes'] += size
+            c['latency_total'] += latency
+            c['latency_max'] = max(c['latency_max'], latency)
+
+    def record_retry(self, endpoint):
+        with self.lock:
+            self.counters[endpoint]['retries'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: dict(c) for endpoint, c in self.counters.items()}
+
+
+class FplClient:
+    """Shared client for every outbound call to the FPL API and fplstatistics.
+
+    All sessions share one pooled adapter, every request gets the endpoint's timeouts,
+    goes through the upstream host's rate limiter and is retried with jittered
+    exponential backoff on connection errors and retryable status codes.
+    """
+
+    def __init__(self):
+        self.adapter = HTTPAdapter(pool_connections=len(RATE_LIMITS), pool_maxsize=POOL_SIZE)
+        self.limiters = {host: TokenBucket(rate, capacity) for host, (rate, capacity) in RATE_LIMITS.items()}
+        self.stats = EndpointStats()
+        self.session = self.new_session()
+
+    def new_session(self):
+        # separate cookie jar (e.g. for a logged in user) sharing the connection pool
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+    @staticmethod
+    def backoff(attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def request(self, endpoint, method, url, session=None, **kwargs):
+        # retries, backoff and waiting on the rate limiter all count towards the request's http time
+        with profile_step('http'):
+            return self._request(endpoint, method, url, session, **kwargs)
+
+    def _request(self, endpoint, method, url, session=None, **kwargs):
+        config = ENDPOINTS[endpoint]
+        session = session or self.session
+        kwargs.setdefault('timeout', (config.connect_timeout, config.read_timeout))
+
+        attempt = 0
+        while True:
+            self.limiters[config.limiter].acquire()
+            start = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.stats.record(endpoint, time.monotonic() - start, error=True)
+                if attempt >= config.retries:
+                    logger.warning('%s %s failed after %d attempts: %s', method, url, attempt + 1, e)
+                    raise
+            else:
+                failed = response.status_code in RETRY_STATUSES
+                self.stats.record(endpoint, time.monotonic() - start, error=failed, size=len(response.content))
+                if not failed or attempt >= config.retries:
+                    return response
+
+            attempt += 1
+            self.stats.record_retry(endpoint)
+            time.sleep(self.backoff(attempt))
+
+    def get(self, endpoint, url, session=None, **kwargs):
+        return self.request(endpoint, 'GET', url, session=session, **kwargs)
+
+    def post(self, endpoint, url, session=None, **kwargs):
+        return self.request(endpoint, 'POST', url, session=session, **kwargs)
+
+    def get_json(self, endpoint, url, session=None, **kwargs):
+        return self.get(endpoint, url, session=session, **kwargs).json()
+
+
+fpl_client = FplClient()
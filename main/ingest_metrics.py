@@ -0,0 +1,210 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.core.cache import caches
+
+from .http_client import fpl_client
+
+logger = logging.getLogger(__name__)
+
+# only the ingest calls these, so the traffic of requests being served at the same time isn't counted
+INGEST_ENDPOINTS = ('bootstrap_static', 'fixtures', 'fplstatistics')
+RUN_NAMES = ('players', 'teams', 'prices')
+METRICS_KEY = 'ingest_metrics:{}'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_active = threading.local()
+
+
+def _upstream_totals():
+    counters = fpl_client.stats.snapshot()
+    return [
+        sum(counters[e][field] for e in INGEST_ENDPOINTS if e in counters)
+        for field in ('requests', 'bytes', 'latency_total')
+    ]
+
+
+class Stage:
+    """What one stage of an ingest run cost. rows can be set by the stage itself once it knows."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.duration = None
+        self.peak_memory = None
+        self.upstream_requests = 0
+        self.upstream_bytes = 0
+        self.upstream_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'rows': self.rows,
+            'duration': round(self.duration, 6),
+            'peak_memory': self.peak_memory,
+            'upstream_requests': self.upstream_requests,
+            'upstream_bytes': self.upstream_bytes,
+            'upstream_seconds': round(self.upstream_seconds, 6),
+        }
+
+
+class IngestRun:
+    """Wall time, peak Python allocations, row counts and upstream traffic for each stage of an ingest run.
+
+    Every stage is logged as a line of JSON when it finishes. The whole run is kept in the upstream
+    cache when it ends, as the ingest runs in its own process and the metrics view has to read it
+    from another. Peak allocations are only traced with trace_memory: tracemalloc traces every thread
+    of the process, so in a web process it would slow down and count the requests served alongside.
+    """
+
+    def __init__(self, name, trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started = time.time()
+        self.duration = None
+        self.succeeded = None
+        self.failed_stage = None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        stage = Stage(name, rows)
+        # a stage started inside another one can't have its own peak, tracemalloc only has the one
+        trace_memory = self.trace_memory and not tracemalloc.is_tracing()
+        before = _upstream_totals()
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield stage
+        except Exception:
+            self.failed_stage = self.failed_stage or name
+            raise
+        finally:
+            stage.duration = time.perf_counter() - start
+            if trace_memory:
+                stage.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            after = _upstream_totals()
+            stage.upstream_requests, stage.upstream_bytes, stage.upstream_seconds = (
+                a - b for a, b in zip(after, before))
+            self.stages.append(stage)
+            logger.info(json.dumps(dict(stage.as_dict(), event='ingest_stage', run=self.name)))
+
+    def as_dict(self):
+        return {
+            'run': self.name,
+            'started': self.started,
+            'duration': self.duration,
+            'succeeded': self.succeeded,
+            'failed_stage': self.failed_stage,
+            'stages': [s.as_dict() for s in self.stages],
+        }
+
+    def save(self):
+        cache = caches['upstream']
+        key = METRICS_KEY.format(self.name)
+        previous = cache.get(key) or {}
+        metrics = self.as_dict()
+        metrics['runs_total'] = previous.get('runs_total', 0) + 1
+        metrics['failures_total'] = previous.get('failures_total', 0) + int(not self.succeeded)
+        metrics['last_success'] = self.started if self.succeeded else previous.get('last_success')
+        cache.set(key, metrics, None)
+
+
+@contextmanager
+def ingest_run(name, trace_memory=False):
+    """Collects the metrics of every ingest_stage in the block, e.g. `with ingest_run('players'): update_players()`.
+
+    Must be entered outside the ingest's transaction, so a failed run's metrics aren't rolled back with it.
+    trace_memory adds each stage's peak allocations, for processes running nothing but the ingest.
+    """
+    run = IngestRun(name, trace_memory)
+    previous = getattr(_active, 'run', None)
+    _active.run = run
+    try:
+        yield run
+        run.succeeded = True
+    except Exception:
+        run.succeeded = False
+        raise
+    finally:
+        _active.run = previous
+        run.duration = time.time() - run.started
+        logger.info(json.dumps({
+            'event': 'ingest_run',
+            'run': name,
+            'duration': round(run.duration, 6),
+            'succeeded': run.succeeded,
+            'failed_stage': run.failed_stage,
+        }))
+        run.save()
+
+
+@contextmanager
+def ingest_stage(name, rows=None):
+    """Times a stage of the ingest run in progress on this thread, does nothing outside of a run."""
+    run = getattr(_active, 'run', None)
+    if run is None:
+        yield Stage(name, rows)
+        return
+    with run.stage(name, rows) as stage:
+        yield stage
+
+
+def get_ingest_metrics():
+    metrics = caches['upstream'].get_many([METRICS_KEY.format(name) for name in RUN_NAMES])
+    return [metrics[METRICS_KEY.format(name)] for name in RUN_NAMES if METRICS_KEY.format(name) in metrics]
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def prometheus_metrics(runs=None):
+    """The latest metrics of each kind of ingest run in the Prometheus text exposition format."""
+    runs = get_ingest_metrics() if runs is None else runs
+    families = [
+        ('fpl_ingest_runs_total', 'counter', 'Ingest runs started.'),
+        ('fpl_ingest_failures_total', 'counter', 'Ingest runs that raised an error.'),
+        ('fpl_ingest_last_run_timestamp_seconds', 'gauge', 'When the latest ingest run started.'),
+        ('fpl_ingest_last_success_timestamp_seconds', 'gauge', 'When the latest successful ingest run started.'),
+        ('fpl_ingest_last_run_duration_seconds', 'gauge', 'Wall time of the latest ingest run.'),
+        ('fpl_ingest_last_run_succeeded', 'gauge', 'Whether the latest ingest run succeeded.'),
+        ('fpl_ingest_stage_duration_seconds', 'gauge', 'Wall time of each stage of the latest ingest run.'),
+        ('fpl_ingest_stage_peak_memory_bytes', 'gauge', 'Peak Python allocations of each stage of the latest ingest run.'),
+        ('fpl_ingest_stage_rows', 'gauge', 'Rows handled by each stage of the latest ingest run.'),
+        ('fpl_ingest_stage_upstream_requests', 'gauge', 'Upstream requests made by each stage of the latest ingest run.'),
+        ('fpl_ingest_stage_upstream_bytes', 'gauge', 'Upstream response bytes read by each stage of the latest ingest run.'),
+        ('fpl_ingest_stage_upstream_seconds', 'gauge', 'Time each stage of the latest ingest run waited on upstream requests.'),
+    ]
+    samples = {name: [] for name, _, _ in families}
+    for run in runs:
+        labels = 'run="{}"'.format(_label(run['run']))
+        samples['fpl_ingest_runs_total'].append((labels, run['runs_total']))
+        samples['fpl_ingest_failures_total'].append((labels, run['failures_total']))
+        samples['fpl_ingest_last_run_timestamp_seconds'].append((labels, run['started']))
+        if run['last_success'] is not None:
+            samples['fpl_ingest_last_success_timestamp_seconds'].append((labels, run['last_success']))
+        samples['fpl_ingest_last_run_duration_seconds'].append((labels, run['duration']))
+        samples['fpl_ingest_last_run_succeeded'].append((labels, int(bool(run['succeeded']))))
+        for stage in run['stages']:
+            stage_labels = '{},stage="{}"'.format(labels, _label(stage['stage']))
+            for field in ('duration', 'peak_memory', 'rows', 'upstream_requests', 'upstream_bytes', 'upstream_seconds'):
+                if stage[field] is not None:
+                    name = 'fpl_ingest_stage_{}{}'.format(field, {
+                        'duration': '_seconds', 'peak_memory': '_bytes'}.get(field, ''))
+                    samples[name].append((stage_labels, stage[field]))
+
+    lines = []
+    for name, kind, description in families:
+        if not samples[name]:
+            continue
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        lines.extend('{}{{{}}} {}'.format(name, labels, value) for labels, value in samples[name])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+import requests
+from django.conf import settings
+
+from .entry_cache import get_entry_picks, get_gameweek_state, get_league_standings
+from .workers import ClosingThreadPoolExecutor
+
+# the FPL API's classic league standings come 50 entries a page
+STANDINGS_PAGE_SIZE = 50
+
+# shared by every crawl, so however many run at once only this many upstream calls are in flight
+crawl_executor = ClosingThreadPoolExecutor(max_workers=settings.LEAGUE_CRAWL_WORKERS, thread_name_prefix='league')
+
+
+def league_members(league_id, max_entries=None):
+    """The league summary and its standings rows in rank order, the first max_entries of them.
+
+    Only the first page says whether there's another, so the rest of the pages that
+    could be needed are fetched at once after it. Returns None for an unknown league.
+    """
+    max_entries = max_entries or settings.LEAGUE_MAX_ENTRIES
+    first = get_league_standings(league_id)
+    if not isinstance(first, dict) or 'standings' not in first:
+        return None
+
+    members = list(first['standings']['results'])
+    if first['standings']['has_next'] and len(members) < max_entries:
+        pages = range(2, math.ceil(max_entries / STANDINGS_PAGE_SIZE) + 1)
+        for page in crawl_executor.map(lambda page: get_league_standings(league_id, page), pages):
+            # a page the game wouldn't give (e.g. while it's updating) ends the crawl early
+            if not isinstance(page, dict) or 'standings' not in page:
+                break
+            members.extend(page['standings']['results'])
+            if not page['standings']['has_next']:
+                break
+    return first['league'], members[:max_entries]
+
+
+def _picks(entry, event):
+    # entries that joined after the deadline have no picks for it
+    try:
+        data = get_entry_picks(entry, event)
+    except (requests.RequestException, ValueError):
+        return None
+    return data['picks'] if isinstance(data, dict) and 'picks' in data else None
+
+
+def ownership(squads):
+    """Ownership, starts, captaincy and effective ownership, in %, of every player in a list of squads' picks.
+
+    Effective ownership counts each pick by its multiplier, so a player captained by
+    everyone is at 200%, and is what a player's points are worth to the average squad.
+    Returns the player ids and a dict of arrays in their order.
+    """
+    elements = np.array([p['element'] for picks in squads for p in picks], dtype=int)
+    multipliers = np.array([p['multiplier'] for picks in squads for p in picks], dtype=int)
+    player_ids, index = np.unique(elements, return_inverse=True)
+    share = 100 / max(1, len(squads))
+    return player_ids, {
+        'ownership': np.bincount(index, minlength=len(player_ids)) * share,
+        'starts': np.bincount(index, weights=multipliers > 0, minlength=len(player_ids)) * share,
+        'captaincy': np.bincount(index, weights=multipliers > 1, minlength=len(player_ids)) * share,
+        'effective_ownership': np.bincount(index, weights=multipliers, minlength=len(player_ids)) * share,
+    }
+
+
+def league_ownership(league_id, entry=None, max_entries=None):
+    """How a classic league's members have picked this gameweek, or None for an unknown league.
+
+    The members' picks are fetched through crawl_executor and cached per entry (see
+    entry_cache.py), so refreshing a league only fetches its standings again. With entry,
+    every player also gets that squad's multiplier and its exposure: the points it gains
+    on the league's average squad for each point the player scores.
+    """
+    event = (get_gameweek_state() or {}).get('current_event')
+    crawled = league_members(league_id, max_entries)
+    if crawled is None:
+        return None
+    league, members = crawled
+
+    entries = [m['entry'] for m in members]
+    squads = list(crawl_executor.map(lambda e: _picks(e, event), entries)) if event else [None] * len(entries)
+    picked = [picks for picks in squads if picks is not None]
+    player_ids, shares = ownership(picked)
+    columns = {name: values.round(1).tolist() for name, values in shares.items()}
+    players = [
+        dict({'player_id': player_id}, **{name: values[i] for name, values in columns.items()})
+        for i, player_id in enumerate(player_ids.tolist())
+    ]
+
+    if entry is not None:
+        picks = (_picks(entry, event) if event else None) or ()
+        multipliers = {p['element']: p['multiplier'] for p in picks}
+        # the entry's players nobody in the league has
+        players += [
+            dict({'player_id': player_id}, **dict.fromkeys(columns, 0.0))
+            for player_id in sorted(set(multipliers) - set(player_ids.tolist()))
+        ]
+        for player in players:
+            player['multiplier'] = multipliers.get(player['player_id'], 0)
+            player['exposure'] = round(player['multiplier'] - player['effective_ownership'] / 100, 2)
+    players.sort(key=lambda p: p['effective_ownership'], reverse=True)
+
+    return {
+        'league': {'id': league['id'], 'name': league['name']},
+        'event': event,
+        'members': len(picked),
+        # in the standings but without picks for the gameweek
+        'missing': [e for e, picks in zip(entries, squads) if picks is None],
+        'players': players,
+    }
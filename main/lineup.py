@@ -1,7 +1,7 @@
-from django.core import serializers
 from django.db.models.query import QuerySet
 from .models import Player
-import json
+from .records import records_from_models, records_from_dicts
+from .timing import profile_step
 
 class Lineup:
 
@@ -26,16 +26,15 @@ class Lineup:
         self.param = param
 
         if isinstance(team, QuerySet) or isinstance(team[0], Player):
-            team_sorted = self.sort_team_by_param(team)
-            self.team_serialized = self.serialize_team(team_sorted)
+            team = self.serialize_team(team)
         else:
-            self.team_serialized = team
+            team = records_from_dicts(team)
+        self.team_serialized = self.sort_team_by_param(team)
 
         self.sort_team_by_position(self.team_serialized)
 
-    def serialize_team(self, team_sorted):
-        team_serialized = json.loads(serializers.serialize('json', team_sorted))
-        return [pl['fields'] for pl in team_serialized]
+    def serialize_team(self, team):
+        return records_from_models(team)
 
     def sort_team_by_param(self, team):
         return sorted(team, key=lambda k: getattr(k, self.param), reverse=True)
@@ -48,6 +47,7 @@ class Lineup:
         SORT_ORDER = {'G': 0, 'D': 1, 'M': 2, 'F': 3}
         return sorted(self.team_serialized, key=lambda x: SORT_ORDER[x['position']])
     
+    @profile_step('lineup')
     def choose_optimal_lineup(self):
         best_score = 0
         for formation in self.formations:
@@ -76,6 +76,7 @@ class Lineup:
                     'param': self.param,
                     'lineup': lineup,
                     'captain': cap['name'],
+                    'captain_id': cap['player_id'],
                     'subs': subs,
                 }
         best['cost'] = round(sum(p['opt_cost'] for p in lineup) + sum(p['opt_cost'] for p in subs), 1)
@@ -89,7 +90,7 @@ class Lineup:
         subs = []
         
         for p in team_by_pos:
-            if is_sub_dict[int(p['player_id'])]:
+            if is_sub_dict[p['player_id']]:
                 subs.append(p)
             else:
                 formation_dict[p['position']] += 1
@@ -0,0 +1,169 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from .fpl_standin import BAD_PASSWORD
+from .utils import percentile
+
+# relative weights of each kind of request a virtual user makes
+DEFAULT_MIX = {
+    'login_creds': 1,
+    'login_id': 1,
+    'autocomplete': 6,
+    'simulate': 2,
+}
+SEARCH_TERMS = ['sa', 'sal', 'ken', 'son', 'mar', 'rob', 'van', 'de b', 'aub', 'mah', 'ali', 'ram', 'tri', 'mou']
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(text):
+    # e.g. "login_creds=1,autocomplete=6"
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError('Unknown request type {}'.format(name))
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class VirtualUser:
+    """One browser's worth of traffic, keeping its own cookies between requests."""
+
+    def __init__(self, base_url, user_id, rng):
+        self.base_url = base_url.rstrip('/')
+        self.user_id = user_id
+        self.rng = rng
+        self.http = requests.Session()
+        self.logged_in = False
+
+    def url(self, path):
+        return self.base_url + path
+
+    def headers(self):
+        return {
+            'X-Requested-With': 'XMLHttpRequest',
+            'X-CSRFToken': self.http.cookies.get('csrftoken', ''),
+            'Referer': self.url('/'),
+        }
+
+    def start(self):
+        # picks up the CSRF cookie like the landing page does for a browser
+        self.http.get(self.url('/'))
+
+    def login_creds(self):
+        # roughly one in twenty logins uses a bad password
+        password = BAD_PASSWORD if self.rng.random() < 0.05 else 'password'
+        creds = {'user': 'loadtest{}@example.com'.format(self.user_id), 'pass': password}
+        response = self.http.post(self.url('/ajax/login_creds/'), headers=self.headers(), allow_redirects=False, data={
+            'action': 'post',
+            'creds': json.dumps(creds),
+        })
+        ok = response.status_code == 302
+        self.logged_in = self.logged_in or ok
+        return ok or password == BAD_PASSWORD
+
+    def login_id(self):
+        response = self.http.post(self.url('/ajax/login_id/'), headers=self.headers(), allow_redirects=False, data={
+            'action': 'post',
+            'acc_id': self.rng.randint(1, 9000000),
+        })
+        ok = response.status_code == 302
+        self.logged_in = self.logged_in or ok
+        return ok
+
+    def autocomplete(self):
+        response = self.http.get(self.url('/ajax/get_autocomplete_players/'), headers=self.headers(), params={
+            'term': self.rng.choice(SEARCH_TERMS),
+        })
+        # a request the view doesn't take for ajax gets a 200 with the body 'fail'
+        try:
+            return response.status_code == 200 and isinstance(response.json(), list)
+        except ValueError:
+            return False
+
+    def simulate(self):
+        # transfer simulations need a squad in the session, wildcards don't
+        num_subs = self.rng.choice([1, 2, 3]) if self.logged_in else None
+        response = self.http.post(self.url('/api/v1/simulate/'), data=json.dumps({
+            'opt_param': 'ep_next',
+            'max_budget': 100 + (5 if num_subs else 0),
+            'num_subs': num_subs,
+        }), headers=dict(self.headers(), **{'Content-Type': 'application/json'}))
+        # 422 is an infeasible squad, a correct answer
+        return response.status_code in (200, 422)
+
+
+class LoadTest:
+    """Runs users concurrent virtual users for duration seconds and collects per request type latencies."""
+
+    def __init__(self, base_url, users=10, duration=60, mix=None, think_time=0.5, seed=None):
+        self.base_url = base_url
+        self.users = users
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.think_time = think_time
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, latency, ok):
+        with self.lock:
+            self.latencies[name].append(latency)
+            if not ok:
+                self.errors[name] += 1
+
+    def user_loop(self, user_id, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + user_id)
+        user = VirtualUser(self.base_url, user_id, rng)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        user.start()
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.monotonic()
+            try:
+                ok = getattr(user, name)()
+            except requests.RequestException:
+                ok = False
+            self.record(name, time.monotonic() - start, ok)
+            # a real user reads the page before doing anything else
+            time.sleep(rng.expovariate(1 / self.think_time) if self.think_time else 0)
+
+    def run(self):
+        started = time.monotonic()
+        deadline = started + self.duration
+        threads = [threading.Thread(target=self.user_loop, args=(i, deadline), daemon=True) for i in range(self.users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.report(time.monotonic() - started)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            endpoints[name] = {
+                'requests': len(ordered),
+                'errors': self.errors[name],
+                'throughput': len(ordered) / elapsed,
+                'mean': sum(ordered) / len(ordered),
+                'max': ordered[-1],
+            }
+            endpoints[name].update({'p{}'.format(p): percentile(ordered, p) for p in PERCENTILES})
+        return {
+            'base_url': self.base_url,
+            'users': self.users,
+            'duration': elapsed,
+            'think_time': self.think_time,
+            'mix': self.mix,
+            'requests': sum(e['requests'] for e in endpoints.values()),
+            'throughput': sum(e['requests'] for e in endpoints.values()) / elapsed,
+            'endpoints': endpoints,
+        }
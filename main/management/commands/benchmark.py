@@ -0,0 +1,61 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.benchmarks import build_report, compare_reports, run_benchmarks
+from main.upstream_fixtures import recording
+from main.views import update_players, update_teams
+
+
+class Command(BaseCommand):
+    help = 'Times the ingest, optimiser and simulation paths against recorded upstream payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixtures', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'fixtures'),
+            help='Directory of recorded upstream payloads')
+        parser.add_argument(
+            '--record', action='store_true',
+            help='Record fresh payloads from the live FPL API and fplstatistics instead of benchmarking')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each benchmark')
+        parser.add_argument(
+            '--only', action='append',
+            help='Only run benchmarks whose name starts with this, e.g. opt or ingest.update_players')
+        parser.add_argument('--output', default='benchmark_report.json', help='Where to write the JSON report')
+        parser.add_argument('--compare', help='Earlier report to compare the results with')
+
+    def handle(self, *args, **options):
+        if options['record']:
+            self.record(options['fixtures'])
+            return
+
+        if not os.path.isdir(options['fixtures']):
+            raise CommandError('No recorded payloads in {}, run with --record first.'.format(options['fixtures']))
+
+        results = run_benchmarks(options['fixtures'], options['repeat'], options['only'])
+        report = build_report(results, options['fixtures'])
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        for name, before, median, change in compare_reports(report, baseline or {}):
+            line = '{:<36} {:>10.2f} ms'.format(name, median * 1000)
+            if change is not None:
+                line += '  (was {:.2f} ms, {:+.1%})'.format(before * 1000, change)
+            self.stdout.write(line)
+        self.stdout.write('Report written to {}'.format(options['output']))
+
+    def record(self, directory):
+        # runs a normal ingest against the live upstreams, rolled back so the database is left untouched
+        with recording(directory) as client, transaction.atomic():
+            update_players()
+            update_teams()
+            transaction.set_rollback(True)
+        self.stdout.write('Recorded {} payloads into {}'.format(len(client.recorded), directory))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.fpl_standin import make_server
+
+
+class Command(BaseCommand):
+    help = 'Serves a local stand-in for the FPL login, me, my-team, entry and picks endpoints for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--gameweek', type=int, default=1, help='Current gameweek reported by the entry endpoint')
+        parser.add_argument('--latency', type=float, default=150.0, help='Mean response time in milliseconds')
+        parser.add_argument('--jitter', type=float, default=50.0, help='Standard deviation of the response time')
+        parser.add_argument(
+            '--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503, e.g. 0.02')
+        parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    def handle(self, *args, **options):
+        try:
+            server = make_server(
+                options['host'], options['port'], options['gameweek'], options['latency'], options['jitter'],
+                options['error_rate'], options['verbose'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        url = 'http://{}:{}'.format(options['host'], options['port'])
+        self.stdout.write('FPL stand-in listening on {}'.format(url))
+        self.stdout.write('Serve the site with DJANGO_SETTINGS_MODULE=FPLManager.settings_loadtest FPL_API_URL={}'.format(url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
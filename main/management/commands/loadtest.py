@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import DEFAULT_MIX, PERCENTILES, LoadTest, parse_mix
+
+
+class Command(BaseCommand):
+    help = ('Drives mixed login, autocomplete and simulation traffic at a running copy of the site and '
+            'reports throughput and latency percentiles per request type. Serve the site with '
+            'FPLManager.settings_loadtest and start `manage.py fpl_standin` first, so no real FPL '
+            'account is touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the site under test')
+        parser.add_argument('--users', type=int, default=10, help='Number of concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Length of the test in seconds')
+        parser.add_argument(
+            '--mix', default=','.join('{}={}'.format(k, v) for k, v in DEFAULT_MIX.items()),
+            help='Relative weight of each request type')
+        parser.add_argument(
+            '--think-time', type=float, default=0.5, help='Mean pause between a user\'s requests in seconds')
+        parser.add_argument('--seed', type=int, help='Seed for repeatable traffic')
+        parser.add_argument('--output', help='Also write the report to this file as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        test = LoadTest(
+            options['url'], options['users'], options['duration'], mix, options['think_time'], options['seed'])
+        report = test.run()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write('{} users, {:.0f} s, {} requests, {:.1f} req/s'.format(
+            report['users'], report['duration'], report['requests'], report['throughput']))
+        header = '{:<14} {:>8} {:>7} {:>8}'.format('request', 'count', 'errors', 'req/s')
+        header += ''.join(' {:>9}'.format('p{} ms'.format(p)) for p in PERCENTILES)
+        self.stdout.write(header)
+        for name, stats in report['endpoints'].items():
+            line = '{:<14} {:>8} {:>7} {:>8.1f}'.format(name, stats['requests'], stats['errors'], stats['throughput'])
+            line += ''.join(' {:>9.0f}'.format(stats['p{}'.format(p)] * 1000) for p in PERCENTILES)
+            self.stdout.write(line)
@@ -0,0 +1,71 @@
+import json
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import SolveCapture
+from main.solve_replay import export_capture, make_solver, replay_capture
+
+
+class Command(BaseCommand):
+    help = 'Replays captured slow or infeasible solves with any PuLP solver and compares the timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('captures', nargs='*', type=int, help='Capture ids, the latest captures by default')
+        parser.add_argument('--latest', type=int, default=10, help='Number of latest captures to replay')
+        parser.add_argument('--reason', choices=[r for r, _ in SolveCapture.REASON_CHOICES],
+                            help='Only replay slow or only infeasible captures')
+        parser.add_argument('--solver', help='PuLP solver class, e.g. PULP_CBC_CMD, COIN_CMD or GLPK_CMD')
+        parser.add_argument('--option', action='append', default=[],
+                            help='Solver option as key=value, e.g. threads=4 or msg=0, may be repeated')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of timed replays of each capture')
+        parser.add_argument('--export-mps', metavar='DIR', help='Write the captured models and inputs to DIR instead')
+        parser.add_argument('--output', help='Where to write the results as JSON')
+
+    def handle(self, *args, **options):
+        captures = SolveCapture.objects.select_related('solve').order_by('-created')
+        if options['captures']:
+            captures = captures.filter(pk__in=options['captures'])
+        if options['reason']:
+            captures = captures.filter(reason=options['reason'])
+        if not options['captures']:
+            captures = captures[:options['latest']]
+        if not captures:
+            raise CommandError('No captured solves to replay.')
+
+        if options['export_mps']:
+            for capture in captures:
+                self.stdout.write('Wrote {}'.format(export_capture(capture, options['export_mps'])))
+            return
+
+        try:
+            solver = make_solver(options['solver'], options['option'])
+        except (ValueError, TypeError) as e:
+            raise CommandError(e)
+
+        results = []
+        self.stdout.write('{:>7} {:<10} {:<16} {:<8} {:>4} {:>4} {:>21} {:>21} {:>8}  {}'.format(
+            'capture', 'reason', 'opt_param', 'mode', 'inc', 'exc',
+            'original build/solve', 'replay build/solve', 'speedup', 'status'))
+        for capture in captures:
+            result = replay_capture(capture, solver, options['repeat'])
+            results.append(result)
+            original, replay = result['original'], result['replay']
+            status = replay['status'] if replay['status'] == original['status'] else '{} (was {})'.format(
+                replay['status'], original['status'])
+            if (replay['objective'] is None) != (original['objective'] is None) or (
+                    replay['objective'] is not None and not math.isclose(replay['objective'], original['objective'])):
+                status += ', objective {} (was {})'.format(replay['objective'], original['objective'])
+            if not result['same_model']:
+                status += ', model differs'
+            self.stdout.write('{:>7} {:<10} {:<16} {:<8} {:>4} {:>4} {:>9.1f}/{:>8.1f} ms {:>9.1f}/{:>8.1f} ms {:>7.2f}x  {}'.format(
+                capture.pk, result['reason'], result['opt_param'], result['mode'],
+                result['include_count'], result['exclude_count'],
+                original['build'] * 1000, original['solve'] * 1000,
+                replay['build'] * 1000, replay['solve'] * 1000,
+                result['speedup'], status))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'solver': options['solver'], 'options': options['option'], 'results': results}, f, indent=2)
+            self.stdout.write('Results written to {}'.format(options['output']))
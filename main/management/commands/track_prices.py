@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from main.ingest_metrics import ingest_run
+from main.views import update_prices
+
+class Command(BaseCommand):
+    help = 'Records a price change tick and updates every player\'s price change prediction, see main/price_tracker.py'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recording price tick...')
+        try:
+            with ingest_run('prices', trace_memory=True) as run:
+                update_prices()
+            self.stdout.write('Price tick recorded successfully!')
+            for stage in run.stages:
+                self.stdout.write('  {:<24} {:>9.1f} ms {:>8} rows'.format(
+                    stage.name, stage.duration * 1000, '-' if stage.rows is None else stage.rows))
+        except Exception as e:
+            self.stdout.write('Something went wrong whilst recording the price tick.')
+            self.stdout.write('Error message: {}'. format(e))
+            self.stdout.write('Rolling back any database changes...')
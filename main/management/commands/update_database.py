@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand, CommandError
+from main.ingest_metrics import ingest_run
 from main.views import update_players, update_teams
 
 class Command(BaseCommand):
@@ -8,8 +9,10 @@ class Command(BaseCommand):
         # attempt to update the Players database
         self.stdout.write('Updating Players table...')
         try:
-            update_players()
+            with ingest_run('players', trace_memory=True) as run:
+                update_players()
             self.stdout.write('Players table updated successfully!')
+            self.write_stages(run)
         except Exception as e:
             self.stdout.write('Something went wrong whilst updating the Players table.')
             self.stdout.write('Error message: {}'. format(e))
@@ -19,10 +22,22 @@ class Command(BaseCommand):
         # attempt to update Team database
         self.stdout.write('Updating Teams table...')
         try:
-            update_teams()
+            with ingest_run('teams', trace_memory=True) as run:
+                update_teams()
             self.stdout.write('Team table updated successfully!')
+            self.write_stages(run)
         except Exception as e:
             self.stdout.write('Something went wrong whilst updating the Team table.')
             self.stdout.write('Error message: {}'. format(e))
             self.stdout.write('Rolling back any database changes...')
             self.stdout.write('############\n')
+
+    def write_stages(self, run):
+        for stage in run.stages:
+            self.stdout.write('  {:<24} {:>9.1f} ms {:>10} {:>8} rows {:>10} upstream bytes'.format(
+                stage.name,
+                stage.duration * 1000,
+                '{:.1f} MB'.format(stage.peak_memory / 2 ** 20) if stage.peak_memory is not None else '-',
+                '-' if stage.rows is None else stage.rows,
+                stage.upstream_bytes,
+            ))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Copies the unexpired sessions from the sessions table into the shared (redis) session cache'
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.cached_db':
+            self.stdout.write('Session cache is not enabled, nothing to do.')
+            return
+        # a locmem cache is private to this process, which (e.g. a release dyno) is gone before any worker reads it
+        if settings.SESSION_CACHE != 'redis':
+            self.stdout.write('Session cache is not shared between processes, nothing to do.')
+            return
+
+        from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        now = timezone.now()
+
+        count = 0
+        for s in Session.objects.filter(expire_date__gt=now).iterator():
+            timeout = int((s.expire_date - now).total_seconds())
+            cache.set(KEY_PREFIX + s.session_key, s.get_decoded(), timeout)
+            count += 1
+
+        self.stdout.write('Copied {} sessions into the session cache.'.format(count))
@@ -0,0 +1,102 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .compression import accepted_encodings
+from .timing import RequestProfile, activate_profile, track_queries
+
+slow_request_logger = logging.getLogger('main.slow_requests')
+
+
+class PrecompressedStaticMiddleware:
+    """Serves collected static files from STATIC_ROOT when using LocalStaticStorage.
+
+    A precompressed .br or .gz copy is sent when the client accepts it, and files with a
+    content hash in their name are marked immutable so browsers never ask for them again.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if request.path.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        served_path, encoding = path, None
+        encodings = accepted_encodings(request)
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in encodings and os.path.isfile(path + suffix):
+                served_path, encoding = path + suffix, candidate
+                break
+
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if name in self.hashed_names:
+            patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.UNHASHED_STATIC_MAX_AGE)
+        return response
+
+
+class RequestProfileMiddleware:
+    """Breaks each response's time down into db, http, template, pulp_build, cbc_solve and lineup.
+
+    The breakdown is added to the response's Server-Timing header (after any steps the view
+    timed itself), and a sample of the requests slower than SLOW_REQUEST_MS is logged to
+    main.slow_requests as JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        start = time.perf_counter()
+        with activate_profile(profile), track_queries(profile):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        timings = [t for t in (response.get('Server-Timing'), profile.server_timing()) if t]
+        timings.append('total;dur={:.1f}'.format(duration * 1000))
+        response['Server-Timing'] = ', '.join(timings)
+
+        if duration * 1000 >= settings.SLOW_REQUEST_MS and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE:
+            slow_request_logger.info(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'status': response.status_code,
+                'dur': round(duration * 1000, 1),
+                'components': profile.as_dict(),
+                'server_timing': response['Server-Timing'],
+            }))
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:27
+
+from django.db import migrations, models
+
+
+def remove_unconvertible_ids(apps, schema_editor):
+    """Deletes the rows whose id wouldn't cast to a unique integer.
+
+    A blank or non-numeric id (Team.team_id used to default to '') would fail the
+    column's ::integer cast, and two rows with the same id (update_or_create never
+    stopped them) the unique constraint. Of duplicates the last updated row is kept.
+    The ingest recreates anything deleted here from the FPL API.
+    """
+    for model_name, key in (('Player', 'player_id'), ('Team', 'team_id')):
+        model = apps.get_model('main', model_name)
+        kept = {}
+        delete = []
+        for pk, value in model.objects.order_by('-updated', '-pk').values_list('pk', key):
+            value = (value or '').strip()
+            if not value.isdigit() or int(value) in kept:
+                delete.append(pk)
+            else:
+                kept[int(value)] = pk
+        model.objects.filter(pk__in=delete).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_auto_20200102_1950'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_unconvertible_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='player',
+            name='player_id',
+            field=models.IntegerField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='team_id',
+            field=models.IntegerField(unique=True),
+        ),
+    ]
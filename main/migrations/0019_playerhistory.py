@@ -0,0 +1,27 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_integer_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player_id', models.IntegerField()),
+                ('gameweek', models.IntegerField()),
+                ('stats', models.TextField()),
+                ('recorded', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='playerhistory',
+            index=models.Index(fields=['player_id', 'gameweek'], name='main_player_player__defe83_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_playerhistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolveRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('opt_param', models.CharField(max_length=50)),
+                ('mode', models.CharField(choices=[('wildcard', 'Wildcard'), ('transfer', 'Transfer')], max_length=8)),
+                ('num_subs', models.IntegerField(blank=True, null=True)),
+                ('max_budget', models.FloatField()),
+                ('include_count', models.IntegerField(default=0)),
+                ('exclude_count', models.IntegerField(default=0)),
+                ('players', models.IntegerField()),
+                ('variables', models.IntegerField()),
+                ('constraints', models.IntegerField()),
+                ('build_time', models.FloatField()),
+                ('solve_time', models.FloatField()),
+                ('status', models.IntegerField()),
+                ('objective', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_solverecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolveCapture',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('reason', models.CharField(choices=[('slow', 'Slow'), ('infeasible', 'Infeasible')], max_length=10)),
+                ('inputs', models.TextField()),
+                ('mps', models.BinaryField()),
+                ('solve', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='capture', to='main.SolveRecord')),
+            ],
+        ),
+    ]
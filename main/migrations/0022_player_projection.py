@@ -0,0 +1,23 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_solvecapture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='chance_of_playing',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='ep_projected',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
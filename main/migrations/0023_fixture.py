@@ -0,0 +1,30 @@
+# Generated by Django 2.2.8 on 2026-10-19 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_player_projection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fixture',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fixture_id', models.IntegerField(unique=True)),
+                ('event', models.IntegerField(blank=True, null=True)),
+                ('kickoff_time', models.DateTimeField(blank=True, null=True)),
+                ('team_h', models.IntegerField()),
+                ('team_a', models.IntegerField()),
+                ('team_h_difficulty', models.IntegerField(default=0)),
+                ('team_a_difficulty', models.IntegerField(default=0)),
+                ('team_h_score', models.IntegerField(blank=True, null=True)),
+                ('team_a_score', models.IntegerField(blank=True, null=True)),
+                ('finished', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
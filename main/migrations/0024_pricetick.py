@@ -0,0 +1,26 @@
+# Generated by Django 2.2.8 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_fixture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTick',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('gameweek', models.IntegerField()),
+                ('player_ids', models.BinaryField()),
+                ('transfers_in', models.BinaryField()),
+                ('transfers_out', models.BinaryField()),
+                ('cost_change', models.BinaryField()),
+                ('net_transfers', models.BinaryField()),
+            ],
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.db import models
 
 # Create your models here.
 class Player(models.Model):
-    player_id = models.CharField(default=0, max_length=3)
+    player_id = models.IntegerField(unique=True)
     name = models.CharField(max_length=200)
     name_raw = models.CharField(default='', max_length=200)
     team_id = models.IntegerField(default=0)
@@ -34,10 +34,13 @@ class Player(models.Model):
     transfers_out_event = models.IntegerField(default=0)
     yellow_cards = models.IntegerField(default=0)
     top_50_count = models.IntegerField(default=0)
+    # None when there's no injury, suspension or other news
+    chance_of_playing = models.IntegerField(null=True, blank=True)
 
     creativity = models.FloatField(default=0.0)
     ep_next = models.FloatField(default=0.0)
     ep_this = models.FloatField(default=0.0)
+    ep_projected = models.FloatField(default=0.0)
     form = models.FloatField(default=0.0)
     ict_index = models.FloatField(default=0.0)
     influence = models.FloatField(default=0.0)
@@ -61,7 +64,7 @@ class Player(models.Model):
 
 
 class Team(models.Model):
-    team_id = models.CharField(default='', max_length=3)
+    team_id = models.IntegerField(unique=True)
     team_code = models.CharField(default='', max_length=3)
     team_name = models.CharField(default='', max_length=50)
     team_name_short = models.CharField(default='', max_length=3)
@@ -77,3 +80,135 @@ class Team(models.Model):
 
     def __str__(self):
         return self.team_name
+
+
+class Fixture(models.Model):
+    """A match of the season from the FPL fixtures feed, teams are team ids as in Player.team_id."""
+    fixture_id = models.IntegerField(unique=True)
+    # None until a postponed fixture is rescheduled
+    event = models.IntegerField(null=True, blank=True)
+    kickoff_time = models.DateTimeField(null=True, blank=True)
+    team_h = models.IntegerField()
+    team_a = models.IntegerField()
+    team_h_difficulty = models.IntegerField(default=0)
+    team_a_difficulty = models.IntegerField(default=0)
+    team_h_score = models.IntegerField(null=True, blank=True)
+    team_a_score = models.IntegerField(null=True, blank=True)
+    finished = models.BooleanField(default=False)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    # hack to prevent PyCharm inspection errors
+    objects = models.Manager()
+
+    def __str__(self):
+        return 'GW{} {} v {}'.format(self.event, self.team_h, self.team_a)
+
+
+class PlayerHistory(models.Model):
+    """Append-only log of a player's stats, written by every ingest.
+
+    The first snapshot of a player in each gameweek holds every tracked field, later
+    ones only the fields that changed since the previous snapshot, as compact JSON.
+    """
+    player_id = models.IntegerField()
+    gameweek = models.IntegerField()
+    stats = models.TextField()
+    recorded = models.DateTimeField(auto_now_add=True)
+
+    # hack to prevent PyCharm inspection errors
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player_id', 'gameweek']),
+        ]
+
+    def __str__(self):
+        return '{} GW{} ({})'.format(self.player_id, self.gameweek, self.recorded)
+
+
+class PriceTick(models.Model):
+    """One reading of every player's transfers, written by every ingest and `python manage.py track_prices`.
+
+    Each field is a packed array in the order of player_ids: the transfers in and out since
+    the previous tick (the change in transfers_in_event and transfers_out_event), the
+    cost_change_event and the net transfers since the player's last price change. See
+    main/price_tracker.py.
+    """
+    recorded = models.DateTimeField(auto_now_add=True, db_index=True)
+    gameweek = models.IntegerField()
+    player_ids = models.BinaryField()
+    transfers_in = models.BinaryField()
+    transfers_out = models.BinaryField()
+    cost_change = models.BinaryField()
+    net_transfers = models.BinaryField()
+
+    # hack to prevent PyCharm inspection errors
+    objects = models.Manager()
+
+    def __str__(self):
+        return 'GW{} ({})'.format(self.gameweek, self.recorded)
+
+
+class SolveRecord(models.Model):
+    """One run of the optimiser: the shape of the request, the size of the problem it built, how long
+    building and solving it took and the outcome. Written by every Opt, see main/solver_telemetry.py.
+    """
+    WILDCARD = 'wildcard'
+    TRANSFER = 'transfer'
+    MODE_CHOICES = [
+        (WILDCARD, 'Wildcard'),
+        (TRANSFER, 'Transfer'),
+    ]
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    opt_param = models.CharField(max_length=50)
+    mode = models.CharField(max_length=8, choices=MODE_CHOICES)
+    num_subs = models.IntegerField(null=True, blank=True)
+    max_budget = models.FloatField()
+    include_count = models.IntegerField(default=0)
+    exclude_count = models.IntegerField(default=0)
+
+    players = models.IntegerField()
+    variables = models.IntegerField()
+    constraints = models.IntegerField()
+
+    # seconds
+    build_time = models.FloatField()
+    solve_time = models.FloatField()
+
+    # PuLP's status, 1 is optimal
+    status = models.IntegerField()
+    objective = models.FloatField(null=True, blank=True)
+
+    # hack to prevent PyCharm inspection errors
+    objects = models.Manager()
+
+    def __str__(self):
+        return '{} {} ({})'.format(self.mode, self.opt_param, self.created)
+
+
+class SolveCapture(models.Model):
+    """The exact model (gzipped MPS) and inputs of a slow or infeasible solve, so it can be replayed
+    offline with `python manage.py replay_solves`. The inputs are JSON, including the candidate
+    players as they were in the Player table at the time.
+    """
+    SLOW = 'slow'
+    INFEASIBLE = 'infeasible'
+    REASON_CHOICES = [
+        (SLOW, 'Slow'),
+        (INFEASIBLE, 'Infeasible'),
+    ]
+
+    solve = models.OneToOneField(SolveRecord, on_delete=models.CASCADE, related_name='capture')
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    inputs = models.TextField()
+    mps = models.BinaryField()
+
+    # hack to prevent PyCharm inspection errors
+    objects = models.Manager()
+
+    def __str__(self):
+        return '{} solve {} ({})'.format(self.reason, self.solve_id, self.created)
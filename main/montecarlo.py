@@ -0,0 +1,248 @@
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .data_version import get_data_version
+from .entry_cache import get_gameweek_state
+from .fixture_matrix import get_fixture_matrix
+from .models import Player
+from .projection import (
+    APPEARANCE_POINTS, ASSIST_POINTS, CLEAN_SHEET_POINTS, DIFFICULTY_STEP, GOAL_POINTS, OWN_GOAL_POINTS,
+    PENALTY_MISSED_POINTS, PENALTY_SAVED_POINTS, POSITIONS, RED_CARD_POINTS, YELLOW_CARD_POINTS,
+    projection_gameweeks,
+)
+from .workers import map_cpu_bound
+
+# the optimisation parameter a risk-aware simulation trades off against the downside of the squad's points
+RISK_PARAM = 'ep_next'
+# beyond this the squad is all but chosen on CVaR alone, which has so many near equal squads that CBC takes seconds
+MAX_RISK = 0.75
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# events drawn as a number of times per fixture, and as happening or not
+COUNT_EVENTS = (
+    'goals_scored', 'assists', 'goals_conceded', 'saves', 'bonus', 'own_goals', 'penalties_saved', 'penalties_missed')
+BINARY_EVENTS = ('clean_sheets', 'yellow_cards', 'red_cards')
+# more likely against easier opposition, goals conceded get less likely instead
+ATTACKING_EVENTS = ('goals_scored', 'assists', 'clean_sheets', 'bonus')
+SAVES_PER_POINT = 3
+GOALS_CONCEDED_PER_POINT = 2
+MIN_DEFENDERS = 3
+MIN_FORWARDS = 1
+
+
+class ReturnModel:
+    """Draws the FPL points every player scores in the next gameweek.
+
+    A player plays each of their club's fixtures with the chance of playing times their
+    share of the minutes so far. When they play they get the appearance points and every
+    scoring event is drawn from their per 90 rate, adjusted for the fixture's difficulty.
+    On average that is the expected points of projection.py. Players without any minutes
+    score their ep_next in every draw.
+    """
+
+    def __init__(self, players, matrix, gameweek, gameweeks_played, version=None):
+        # players are dicts of Player fields
+        self.version = version
+        self.index = {p['player_id']: i for i, p in enumerate(players)}
+        self.position = np.array([POSITIONS.index(p['position']) for p in players], dtype=int)
+        team = np.array([p['team_id'] for p in players], dtype=int)
+        minutes = np.array([p['minutes'] for p in players], dtype=float)
+
+        # the matrix might not have a row for a club without fixtures yet
+        counts = np.zeros(len(players))
+        difficulty = np.zeros(len(players))
+        known = team < matrix.counts.shape[0]
+        if gameweek is not None:
+            counts[known] = matrix.counts[team[known], gameweek]
+            difficulty[known] = matrix.difficulty[team[known], gameweek]
+        self.fixtures = counts.astype(int)
+        factor = 1 + (3 - difficulty) * DIFFICULTY_STEP
+
+        chance = np.array([p['chance_of_playing'] for p in players], dtype=float)
+        chance = np.where(np.isnan(chance), 1, chance / 100)
+        self.play_chance = chance * np.clip(minutes / (90 * max(1, gameweeks_played)), 0, 1)
+
+        self.rates = {}
+        for event in COUNT_EVENTS + BINARY_EVENTS:
+            per_90 = np.divide(
+                np.array([p[event] for p in players], dtype=float) * 90, minutes,
+                out=np.zeros_like(minutes), where=minutes > 0)
+            if event in ATTACKING_EVENTS:
+                per_90 = per_90 * factor
+            elif event == 'goals_conceded':
+                per_90 = per_90 / np.maximum(factor, DIFFICULTY_STEP)
+            self.rates[event] = np.clip(per_90, 0, 1) if event in BINARY_EVENTS else per_90
+        ep_next = np.array([p['ep_next'] for p in players], dtype=float)
+        self.fixed = np.where(minutes > 0, np.nan, ep_next * (counts > 0))
+
+    @classmethod
+    def from_database(cls, version=None):
+        gameweek_state = get_gameweek_state()
+        gameweeks = projection_gameweeks(gameweek_state, 1)
+        players = list(Player.objects.values(
+            'player_id', 'position', 'team_id', 'minutes', 'chance_of_playing', 'ep_next',
+            *(COUNT_EVENTS + BINARY_EVENTS)))
+        played = (gameweek_state or {}).get('current_event') or 0
+        return cls(players, get_fixture_matrix(), gameweeks[0] if gameweeks else None, played, version)
+
+    def indices(self, player_ids):
+        return np.array([self.index[p_id] for p_id in player_ids], dtype=int)
+
+    def sample(self, idx, scenarios, rng):
+        """Points and whether they played, as scenarios x players arrays, for the players at indices idx."""
+        shape = (scenarios, len(idx))
+        position = self.position[idx]
+        fixtures = self.fixtures[idx]
+        rates = {event: rate[idx] for event, rate in self.rates.items()}
+        points = np.zeros(shape, dtype=np.int16)
+        played = np.zeros(shape, dtype=bool)
+
+        # double gameweeks are drawn as two independent fixtures
+        for fixture in range(int(fixtures.max(initial=0))):
+            plays = (rng.random(shape) < self.play_chance[idx]) & (fixtures > fixture)
+            counts = {event: rng.poisson(rates[event], shape) for event in COUNT_EVENTS}
+            happened = {event: rng.random(shape) < rates[event] for event in BINARY_EVENTS}
+            fixture_points = (
+                APPEARANCE_POINTS
+                + counts['goals_scored'] * GOAL_POINTS[position]
+                + counts['assists'] * ASSIST_POINTS
+                + happened['clean_sheets'] * CLEAN_SHEET_POINTS[position]
+                - counts['goals_conceded'] // GOALS_CONCEDED_PER_POINT * (position <= POSITIONS.index('D'))
+                + counts['saves'] // SAVES_PER_POINT
+                + counts['bonus']
+                + happened['yellow_cards'] * YELLOW_CARD_POINTS
+                + happened['red_cards'] * RED_CARD_POINTS
+                + counts['own_goals'] * OWN_GOAL_POINTS
+                + counts['penalties_saved'] * PENALTY_SAVED_POINTS
+                + counts['penalties_missed'] * PENALTY_MISSED_POINTS
+            )
+            points += np.where(plays, fixture_points, 0).astype(np.int16)
+            played |= plays
+
+        fixed = self.fixed[idx]
+        unproven = ~np.isnan(fixed)
+        points[:, unproven] = np.round(fixed[unproven]).astype(np.int16)
+        played[:, unproven] = fixed[unproven] > 0
+        return points, played
+
+
+_model = None
+
+
+def get_return_model():
+    # rebuilds the model whenever a newer ingest is detected
+    global _model
+    version = get_data_version()
+    if _model is None or _model.version != version:
+        _model = ReturnModel.from_database(version)
+    return _model
+
+
+def scenario_points(player_ids, scenarios, seed=None):
+    """A scenarios x players array of the points each player scores in each sampled scenario."""
+    model = get_return_model()
+    points, _ = model.sample(model.indices(player_ids), scenarios, np.random.default_rng(seed))
+    return points
+
+
+def squad_totals(points, played, positions, captain, vice_captain):
+    """Each scenario's points for a squad of 11 starters and 4 subs (the goalkeeper first), in that order.
+
+    Starters who didn't play are replaced by the first sub who did, in bench order, as long
+    as the formation stays valid, as FPL does. Returns the squad's points without the
+    captain's bonus and, for each starter, the bonus if they were captain, falling back to
+    vice_captain (an index into the starters) if they didn't play.
+    """
+    positions = np.asarray(positions)
+    starters = positions[:11]
+    counted = played[:, :11].copy()
+    total = points[:, :11].sum(axis=1, dtype=np.int32)
+    defenders = np.full(len(points), (starters == 'D').sum())
+    forwards = np.full(len(points), (starters == 'F').sum())
+
+    for sub in range(11, len(positions)):
+        available = played[:, sub].copy()
+        for slot in range(11):
+            if (positions[sub] == 'G') != (starters[slot] == 'G'):
+                continue
+            # formation after the swap
+            new_defenders = defenders - (starters[slot] == 'D') + (positions[sub] == 'D')
+            new_forwards = forwards - (starters[slot] == 'F') + (positions[sub] == 'F')
+            swap = (available & ~counted[:, slot]
+                    & (new_defenders >= MIN_DEFENDERS) & (new_forwards >= MIN_FORWARDS))
+            total += np.where(swap, points[:, sub], 0)
+            counted[:, slot] |= swap
+            defenders = np.where(swap, new_defenders, defenders)
+            forwards = np.where(swap, new_forwards, forwards)
+            available &= ~swap
+
+    fallback = [vice_captain if k != vice_captain else captain for k in range(11)]
+    captain_bonus = np.where(played[:, :11], points[:, :11], points[:, fallback] * played[:, fallback])
+    return total, captain_bonus.astype(np.int16)
+
+
+def _sample_squad(player_ids, positions, captain, vice_captain, scenarios, seed):
+    # one chunk of squad_distribution's scenarios, run in a simulation worker
+    model = get_return_model()
+    points, played = model.sample(model.indices(player_ids), scenarios, np.random.default_rng(seed))
+    total, captain_bonus = squad_totals(points, played, positions, captain, vice_captain)
+    # the starter with the most points, i.e. the best captain in hindsight
+    best = points[:, :11].argmax(axis=1).astype(np.int8)
+    return total, captain_bonus, best
+
+
+def summarise(totals, alpha=None):
+    """Mean, standard deviation, percentiles and CVaR (the mean of the worst alpha share) of sampled points."""
+    alpha = alpha or settings.RISK_ALPHA
+    ordered = np.sort(totals)
+    return {
+        'mean': round(float(ordered.mean()), 2),
+        'std': round(float(ordered.std()), 2),
+        'percentiles': {p: float(np.percentile(ordered, p)) for p in PERCENTILES},
+        'cvar': round(float(ordered[:max(1, math.ceil(alpha * len(ordered)))].mean()), 2),
+    }
+
+
+def squad_distribution(lineup, param, scenarios=None, seed=None):
+    """The distribution of a lineup's points next gameweek, and of each captain choice.
+
+    lineup is a lineup dict from Lineup (lineup, subs and captain_id), the vice captain is
+    the starter with the second highest param. The scenarios are split evenly across the
+    simulation pool.
+    """
+    scenarios = scenarios or settings.MONTE_CARLO_SCENARIOS
+    squad = list(lineup['lineup']) + sorted(lineup['subs'], key=lambda p: p['position'] != 'G')
+    player_ids = [p['player_id'] for p in squad]
+    positions = [p['position'] for p in squad]
+    ranked = sorted(range(11), key=lambda k: squad[k][param], reverse=True)
+    captain = player_ids.index(lineup['captain_id'])
+    vice_captain = next(k for k in ranked if k != captain)
+
+    chunks = max(1, min(settings.SIMULATION_WORKERS, scenarios // settings.MONTE_CARLO_CHUNK_MIN))
+    sizes = [scenarios // chunks + (i < scenarios % chunks) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    results = map_cpu_bound(_sample_squad, [
+        (player_ids, positions, captain, vice_captain, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)])
+    total = np.concatenate([r[0] for r in results])
+    captain_bonus = np.concatenate([r[1] for r in results])
+    best = np.concatenate([r[2] for r in results])
+
+    distribution = summarise(total + captain_bonus[:, captain])
+    captains = []
+    for k in ranked:
+        summary = summarise(total + captain_bonus[:, k])
+        captains.append({
+            'player_id': player_ids[k],
+            'mean': summary['mean'],
+            'cvar': summary['cvar'],
+            'best_share': round(float((best == k).mean()), 3),
+        })
+    distribution.update({
+        'scenarios': scenarios,
+        'captain': player_ids[captain],
+        'vice_captain': player_ids[vice_captain],
+        'captains': captains,
+    })
+    return distribution
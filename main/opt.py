@@ -1,4 +1,12 @@
+import time
+
+from django.conf import settings
+
+from .data_version import get_data_version
 from .models import Player
+from .montecarlo import scenario_points
+from .solver_telemetry import record_solve
+from .timing import profile_step
 from pulp import LpMinimize, LpMaximize, LpProblem, LpVariable, LpInteger, lpSum
 import json
 from django.core import serializers
@@ -11,39 +19,59 @@ class Opt:
         'M': 5,
         'F': 3
     }
+    # PuLP solver used for the problem, None for PuLP's default (CBC)
+    solver = None
 
-    def __init__(self, opt_parameter, max_budget, team, n_subs=None, include=None, exclude=None):
+    def __init__(self, opt_parameter, max_budget, team, n_subs=None, include=None, exclude=None, risk=None):
         self.opt_parameter = opt_parameter
         self.max_budget = max_budget
         self.team = team
         self.n_subs = n_subs
         self.include = include
         self.exclude = exclude
+        # weight of the squad's CVaR against its expected points, 0 (or None) ignores the risk
+        self.risk = risk
 
         # based on n_subs, determine if wildcard sim or not
         self.is_wildcard = False if self.n_subs else True
 
-        self.players = Player.objects.all()
+        self.players = self.get_players()
         self.set_opt_cost()
+        if self.risk:
+            self.scenario_points = self.get_scenario_points()
+            candidates = self.get_risk_candidates()
+            self.players = [self.players[i] for i in candidates]
+            self.scenario_points = self.scenario_points[:, candidates]
         self.data_length = range(len(self.players))
 
-        self.opt_param_list = self.get_opt_param_list()
-        self.opt_id_list = self.get_opt_id_list()
-        self.opt_cost_list = self.get_opt_cost_list()
+        start = time.perf_counter()
+        with profile_step('pulp_build'):
+            self.opt_param_list = self.get_opt_param_list()
+            self.opt_id_list = self.get_opt_id_list()
+            self.opt_cost_list = self.get_opt_cost_list()
 
-        if not self.is_wildcard:
-            self.opt_owned_players_list = self.get_opt_owned_players_list()
+            if not self.is_wildcard:
+                self.opt_owned_players_list = self.get_opt_owned_players_list()
 
-        if self.include:
-            self.opt_include_players_list = self.get_opt_include_players_list()
+            if self.include:
+                self.opt_include_players_list = self.get_opt_include_players_list()
 
-        if self.exclude:
-            self.opt_exclude_players_list = self.get_opt_exclude_players_list()
+            if self.exclude:
+                self.opt_exclude_players_list = self.get_opt_exclude_players_list()
+
+            self.opt_pos_constraints = self.get_pos_constraints()
+            self.opt_team_constraints = self.get_team_constraints()
+        self.build_time = time.perf_counter() - start
 
-        self.opt_pos_constraints = self.get_pos_constraints()
-        self.opt_team_constraints = self.get_team_constraints()
         results_ids = self.run_optimisation()
         self.results = self.lookup_team_by_ids(results_ids)
+        self.record_solve()
+
+    def get_players(self):
+        return Player.objects.all()
+
+    def record_solve(self):
+        record_solve(self)
 
     def set_opt_cost(self):
         player_found = False
@@ -66,25 +94,72 @@ class Opt:
         return team_list
     
     def run_optimisation(self):
-        # Declare problem instance, max/min problem
-        self.prob = LpProblem("Squad", LpMaximize)
+        start = time.perf_counter()
+        with profile_step('pulp_build'):
+            # Declare problem instance, max/min problem
+            self.prob = LpProblem("Squad", LpMaximize)
 
-        # Declare decision variable - 1 if a player is part of the squad else 0
-        self.decision = LpVariable.matrix(
-            "decision", list(self.data_length), 0, 1, LpInteger)
+            # Declare decision variable - 1 if a player is part of the squad else 0
+            self.decision = LpVariable.matrix(
+                "decision", list(self.data_length), 0, 1, LpInteger)
 
-        # Objective function -> Maximize specified optimisation parameter
-        self.prob += lpSum(self.opt_param_list[i] * self.decision[i] for i in self.data_length)
+            # Objective function -> Maximize specified optimisation parameter
+            objective = lpSum(self.opt_param_list[i] * self.decision[i] for i in self.data_length)
+            if self.risk:
+                objective = (1 - self.risk) * objective + self.risk * self.get_cvar()
+            self.prob += objective
 
-        # Constraint definition
-        self.add_constraints()
+            # Constraint definition
+            self.add_constraints()
+        self.build_time += time.perf_counter() - start
 
         # solve problem
-        self.prob.solve()
+        start = time.perf_counter()
+        with profile_step('cbc_solve'):
+            self.prob.solve(self.solver)
+        self.solve_time = time.perf_counter() - start
 
         # extract selected players and return
         return [self.opt_id_list[i] for i in self.data_length if self.decision[i].varValue]
 
+    def get_risk_candidates(self):
+        """Indices of the players a risk-aware solve chooses from.
+
+        Every scenario is a constraint over every candidate, which makes CBC far too slow with
+        the whole Player table. Keeps the RISK_CANDIDATES best players of each position by the
+        optimisation parameter, its value for money and their mean points over the scenarios,
+        and the squad and included players.
+        """
+        keep = {p['player_id'] for p in self.team} | set(self.include or ())
+        mean_points = self.scenario_points.mean(axis=0)
+        for pos in self.max_players_per_position:
+            indices = [i for i, p in enumerate(self.players) if p.position == pos]
+            for key in (
+                lambda i: getattr(self.players[i], self.opt_parameter),
+                lambda i: getattr(self.players[i], self.opt_parameter) / max(float(self.players[i].opt_cost), 0.1),
+                lambda i: mean_points[i],
+            ):
+                keep.update(self.players[i].player_id for i in sorted(indices, key=key, reverse=True)[:settings.RISK_CANDIDATES])
+        return [i for i, p in enumerate(self.players) if p.player_id in keep]
+
+    def get_scenario_points(self):
+        # the same scenarios for every simulation of an ingest, so repeating one gives the same squad
+        return scenario_points(
+            [p.player_id for p in self.players], settings.RISK_SCENARIOS, seed=int(get_data_version()))
+
+    def get_cvar(self):
+        """The squad's CVaR, the mean of its points in the worst RISK_ALPHA share of the scenarios.
+
+        Linearised as in Rockafellar and Uryasev: the mean of the shortfalls below a threshold,
+        with the threshold (var) free for the solver to pick, adds a constraint per scenario.
+        """
+        var = LpVariable('var')
+        shortfall = LpVariable.matrix('shortfall', list(range(len(self.scenario_points))), 0)
+        for s, points in enumerate(self.scenario_points.tolist()):
+            # most players score nothing in most scenarios
+            self.prob += shortfall[s] >= var - lpSum(points[i] * self.decision[i] for i in self.data_length if points[i])
+        return var - lpSum(shortfall) * (1 / (settings.RISK_ALPHA * len(self.scenario_points)))
+
     def add_constraints(self):
 
         # team constraints
@@ -121,7 +196,7 @@ class Opt:
         for t in teams:
             list_result = []
             for p in self.players:
-                if int(p.team_id) == t:
+                if p.team_id == t:
                     list_result.append(1)
                 else:
                     list_result.append(0)
@@ -169,7 +244,7 @@ class Opt:
         return opt_owned_players_list
 
     def get_opt_param_list(self):
-        # TODO: need to add multiplier for number of games next gameweek
+        # ep_next ignores blank and double gameweeks, ep_projected (see projection.py) counts every fixture
         return [getattr(p, self.opt_parameter) for p in self.players]
 
     def get_opt_id_list(self):
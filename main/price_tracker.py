@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PriceTick
+
+# PriceTick's arrays, packed little-endian
+FIELDS = {
+    'player_ids': np.dtype('<i4'),
+    'transfers_in': np.dtype('<i4'),
+    'transfers_out': np.dtype('<i4'),
+    'cost_change': np.dtype('<i1'),
+    'net_transfers': np.dtype('<i4'),
+}
+# progress (in % of the threshold) at which a rise, or at minus which a fall, is predicted
+CHANGE_PROGRESS = 100
+# transfers over a shorter span are too noisy to project forward from
+MIN_RATE_HOURS = 1
+
+
+def _unpack(tick, field):
+    # some database backends give a memoryview
+    return np.frombuffer(bytes(getattr(tick, field)), dtype=FIELDS[field])
+
+
+def _aligned(ids, tick):
+    """The tick's arrays for the players in ids (sorted), 0 for players it doesn't have."""
+    tick_ids = _unpack(tick, 'player_ids')
+    arrays = {field: np.zeros(len(ids), dtype=np.int64) for field in FIELDS if field != 'player_ids'}
+    if len(tick_ids):
+        position = np.minimum(np.searchsorted(tick_ids, ids), len(tick_ids) - 1)
+        found = tick_ids[position] == ids
+        for field, values in arrays.items():
+            values[found] = _unpack(tick, field)[position[found]]
+    return arrays
+
+
+def _changed(previous, cost_change, gameweek):
+    # players whose price moved since the previous (tick, arrays), cost_change_event restarts at 0 each gameweek
+    tick, arrays = previous
+    return cost_change != (arrays['cost_change'] if tick.gameweek == gameweek else 0)
+
+
+def hours_to_price_change(now):
+    # now is in UTC
+    change = now.replace(hour=settings.PRICE_CHANGE_HOUR, minute=0, second=0, microsecond=0)
+    if change <= now:
+        change += timedelta(days=1)
+    return (change - now).total_seconds() / 3600
+
+
+def _column(elements, field, dtype=np.int64):
+    return np.array([e[field] for e in elements], dtype=dtype)
+
+
+def record_tick(elements, gameweek, total_players):
+    """Records a PriceTick of bootstrap-static's elements and returns {player_id: price change progress}.
+
+    The update is incremental and vectorised over every player. Their transfers since
+    the last tick are how far the *_event counters (reset by FPL at each deadline) are
+    past the sum of this gameweek's earlier ticks, and their net transfers since their
+    last price change carry on from the previous tick, back to 0 when cost_change_event
+    moves. Progress adds the last PRICE_RATE_HOURS' rate of transfers until the next
+    PRICE_CHANGE_HOUR, as a percentage of the player's threshold: CHANGE_PROGRESS or more
+    predicts a rise and -CHANGE_PROGRESS or less a fall, like fplstatistics' measure.
+    """
+    now = timezone.now()
+    elements = sorted(elements, key=lambda e: e['id'])
+    ids = _column(elements, 'id', FIELDS['player_ids'])
+    transfers_in = _column(elements, 'transfers_in_event')
+    transfers_out = _column(elements, 'transfers_out_event')
+    cost_change = _column(elements, 'cost_change_event')
+
+    since = now - timedelta(hours=settings.PRICE_RATE_HOURS)
+    ticks = [
+        (tick, _aligned(ids, tick))
+        for tick in PriceTick.objects.filter(Q(gameweek=gameweek) | Q(recorded__gte=since)).order_by('recorded', 'id')
+    ]
+    if not ticks:
+        ticks = [(tick, _aligned(ids, tick)) for tick in PriceTick.objects.order_by('-recorded', '-id')[:1]]
+
+    this_gameweek = [arrays for tick, arrays in ticks if tick.gameweek == gameweek]
+    delta_in = transfers_in - sum((arrays['transfers_in'] for arrays in this_gameweek), np.zeros(len(ids), np.int64))
+    delta_out = transfers_out - sum((arrays['transfers_out'] for arrays in this_gameweek), np.zeros(len(ids), np.int64))
+    delta = delta_in - delta_out
+
+    if ticks:
+        changed = _changed(ticks[-1], cost_change, gameweek)
+        net = np.where(changed, 0, ticks[-1][1]['net_transfers'] + delta)
+    else:
+        changed = cost_change != 0
+        net = np.where(changed, 0, delta)
+
+    # net transfers an hour over the window, or since the player's last price change in it
+    window = [(tick, arrays) for tick, arrays in ticks if tick.recorded >= since]
+    recent = np.zeros(len(ids), np.int64)
+    start = np.full(len(ids), now.timestamp())
+    if window:
+        start[:] = window[0][0].recorded.timestamp()
+        for previous, (tick, arrays) in zip(window, window[1:]):
+            moved = _changed(previous, arrays['cost_change'], tick.gameweek)
+            recent = np.where(moved, 0, recent + arrays['transfers_in'] - arrays['transfers_out'])
+            start = np.where(moved, tick.recorded.timestamp(), start)
+        recent = np.where(changed, 0, recent + delta)
+    rate = recent / np.maximum((now.timestamp() - start) / 3600, MIN_RATE_HOURS)
+
+    owners = _column(elements, 'selected_by_percent', float) / 100 * total_players
+    threshold = np.maximum(owners * settings.PRICE_CHANGE_THRESHOLD, settings.PRICE_CHANGE_MIN_TRANSFERS)
+    progress = CHANGE_PROGRESS * (net + rate * hours_to_price_change(now)) / threshold
+
+    PriceTick.objects.create(
+        gameweek=gameweek,
+        player_ids=ids.tobytes(),
+        transfers_in=delta_in.astype(FIELDS['transfers_in']).tobytes(),
+        transfers_out=delta_out.astype(FIELDS['transfers_out']).tobytes(),
+        cost_change=cost_change.astype(FIELDS['cost_change']).tobytes(),
+        net_transfers=net.astype(FIELDS['net_transfers']).tobytes(),
+    )
+    PriceTick.objects.filter(gameweek__lte=gameweek - settings.PRICE_TICK_GAMEWEEKS).delete()
+    return dict(zip(ids.tolist(), progress.round(2).tolist()))
@@ -0,0 +1,86 @@
+import numpy as np
+from django.conf import settings
+
+from .fixture_matrix import LAST_GAMEWEEK, FixtureMatrix
+
+# FPL scoring by position, in the order of POSITIONS
+POSITIONS = 'GDMF'
+GOAL_POINTS = np.array([6, 6, 5, 4])
+CLEAN_SHEET_POINTS = np.array([4, 4, 1, 0])
+# -1 for every 2 goals conceded
+GOALS_CONCEDED_POINTS = np.array([-0.5, -0.5, 0, 0])
+ASSIST_POINTS = 3
+SAVE_POINTS = 1 / 3
+YELLOW_CARD_POINTS = -1
+RED_CARD_POINTS = -3
+OWN_GOAL_POINTS = -2
+PENALTY_SAVED_POINTS = 5
+PENALTY_MISSED_POINTS = -2
+# for playing 60 minutes or more, most regular starters do
+APPEARANCE_POINTS = 2
+
+# change in a fixture's expected event points for each step of difficulty (1 easiest, 5 hardest) from 3
+DIFFICULTY_STEP = 0.1
+
+
+def projection_gameweeks(gameweek_state, horizon=None):
+    """The gameweeks to project over, starting with the one after the current gameweek."""
+    horizon = horizon or settings.PROJECTION_GAMEWEEKS
+    first = ((gameweek_state or {}).get('current_event') or 0) + 1
+    return list(range(first, min(first + horizon, LAST_GAMEWEEK + 1)))
+
+
+def _column(rows, field):
+    return np.array([row[field] for row in rows], dtype=float)
+
+
+def project_points(rows, counts, difficulty, gameweeks_played):
+    """Expected points of every player in every gameweek of the fixture matrix, as a players x gameweeks array.
+
+    Each fixture is worth the appearance points plus the points a player's season so far
+    earns per gameweek (goals, assists, clean sheets, saves, bonus, cards and so on, from
+    their per 90 rates and share of the available minutes), scaled by its difficulty, and
+    by the chance of them playing. Players without any minutes yet get FPL's ep_next for
+    each fixture instead. rows are ingested Player rows.
+    """
+    position = np.array([POSITIONS.index(row['position']) for row in rows])
+    team = np.array([row['team_id'] for row in rows], dtype=int)
+    minutes = _column(rows, 'minutes')
+
+    event_points = (
+        _column(rows, 'goals_scored') * GOAL_POINTS[position]
+        + _column(rows, 'assists') * ASSIST_POINTS
+        + _column(rows, 'clean_sheets') * CLEAN_SHEET_POINTS[position]
+        + _column(rows, 'goals_conceded') * GOALS_CONCEDED_POINTS[position]
+        + _column(rows, 'saves') * SAVE_POINTS
+        + _column(rows, 'bonus')
+        + _column(rows, 'yellow_cards') * YELLOW_CARD_POINTS
+        + _column(rows, 'red_cards') * RED_CARD_POINTS
+        + _column(rows, 'own_goals') * OWN_GOAL_POINTS
+        + _column(rows, 'penalties_saved') * PENALTY_SAVED_POINTS
+        + _column(rows, 'penalties_missed') * PENALTY_MISSED_POINTS
+    )
+    available_minutes = 90 * max(1, gameweeks_played)
+    minutes_share = np.clip(minutes / available_minutes, 0, 1)
+    per_90 = np.divide(event_points * 90, minutes, out=np.zeros_like(minutes), where=minutes > 0)
+    # no news is a 100% chance of playing
+    chance = _column(rows, 'chance_of_playing')
+    chance = np.where(np.isnan(chance), 1, chance / 100)
+
+    fixture_factor = 1 + (3 - difficulty[team]) * DIFFICULTY_STEP
+    projected = chance[:, None] * counts[team] * (
+        APPEARANCE_POINTS * minutes_share[:, None] + (per_90 * minutes_share)[:, None] * fixture_factor)
+    unproven = counts[team] * _column(rows, 'ep_next')[:, None]
+    return np.where((minutes > 0)[:, None], projected, unproven)
+
+
+def add_projections(rows, fixtures, gameweek_state):
+    """Sets ep_projected on each ingested Player row, the expected points over the next PROJECTION_GAMEWEEKS."""
+    if not rows:
+        return
+    matrix = FixtureMatrix(fixtures, num_teams=max(row['team_id'] for row in rows))
+    counts, difficulty = matrix.window(projection_gameweeks(gameweek_state))
+    played = (gameweek_state or {}).get('current_event') or 0
+    totals = project_points(rows, counts, difficulty, played).sum(axis=1)
+    for row, total in zip(rows, totals.round(2).tolist()):
+        row['ep_projected'] = total
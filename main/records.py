@@ -0,0 +1,66 @@
+from operator import attrgetter
+from .models import Player
+
+
+# every Player column that gets passed around outside of the database layer
+PLAYER_FIELDS = tuple(f.attname for f in Player._meta.concrete_fields if f.name not in ('id', 'updated'))
+
+
+class PlayerRecord:
+    """Lightweight, read-only-ish copy of a Player row.
+
+    Supports both attribute and item access so that it can be used anywhere a
+    serialised player dict was used previously (Lineup, Opt, templates).
+    """
+    __slots__ = PLAYER_FIELDS
+
+    _getters = {}
+
+    def __init__(self, **fields):
+        for name in PLAYER_FIELDS:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_model(cls, player):
+        record = cls.__new__(cls)
+        for name in PLAYER_FIELDS:
+            setattr(record, name, getattr(player, name))
+        return record
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in PLAYER_FIELDS
+
+    def __repr__(self):
+        return '<PlayerRecord {} ({})>'.format(self.name, self.player_id)
+
+    def to_dict(self, fields=None):
+        fields = tuple(fields) if fields else PLAYER_FIELDS
+        getter = self._getters.get(fields)
+        if getter is None:
+            getter = self._getters[fields] = attrgetter(*fields)
+        values = getter(self)
+        if len(fields) == 1:
+            values = (values,)
+        return dict(zip(fields, values))
+
+
+def records_from_models(players):
+    return [PlayerRecord.from_model(p) for p in players]
+
+
+def records_from_dicts(players):
+    return [p if isinstance(p, PlayerRecord) else PlayerRecord.from_dict(p) for p in players]
+
+
+def records_to_dicts(records, fields=None):
+    return [r.to_dict(fields) for r in records]
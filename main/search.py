@@ -0,0 +1,158 @@
+import json
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import unidecode
+
+from .models import Player
+from .data_version import get_data_version, refresh_data_version
+
+NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+# minimum share of the query's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+
+def normalise(text):
+    # lower case, strip accents and collapse punctuation/whitespace into single spaces
+    return NON_ALPHANUMERIC.sub(' ', unidecode.unidecode(text or '').lower()).strip()
+
+
+def _trigrams(text, padded=True):
+    grams = set()
+    for word in text.split():
+        if padded:
+            word = '  {} '.format(word)
+        for i in range(len(word) - 2):
+            grams.add(word[i:i + 3])
+    return grams
+
+
+class PlayerIndex:
+    """In-memory search index over player names and club short names.
+
+    Results are ranked in tiers:
+        1. the player's name starts with the query
+        2. a word in the player's name or club short name starts with the query
+        3. the player's name contains the query
+        4. the player's name shares enough trigrams with the query (typos)
+    and by ownership within each tier.
+    """
+
+    # columns of the compact index published to the browser
+    CLIENT_FIELDS = ('id', 'name', 'name_raw', 'club', 'position')
+
+    def __init__(self, players, version=None):
+        self.version = version
+        self._client_json = None
+
+        # each entry is (player_id, label, normalised names, popularity)
+        self.entries = []
+        self.client_rows = []
+        tokens = []
+        self.exact_trigrams = defaultdict(set)
+        self.padded_trigrams = defaultdict(set)
+
+        for idx, (player_id, name, name_raw, team_name_short, position, popularity) in enumerate(players):
+            keys = tuple(sorted({normalise(name_raw), normalise(name)}))
+            label = '{} ({})'.format(name, team_name_short)
+            self.entries.append((player_id, label, keys, popularity))
+            self.client_rows.append([player_id, name, normalise(name_raw), team_name_short, position])
+
+            words = set(' '.join(keys).split()) | set(keys) | {normalise(team_name_short)}
+            tokens += [(w, idx) for w in words if w]
+
+            for key in keys:
+                for gram in _trigrams(key, padded=False):
+                    self.exact_trigrams[gram].add(idx)
+                for gram in _trigrams(key):
+                    self.padded_trigrams[gram].add(idx)
+
+        # sorted so that prefix lookups are a binary search
+        self.tokens = sorted(tokens)
+
+    @classmethod
+    def from_database(cls, version=None):
+        players = Player.objects.values_list(
+            'player_id', 'name', 'name_raw', 'team_name_short', 'position', 'selected_by_percent').order_by('id')
+        return cls(players, version)
+
+    def to_client_json(self):
+        # one row per player, most owned first so the browser can stop filtering early
+        if self._client_json is None:
+            order = sorted(range(len(self.entries)), key=lambda idx: -self.entries[idx][3])
+            self._client_json = json.dumps({
+                'version': self.version,
+                'fields': self.CLIENT_FIELDS,
+                'players': [self.client_rows[idx] for idx in order],
+            }, separators=(',', ':'))
+        return self._client_json
+
+    def _prefix_matches(self, q):
+        matches = set()
+        i = bisect_left(self.tokens, (q, -1))
+        while i < len(self.tokens) and self.tokens[i][0].startswith(q):
+            matches.add(self.tokens[i][1])
+            i += 1
+        return matches
+
+    def _substring_matches(self, q):
+        grams = _trigrams(q, padded=False)
+        if not grams:
+            return set()
+        # intersect the rarest trigrams first to keep the candidate set small
+        postings = sorted((self.exact_trigrams.get(g, set()) for g in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return {idx for idx in candidates if any(q in key for key in self.entries[idx][2])}
+
+    def _fuzzy_matches(self, q):
+        grams = _trigrams(q)
+        scores = defaultdict(int)
+        for gram in grams:
+            for idx in self.padded_trigrams.get(gram, ()):
+                scores[idx] += 1
+        return {idx: n / len(grams) for idx, n in scores.items() if n / len(grams) >= FUZZY_THRESHOLD}
+
+    def search(self, query, limit=20):
+        q = normalise(query)
+        if not q:
+            return []
+
+        prefix = self._prefix_matches(q)
+        ranked = {}
+        for idx in prefix:
+            starts_name = any(key.startswith(q) for key in self.entries[idx][2])
+            ranked[idx] = (0 if starts_name else 1, 0)
+
+        if len(q) >= 3:
+            for idx in self._substring_matches(q):
+                ranked.setdefault(idx, (2, 0))
+            if len(ranked) < limit:
+                for idx, score in self._fuzzy_matches(q).items():
+                    ranked.setdefault(idx, (3, -score))
+
+        order = sorted(ranked, key=lambda idx: (ranked[idx], -self.entries[idx][3], self.entries[idx][1]))
+        return [self.entries[idx] for idx in order[:limit]]
+
+
+_index = None
+
+
+def get_player_index():
+    # rebuilds the index whenever a newer ingest is detected
+    global _index
+    version = get_data_version()
+    if _index is None or _index.version != version:
+        _index = PlayerIndex.from_database(version)
+    return _index
+
+
+def rebuild_player_index():
+    global _index
+    _index = PlayerIndex.from_database(refresh_data_version())
+    return _index
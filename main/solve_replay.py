@@ -0,0 +1,115 @@
+import ast
+import gzip
+import json
+import os
+import statistics
+
+import numpy as np
+import pulp
+
+from .models import Player
+from .opt import Opt
+from .solver_telemetry import model_mps
+
+
+def make_solver(name=None, options=()):
+    """A PuLP solver from its class name (e.g. PULP_CBC_CMD or GLPK_CMD) and key=value constructor options.
+
+    No name gives None, PuLP's default solver, which is what the site uses.
+    """
+    if not name:
+        if options:
+            raise ValueError('Solver options need a solver.')
+        return None
+    solver_class = getattr(pulp, name, None)
+    if not (isinstance(solver_class, type) and issubclass(solver_class, pulp.LpSolver)):
+        raise ValueError('{} is not a PuLP solver.'.format(name))
+    kwargs = {}
+    for option in options:
+        key, sep, raw = option.partition('=')
+        if not sep:
+            raise ValueError('Solver options look like key=value, not {}.'.format(option))
+        try:
+            kwargs[key] = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            kwargs[key] = raw
+    solver = solver_class(**kwargs)
+    if not solver.available():
+        raise ValueError('{} is not available on this machine.'.format(name))
+    return solver
+
+
+class ReplayOpt(Opt):
+    """An Opt built from a capture's inputs instead of the session and the Player table.
+
+    Replays are solved with the given solver and never recorded as solves of their own.
+    """
+
+    def __init__(self, inputs, solver=None):
+        self.inputs = inputs
+        self.solver = solver
+        team = [{'player_id': p_id, 'opt_cost': cost} for p_id, cost in inputs['team']]
+        super().__init__(
+            inputs['opt_param'], inputs['max_budget'], team, inputs['n_subs'], inputs['include'], inputs['exclude'],
+            inputs.get('risk'))
+
+    def get_players(self):
+        return [
+            Player(player_id=p_id, position=position, team_id=team_id, now_cost=now_cost,
+                   **{self.opt_parameter: param_value})
+            for p_id, position, team_id, now_cost, param_value in self.inputs['players']
+        ]
+
+    def get_risk_candidates(self):
+        # the captured players are already the candidates
+        return list(range(len(self.players)))
+
+    def get_scenario_points(self):
+        return np.array(self.inputs['scenarios'])
+
+    def record_solve(self):
+        pass
+
+
+def _outcome(status, objective):
+    return {'status': pulp.LpStatus.get(status, status), 'objective': objective}
+
+
+def replay_capture(capture, solver=None, repeat=3):
+    """Builds and solves a captured problem repeat times and compares the median timings with the original."""
+    inputs = json.loads(capture.inputs)
+    builds, solves = [], []
+    for _ in range(repeat):
+        opt = ReplayOpt(inputs, solver)
+        builds.append(opt.build_time)
+        solves.append(opt.solve_time)
+
+    solve = capture.solve
+    status = opt.prob.status
+    replay = dict(_outcome(status, pulp.value(opt.prob.objective) if status == 1 else None),
+                  build=statistics.median(builds), solve=statistics.median(solves))
+    original = dict(_outcome(solve.status, solve.objective), build=solve.build_time, solve=solve.solve_time)
+    return {
+        'capture': capture.pk,
+        'reason': capture.reason,
+        'opt_param': solve.opt_param,
+        'mode': solve.mode,
+        'include_count': solve.include_count,
+        'exclude_count': solve.exclude_count,
+        # the rebuilt model should be identical to the captured one, unless PuLP's MPS output has changed
+        'same_model': model_mps(opt.prob) == gzip.decompress(capture.mps),
+        'original': original,
+        'replay': replay,
+        'speedup': (original['build'] + original['solve']) / (replay['build'] + replay['solve']),
+    }
+
+
+def export_capture(capture, directory):
+    """Writes the captured model and inputs as capture_<id>.mps and capture_<id>.json, e.g. for a solver's own CLI."""
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, 'capture_{}'.format(capture.pk))
+    with open(base + '.mps', 'wb') as f:
+        f.write(gzip.decompress(capture.mps))
+    with open(base + '.json', 'w') as f:
+        f.write(capture.inputs)
+    return base + '.mps'
@@ -0,0 +1,150 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from pulp import value
+
+from .data_version import get_data_version
+from .models import SolveCapture, SolveRecord
+from .utils import percentile
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+TIMINGS = ('build', 'solve', 'total')
+
+
+def record_solve(opt):
+    """Stores the shape, size, timings and outcome of an Opt's solve, and captures it if it was slow or infeasible.
+
+    A failed write is logged rather than failing the simulation it belongs to.
+    """
+    status = opt.prob.status
+    try:
+        record = SolveRecord.objects.create(
+            opt_param=opt.opt_parameter,
+            mode=SolveRecord.WILDCARD if opt.is_wildcard else SolveRecord.TRANSFER,
+            num_subs=None if opt.is_wildcard else int(opt.n_subs),
+            max_budget=float(opt.max_budget),
+            include_count=len(opt.include or ()),
+            exclude_count=len(opt.exclude or ()),
+            players=len(opt.data_length),
+            variables=len(opt.prob.variables()),
+            constraints=len(opt.prob.constraints),
+            build_time=opt.build_time,
+            solve_time=opt.solve_time,
+            status=status,
+            objective=value(opt.prob.objective) if status == 1 else None,
+        )
+        if status != 1 and settings.CAPTURE_INFEASIBLE_SOLVES:
+            capture_solve(opt, record, SolveCapture.INFEASIBLE)
+        elif (opt.build_time + opt.solve_time) * 1000 >= settings.SLOW_SOLVE_MS:
+            capture_solve(opt, record, SolveCapture.SLOW)
+    except (DatabaseError, OSError):
+        logger.exception('Unable to record the solve of a %s simulation', opt.opt_parameter)
+
+
+def solve_inputs(opt):
+    """Everything needed to build opt's model again without the session or the Player table."""
+    return {
+        'opt_param': opt.opt_parameter,
+        'max_budget': float(opt.max_budget),
+        'n_subs': opt.n_subs,
+        'include': list(opt.include) if opt.include else None,
+        'exclude': list(opt.exclude) if opt.exclude else None,
+        'team': [[p['player_id'], float(p['opt_cost'])] for p in opt.team],
+        # candidate players in the order they became variables
+        'players': [
+            [p.player_id, p.position, p.team_id, float(p.now_cost), getattr(p, opt.opt_parameter)]
+            for p in opt.players
+        ],
+        # a risk-aware solve's sampled scenarios, in the players' order
+        'risk': opt.risk,
+        'scenarios': opt.scenario_points.tolist() if opt.risk else None,
+        'data_version': get_data_version(),
+    }
+
+
+def model_mps(prob):
+    # PuLP only writes MPS to a file
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.mps')
+        prob.writeMPS(path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def capture_solve(opt, record, reason):
+    SolveCapture.objects.create(
+        solve=record,
+        reason=reason,
+        inputs=json.dumps(solve_inputs(opt), separators=(',', ':')),
+        mps=gzip.compress(model_mps(opt.prob)),
+    )
+    # keep the latest captures only
+    stale = list(SolveCapture.objects.order_by('-created').values_list('pk', flat=True)[settings.SOLVE_CAPTURE_LIMIT:])
+    if stale:
+        SolveCapture.objects.filter(pk__in=stale).delete()
+
+
+def prune_solves():
+    """Deletes the SolveRecords older than SOLVE_RECORD_DAYS and all but the latest SOLVE_RECORD_LIMIT.
+
+    Records with a capture are kept until the capture itself is pruned. Returns how many were deleted.
+    """
+    uncaptured = SolveRecord.objects.filter(capture__isnull=True)
+    deleted, _ = uncaptured.filter(created__lt=timezone.now() - timedelta(days=settings.SOLVE_RECORD_DAYS)).delete()
+    stale = list(uncaptured.order_by('-created').values_list('pk', flat=True)[settings.SOLVE_RECORD_LIMIT:])
+    if stale:
+        deleted += SolveRecord.objects.filter(pk__in=stale).delete()[0]
+    return deleted
+
+
+def solve_latency_summary(since):
+    """Build, solve and total time percentiles (in ms) of the solves since a datetime, for each request shape.
+
+    A shape is the opt_param, mode and the number of included and excluded players. The
+    shapes are returned costliest first, by their 95th percentile total time.
+    """
+    groups = defaultdict(lambda: {
+        'count': 0, 'infeasible': 0, 'variables': 0, 'constraints': 0, 'build': [], 'solve': [], 'total': [],
+    })
+    records = SolveRecord.objects.filter(created__gte=since).values_list(
+        'opt_param', 'mode', 'include_count', 'exclude_count',
+        'variables', 'constraints', 'build_time', 'solve_time', 'status')
+    for opt_param, mode, include_count, exclude_count, variables, constraints, build, solve, status in records.iterator():
+        group = groups[(opt_param, mode, include_count, exclude_count)]
+        group['count'] += 1
+        group['infeasible'] += int(status != 1)
+        group['variables'] += variables
+        group['constraints'] += constraints
+        group['build'].append(build)
+        group['solve'].append(solve)
+        group['total'].append(build + solve)
+
+    summary = []
+    for (opt_param, mode, include_count, exclude_count), group in groups.items():
+        percentiles = {}
+        for timing in TIMINGS:
+            ordered = sorted(group[timing])
+            percentiles[timing] = [round(percentile(ordered, p) * 1000, 1) for p in PERCENTILES]
+        summary.append({
+            'opt_param': opt_param,
+            'mode': mode,
+            'include_count': include_count,
+            'exclude_count': exclude_count,
+            'count': group['count'],
+            'infeasible': group['infeasible'],
+            'variables': round(group['variables'] / group['count']),
+            'constraints': round(group['constraints'] / group['count']),
+            'percentiles': percentiles,
+        })
+    summary.sort(key=lambda s: s['percentiles']['total'][PERCENTILES.index(95)], reverse=True)
+    return summary
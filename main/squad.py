@@ -0,0 +1,58 @@
+from .models import Player
+from .lineup import Lineup
+
+
+def compact_squad(picks, bank=0.0):
+    """Builds the session representation of a squad from a list of FPL picks.
+
+    Only the player id, selling price and bench flag of each pick are kept, the
+    full player records are rebuilt from the Player table by load_squad.
+    A selling price of None means the player's current price should be used.
+    """
+    return {
+        'picks': [
+            [p['element'], p['selling_price'] / 10 if p.get('selling_price') is not None else None, p['position'] >= 12]
+            for p in picks
+        ],
+        'bank': bank,
+    }
+
+
+def load_squad(squad, param='ep_next'):
+    # look up selling price and bench flag by player_id
+    costs = {p_id: cost for p_id, cost, is_sub in squad['picks']}
+    is_sub_dict = {p_id: is_sub for p_id, cost, is_sub in squad['picks']}
+
+    # perform database lookup and add selling prices to the players
+    team_qs = Player.objects.filter(player_id__in=list(costs))
+    for player in team_qs:
+        cost = costs[player.player_id]
+        player.opt_cost = player.now_cost if cost is None else cost
+
+    # sort team into a usable form
+    l = Lineup(team_qs, param)
+    current_team = l.get_full_squad_sorted_by_position()
+    current_lineup = l.lineup_from_serialized_team(is_sub_dict)
+    return current_team, current_lineup
+
+
+def _squad_from_legacy_session(session):
+    # sessions created before the compact format held fully serialised players
+    sub_ids = [p['player_id'] for p in session['current_lineup']['subs']]
+    return {
+        'picks': [[int(p['player_id']), p['opt_cost'], p['player_id'] in sub_ids] for p in session['current_team']],
+        'bank': 0.0,
+    }
+
+
+def get_session_squad(session):
+    """Returns (current_team, current_lineup) for the logged in user, or (None, None)."""
+    squad = session.get('squad')
+    if squad is None and session.get('current_team') and session.get('current_lineup'):
+        squad = session['squad'] = _squad_from_legacy_session(session)
+        del session['current_team']
+        del session['current_lineup']
+
+    if not squad or not squad['picks']:
+        return None, None
+    return load_squad(squad)
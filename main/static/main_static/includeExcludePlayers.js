@@ -3,8 +3,8 @@ function getInfoFromPage() {
     var numSubs = $("#num-subs").val();
     var maxBudget = $("#max-budget").val();
     var optParam = $("#opt-param").val();
-    var include = $("#results-include .player-box").map(function () { return $(this).attr("data-id"); }).get();
-    var exclude = $("#results-exclude .player-box").map(function () { return $(this).attr("data-id"); }).get();
+    var include = $("#results-include .player-box").map(function () { return parseInt($(this).attr("data-id"), 10); }).get();
+    var exclude = $("#results-exclude .player-box").map(function () { return parseInt($(this).attr("data-id"), 10); }).get();
     var playerElements = {
         'num_subs': typeof numSubs == 'undefined' ? null : numSubs,
         'max_budget': maxBudget,
@@ -15,8 +15,94 @@ function getInfoFromPage() {
     return playerElements
 }
 
-// submit form to server via AJAX
-$(document).on('submit', '#post-form', function (e) {
+function escapeHtml(text) {
+    return $('<div>').text(text).html();
+}
+
+function playerLabel(p) {
+    return escapeHtml(p.name + ' (' + p.club + ')');
+}
+
+// builds the table rows for a list of player ids, highlighting players coming in or going out
+function squadRows(ids, scores, transfers) {
+    return ids.map(function (id) {
+        var p = playerById[id];
+        var rowClass = '';
+        if (transfers['in'].indexOf(id) > -1) {
+            rowClass = ' class="inbound"';
+        } else if (transfers['out'].indexOf(id) > -1) {
+            rowClass = ' class="outbound"';
+        }
+        return '<tr' + rowClass + '><td>' + playerLabel(p) + '</td><td>' + escapeHtml(p.position) + '</td><td>' +
+            escapeHtml(scores[id]) + '</td></tr>';
+    }).join('');
+}
+
+function squadTable(team, scores, transfers, paramVerbose) {
+    return '<h2>Your new lineup</h2><table class="table table-hover"><thead><tr><th>Player</th><th>Position</th>' +
+        '<th>' + escapeHtml(paramVerbose) + '</th></tr></thead><tbody>' +
+        squadRows(team.lineup, scores, transfers) +
+        '<tr><td><br /></td><td><br /></td><td><br /></td></tr>' +
+        squadRows(team.subs, scores, transfers) +
+        '</tbody></table>';
+}
+
+function simulationResults(response, paramVerbose) {
+    var current = response.current || { formation: [], score_11: '', score_tot: '', cost: '' };
+    var optimal = response.optimal;
+    var subs = response.transfers['out'].map(function (id, i) {
+        return '<tr><td>' + playerLabel(playerById[id]) + '</td><td>></td><td>' + playerLabel(playerById[response.transfers['in'][i]]) + '</td></tr>';
+    }).join('');
+    var detail = function (label, currentValue, optimalValue) {
+        return '<tr><td class="align-right">' + label + '</td><td>' + escapeHtml(currentValue) + '</td><td>' +
+            escapeHtml(optimalValue) + '</td></tr>';
+    };
+    return '<div class="simulation-results"><h2>Simulation complete!</h2><div class="row">' +
+        '<div class="col-xl-5 col-md-5"><table class="table table-nonfluid"><thead><th>Player Out</th><th></th><th>Player In</th></thead>' +
+        '<tbody>' + subs + '</tbody></table></div>' +
+        '<div class="col-xl-6 col-md-6"><table class="table sim-details table-nonfluid"><thead><th></th>' +
+        '<th class="align-center">Current Team</th><th class="align-center">New Team</th></thead><tbody>' +
+        detail('Formation:', current.formation.join('-'), optimal.formation.join('-')) +
+        detail('Starting 11 total ' + escapeHtml(paramVerbose) + ':', current.score_11, optimal.score_11) +
+        detail('Full squad total ' + escapeHtml(paramVerbose) + ':', current.score_tot, optimal.score_tot) +
+        detail('Squad cost (max budget £' + escapeHtml(response.max_budget) + '):', '£' + current.cost, '£' + optimal.cost) +
+        '</tbody></table></div></div></div>';
+}
+
+// the current squad table comes with the page, so each run only marks who goes out and fills in the scores
+function updateCurrentSquad(response, paramVerbose) {
+    var section = $("#current-team-section");
+    section.find("th.score").text(paramVerbose);
+    section.find("tr[data-id]").each(function () {
+        var id = parseInt($(this).attr("data-id"), 10);
+        $(this).toggleClass("outbound", response.transfers['out'].indexOf(id) > -1);
+        $(this).find("td.score").text(id in response.scores ? response.scores[id] : '');
+    });
+}
+
+function showSimulationError(data) {
+    alert(data.responseJSON.error + '\n\nError code: ' + data.status);
+}
+
+// submit form to the JSON API and build the tables from the player index
+function submitSimulation() {
+    var paramVerbose = $("#opt-param option:selected").text();
+    $.ajax({
+        type: 'POST',
+        url: '/api/v1/simulate/',
+        contentType: 'application/json',
+        data: JSON.stringify(getInfoFromPage()),
+        success: function (response) {
+            $("#simulation-results-section").html(simulationResults(response, paramVerbose));
+            $("#optimal-team-section").html(squadTable(response.optimal, response.scores, response.transfers, paramVerbose));
+            updateCurrentSquad(response, paramVerbose);
+        },
+        error: showSimulationError
+    });
+}
+
+// without the player index the server renders the sections instead
+function submitSimulationForm() {
     $.ajax({
         type: 'POST',
         url: '/ajax/receive_sim_form/',
@@ -30,10 +116,17 @@ $(document).on('submit', '#post-form', function (e) {
             $("#optimal-team-section").html(response.optimal_squad_table);
             $("#current-team-section").html(response.current_squad_table);
         },
-        error: function (data) {
-            alert(data.responseJSON.error + '\n\nError code: ' + data.status);
-        }
+        error: showSimulationError
     });
+}
+
+// submit form once the player index has loaded
+$(document).on('submit', '#post-form', function (e) {
+    if (playerIndexRequest) {
+        playerIndexRequest.done(submitSimulation).fail(submitSimulationForm);
+    } else {
+        submitSimulationForm();
+    }
 });
 
 // remove list-item elements if close button is clicked
@@ -41,10 +134,68 @@ $('body').on('click', '.close-button', function () {
     $(this).parent('div').remove();
 });
 
-// powers the autocomplete ajax calls
+// lower case and strip accents so that e.g. "sanchez" matches "Sánchez"
+function normaliseName(text) {
+    return text.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase().replace(/[^a-z0-9]+/g, ' ').trim();
+}
+
+// compact player index published by the server, fetched once per data version and cached by the browser
+var playerIndex = null;
+var playerById = {};
+var playerIndexRequest = null;
+var AUTOCOMPLETE_LIMIT = 20;
+
+function loadPlayerIndex() {
+    if (typeof playerIndexUrl == 'undefined') {
+        return;
+    }
+    playerIndexRequest = $.getJSON(playerIndexUrl, function (data) {
+        var fields = data.fields;
+        playerIndex = data.players.map(function (row) {
+            var p = {};
+            fields.forEach(function (field, i) { p[field] = row[i]; });
+            p.label = p.name + ' (' + p.club + ')';
+            p.keys = [normaliseName(p.name), p.name_raw];
+            p.words = (p.keys.join(' ') + ' ' + p.club.toLowerCase()).split(' ');
+            playerById[p.id] = p;
+            return p;
+        });
+    });
+}
+
+// filters the player index locally, name prefixes first then word prefixes then substrings.
+// players are already sorted by ownership so each tier keeps that order
+function searchPlayerIndex(term) {
+    var q = normaliseName(term);
+    var tiers = [[], [], []];
+    playerIndex.forEach(function (p) {
+        if (p.keys.some(function (key) { return key.indexOf(q) == 0; })) {
+            tiers[0].push(p);
+        } else if (p.words.some(function (word) { return word.indexOf(q) == 0; })) {
+            tiers[1].push(p);
+        } else if (p.keys.some(function (key) { return key.indexOf(q) > -1; })) {
+            tiers[2].push(p);
+        }
+    });
+    return tiers[0].concat(tiers[1], tiers[2]).slice(0, AUTOCOMPLETE_LIMIT).map(function (p) {
+        return { 'label': p.label, 'player_id': p.id };
+    });
+}
+
+// use the local index when it has loaded, otherwise ask the server
+function autocompleteSource(request, response) {
+    if (playerIndex) {
+        response(searchPlayerIndex(request.term));
+    } else {
+        $.getJSON("/ajax/get_autocomplete_players/", { term: request.term }, response);
+    }
+}
+
+// powers the autocomplete calls
 $(function () {
+    loadPlayerIndex();
     $("#include").autocomplete({
-        source: "/ajax/get_autocomplete_players/",
+        source: autocompleteSource,
         minLength: 2,
         select: function (event, ui) { //item selected
             appendPlayer(event, ui, "include");
@@ -53,7 +204,7 @@ $(function () {
         },
     });
     $("#exclude").autocomplete({
-        source: "/ajax/get_autocomplete_players/",
+        source: autocompleteSource,
         minLength: 2,
         select: function (event, ui) { //item selected
             appendPlayer(event, ui, "exclude");
@@ -0,0 +1,78 @@
+import os
+import re
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.finders import AppDirectoriesFinder, FileSystemFinder
+
+TEMPLATE_STATIC_RE = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]\s*%}""")
+CSS_URL_RE = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)""")
+
+# the project's own static directories, files anywhere else (e.g. the admin) are always collected
+FILTERED_PREFIXES = ('base_static/', 'main_static/')
+
+
+def _template_dirs():
+    for engine in settings.TEMPLATES:
+        yield from engine.get('DIRS', [])
+    for app_config in apps.get_app_configs():
+        yield os.path.join(app_config.path, 'templates')
+
+
+def _css_references(path):
+    # files referenced with url() from a stylesheet, relative to the stylesheet
+    location = finders.find(path)
+    if not location:
+        return []
+    with open(location, encoding='utf-8', errors='ignore') as f:
+        css = f.read()
+
+    references = []
+    for url in CSS_URL_RE.findall(css):
+        if url.startswith(('data:', 'http:', 'https:', '//', '#')):
+            continue
+        url = url.split('?')[0].split('#')[0]
+        references.append(os.path.normpath(os.path.join(os.path.dirname(path), url)).replace(os.sep, '/'))
+    return references
+
+
+@lru_cache(maxsize=None)
+def referenced_static_files():
+    """Returns every static path used by a template, plus the files those stylesheets reference."""
+    pending = []
+    for template_dir in _template_dirs():
+        for root, dirs, files in os.walk(template_dir):
+            for filename in files:
+                with open(os.path.join(root, filename), encoding='utf-8', errors='ignore') as f:
+                    pending += TEMPLATE_STATIC_RE.findall(f.read())
+
+    referenced = set()
+    while pending:
+        path = pending.pop()
+        if path in referenced:
+            continue
+        referenced.add(path)
+        if path.endswith('.css'):
+            pending += _css_references(path)
+    return frozenset(referenced)
+
+
+class ReferencedFilesMixin:
+    # only lists files that are actually used so collectstatic skips unminified copies, source maps etc.
+    def list(self, ignore_patterns):
+        referenced = referenced_static_files()
+        for path, storage in super().list(ignore_patterns):
+            normalised = path.replace(os.sep, '/')
+            if normalised.startswith(FILTERED_PREFIXES) and normalised not in referenced:
+                continue
+            yield path, storage
+
+
+class ReferencedFileSystemFinder(ReferencedFilesMixin, FileSystemFinder):
+    pass
+
+
+class ReferencedAppDirectoriesFinder(ReferencedFilesMixin, AppDirectoriesFinder):
+    pass
@@ -0,0 +1,21 @@
+from django.template.backends import django as django_backend
+
+from .timing import profile_step
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        # included templates render inside their parent, so only the outermost render is timed
+        with profile_step('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, with the time spent rendering added to the request's profile."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,69 @@
+from operator import attrgetter, itemgetter
+from django import template
+from django.core.cache import cache
+from django.utils.formats import localize
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from main.data_version import get_data_version
+
+register = template.Library()
+
+ROW_CACHE_TIMEOUT = 60 * 60
+
+_accessors = {}
+
+
+def get_accessor(param, player):
+    """Returns a compiled getter for param that suits the type of player, built once per param."""
+    kind = itemgetter if isinstance(player, dict) else attrgetter
+    accessor = _accessors.get((kind, param))
+    if accessor is None:
+        accessor = _accessors[(kind, param)] = kind('player_id', 'name', 'team_name_short', 'position', param)
+    return accessor
+
+
+def _render_cells(values):
+    player_id, name, team_name_short, position, value = values
+    # escape rather than format_html, which costs several times as much per cell
+    return '<td>{} ({})</td><td>{}</td><td>{}</td>'.format(
+        escape(name), escape(team_name_short), escape(position), escape(localize(value)))
+
+
+@register.simple_tag
+def squad_rows(players, param, inbound=None, outbound=None):
+    """Renders a table row for each player showing their name, position and param value.
+
+    The cells only depend on the player's data, so they are cached per player, param and
+    data version, and only the inbound/outbound highlighting is worked out per request.
+    """
+    if not players:
+        return ''
+    inbound = inbound or ()
+    outbound = outbound or ()
+
+    # resolve the attribute lookup once for the whole table
+    value_of = get_accessor(param, players[0])
+    values = [value_of(p) for p in players]
+
+    version = get_data_version()
+    keys = ['squad_row:{}:{}:{}'.format(version, param, v[0]) for v in values]
+    cells = cache.get_many(keys)
+
+    missing = {}
+    for key, v in zip(keys, values):
+        if key not in cells:
+            cells[key] = missing[key] = _render_cells(v)
+    if missing:
+        cache.set_many(missing, ROW_CACHE_TIMEOUT)
+
+    rows = []
+    for key, v in zip(keys, values):
+        if v[0] in inbound:
+            row_class = ' class="inbound"'
+        elif v[0] in outbound:
+            row_class = ' class="outbound"'
+        else:
+            row_class = ''
+        rows.append('<tr{}>{}</tr>'.format(row_class, cells[key]))
+    return mark_safe('\n'.join(rows))
@@ -1,3 +1,588 @@
-from django.test import TestCase
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .benchmarks import _simulate, compare_reports, measure
+from .compression import MIN_COMPRESS_LENGTH, accepted_encodings, compress
+from .entry_cache import (
+    DEADLINE_UPDATE_WINDOW, ENTRY_MAX_TTL, ENTRY_SHORT_TTL, FINISHED_PICKS_TTL, PICKS_TTL, entry_ttl, picks_ttl,
+)
+from .fixture_matrix import FixtureMatrix
+from .history import gameweek_history, record_history
+from .league import ownership
+from .loadtest import VirtualUser
+from .models import Player, PlayerHistory, PriceTick
+from .montecarlo import squad_totals
+from .price_tracker import _unpack, record_tick
+from .search import PlayerIndex
+from .squad import compact_squad, get_session_squad
+from .templatetags.player_rows import squad_rows
+from .views import _bulk_upsert
+
+# a legal squad: 2 goalkeepers, 5 defenders, 5 midfielders and 3 forwards
+SQUAD_POSITIONS = ['G'] * 2 + ['D'] * 5 + ['M'] * 5 + ['F'] * 3
+
+
+def create_players(positions=SQUAD_POSITIONS):
+    # player i + 1 is at positions[i], ep_next rising with the id so lineups are deterministic
+    return [
+        Player.objects.create(
+            player_id=i + 1, name='Player{}'.format(i + 1), position=position, team_id=i % 5 + 1,
+            now_cost=5.0 + i / 10, ep_next=float(i + 1))
+        for i, position in enumerate(positions)
+    ]
+
+
+def fpl_picks(players, bench=(2, 7, 12, 15)):
+    # my-team style picks, squad positions 12 to 15 are the bench
+    starters = [p for p in players if p.player_id not in bench]
+    subs = [p for p in players if p.player_id in bench]
+    return [
+        {'element': p.player_id, 'position': position, 'selling_price': int(p.now_cost * 10) - 1}
+        for position, p in enumerate(starters + subs, 1)
+    ]
+
+
+class SessionSquadTests(TestCase):
+
+    def setUp(self):
+        self.players = create_players()
+
+    def test_compact_squad_keeps_ids_selling_prices_and_bench_flags(self):
+        picks = fpl_picks(self.players)
+        picks[0]['selling_price'] = None
+        squad = compact_squad(picks, bank=1.5)
+
+        self.assertEqual(squad['bank'], 1.5)
+        self.assertEqual(len(squad['picks']), 15)
+        self.assertEqual(squad['picks'][0], [picks[0]['element'], None, False])
+        self.assertEqual(squad['picks'][1], [picks[1]['element'], picks[1]['selling_price'] / 10, False])
+        self.assertEqual({p_id for p_id, cost, is_sub in squad['picks'] if is_sub}, {2, 7, 12, 15})
+
+    def test_get_session_squad_rebuilds_the_squad(self):
+        picks = fpl_picks(self.players)
+        picks[0]['selling_price'] = None
+        session = {'squad': compact_squad(picks)}
+
+        current_team, current_lineup = get_session_squad(session)
+
+        self.assertEqual([p.position for p in current_team], SQUAD_POSITIONS)
+        self.assertEqual(len(current_lineup['lineup']), 11)
+        self.assertEqual({int(p.player_id) for p in current_lineup['subs']}, {2, 7, 12, 15})
+        self.assertEqual(current_lineup['formation'], [1, 4, 4, 2])
+        # a pick without a selling price is valued at the player's current price
+        costs = {int(p.player_id): p.opt_cost for p in current_team}
+        self.assertEqual(costs[picks[0]['element']], Player.objects.get(player_id=picks[0]['element']).now_cost)
+        self.assertEqual(costs[picks[1]['element']], picks[1]['selling_price'] / 10)
+
+    def test_get_session_squad_without_a_squad(self):
+        self.assertEqual(get_session_squad({}), (None, None))
+        self.assertEqual(get_session_squad({'squad': {'picks': [], 'bank': 0.0}}), (None, None))
+
+    def test_get_session_squad_migrates_legacy_sessions(self):
+        bench = {2, 7, 12, 15}
+        serialised = [{'player_id': str(p.player_id), 'opt_cost': p.now_cost - 0.1} for p in self.players]
+        session = {
+            'current_team': serialised,
+            'current_lineup': {'subs': [p for p in serialised if int(p['player_id']) in bench]},
+        }
+
+        current_team, current_lineup = get_session_squad(session)
+
+        self.assertNotIn('current_team', session)
+        self.assertNotIn('current_lineup', session)
+        self.assertEqual(len(session['squad']['picks']), 15)
+        self.assertEqual({int(p.player_id) for p in current_lineup['subs']}, bench)
+        costs = {int(p.player_id): p.opt_cost for p in current_team}
+        self.assertAlmostEqual(costs[1], self.players[0].now_cost - 0.1)
+
+
+class PlayerIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PlayerIndex([
+            (1, 'Alisson', 'Alisson Ramses Becker', 'LIV', 'G', 20.0),
+            (2, 'Salah', 'Mohamed Salah', 'LIV', 'M', 40.0),
+            (3, 'Sarr', 'Ismaïla Sarr', 'WAT', 'M', 5.0),
+            (4, 'Salisu', 'Mohammed Salisu', 'SOU', 'D', 1.0),
+            (5, 'Alli', 'Dele Alli', 'TOT', 'M', 8.0),
+            (6, 'Khan', 'Amin Ali Khan', 'BHA', 'F', 2.0),
+        ])
+
+    def search_ids(self, query, **kwargs):
+        return [player_id for player_id, label, keys, popularity in self.index.search(query, **kwargs)]
+
+    def test_tiers(self):
+        # name prefix, then word prefix, then substring, then a fuzzy match, whatever the ownership
+        self.assertEqual(self.search_ids('ali'), [1, 6, 4, 5])
+
+    def test_ownership_orders_a_tier(self):
+        self.assertEqual(self.search_ids('sa'), [2, 3, 4])
+        self.assertEqual(self.search_ids('sa', limit=2), [2, 3])
+
+    def test_club_prefix_and_no_substrings_for_short_queries(self):
+        self.assertEqual(self.search_ids('li'), [2, 1])
+
+    def test_accents_and_typos(self):
+        self.assertEqual(self.search_ids('Ismaïla'), [3])
+        self.assertEqual(self.search_ids('salha')[:1], [2])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search_ids(' - '), [])
+
+
+class SquadRowsTests(SimpleTestCase):
+    PLAYERS = [
+        {'player_id': 1, 'name': 'Salah', 'team_name_short': 'LIV', 'position': 'M', 'ep_next': 6.5},
+        {'player_id': 2, 'name': "O'Brien", 'team_name_short': 'NOR', 'position': 'D', 'ep_next': 2.0},
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, version='v1', **kwargs):
+        with mock.patch('main.templatetags.player_rows.get_data_version', return_value=version):
+            return squad_rows(self.PLAYERS, 'ep_next', **kwargs)
+
+    def test_rows(self):
+        self.assertEqual(self.render(inbound=[2], outbound=[1]).split('\n'), [
+            '<tr class="outbound"><td>Salah (LIV)</td><td>M</td><td>6.5</td></tr>',
+            '<tr class="inbound"><td>O&#39;Brien (NOR)</td><td>D</td><td>2.0</td></tr>',
+        ])
+        self.assertEqual(squad_rows([], 'ep_next'), '')
+
+    def test_cells_are_cached_per_data_version(self):
+        with mock.patch('main.templatetags.player_rows._render_cells', return_value='<td></td>') as render_cells:
+            self.render()
+            self.render(inbound=[1])
+            self.assertEqual(render_cells.call_count, 2)
+            self.render(version='v2')
+            self.assertEqual(render_cells.call_count, 4)
+
+
+class CompressionTests(SimpleTestCase):
+
+    def request(self, accept_encoding=None):
+        headers = {} if accept_encoding is None else {'HTTP_ACCEPT_ENCODING': accept_encoding}
+        return RequestFactory().get('/', **headers)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings(self.request('gzip, deflate, br')), {'gzip', 'deflate', 'br'})
+        self.assertEqual(accepted_encodings(self.request('GZIP;q=1.0, identity; q=0.5')), {'gzip', 'identity'})
+        self.assertEqual(accepted_encodings(self.request()), {''})
+
+    def test_compress_gzips_large_responses(self):
+        body = b'x' * (MIN_COMPRESS_LENGTH * 2)
+        response = compress(self.request('gzip'), HttpResponse(body))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertLess(len(response.content), len(body))
+
+    def test_compress_leaves_small_or_unaccepted_responses(self):
+        self.assertFalse(compress(self.request('gzip'), HttpResponse(b'x')).has_header('Content-Encoding'))
+        body = b'x' * (MIN_COMPRESS_LENGTH * 2)
+        response = compress(self.request('identity'), HttpResponse(body))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+
+
+@override_settings(SIMULATION_WORKERS=0, SIMULATION_API_TOKENS=['script-token'])
+class SimulateApiTests(TestCase):
+    WILDCARD = {'opt_param': 'ep_next', 'max_budget': 100}
+    # fails validation, so throttling can be tested without solving
+    INVALID = {'opt_param': 'unknown', 'max_budget': 100}
+
+    def setUp(self):
+        create_players()
+        caches['upstream'].clear()
+        self.client = Client(enforce_csrf_checks=True)
+
+    def simulate(self, body, **headers):
+        return self.client.post('/api/v1/simulate/', json.dumps(body), content_type='application/json', **headers)
+
+    def test_returns_ids_and_numbers(self):
+        response = self.simulate(dict(self.WILDCARD, html=True), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {
+            'api_version', 'data_version', 'param', 'risk', 'max_budget', 'current', 'optimal', 'transfers', 'scores'})
+        self.assertIsNone(data['current'])
+        optimal = data['optimal']
+        self.assertEqual(sorted(optimal['lineup'] + optimal['subs']), list(range(1, 16)))
+        self.assertIsInstance(optimal['captain'], int)
+        self.assertEqual(data['scores'], {str(p.player_id): p.ep_next for p in Player.objects.all()})
+
+    def test_authenticates_without_a_csrf_token(self):
+        self.assertEqual(self.simulate(self.INVALID).status_code, 401)
+        self.assertEqual(self.simulate(self.INVALID, HTTP_AUTHORIZATION='Bearer wrong-token').status_code, 401)
+        # a bearer token that doesn't match isn't rescued by the ajax header
+        self.assertEqual(self.simulate(
+            self.INVALID, HTTP_AUTHORIZATION='Bearer wrong-token', HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 401)
+        self.assertEqual(self.simulate(self.INVALID, HTTP_AUTHORIZATION='Bearer script-token').status_code, 400)
+        self.assertEqual(self.simulate(self.INVALID, HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 400)
+
+    @override_settings(SIMULATION_RATE_LIMIT=2)
+    def test_throttles_each_client(self):
+        for status in (400, 400, 429):
+            response = self.simulate(self.INVALID, HTTP_AUTHORIZATION='Bearer script-token')
+            self.assertEqual(response.status_code, status)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # a browser is counted separately from the script
+        self.assertEqual(self.simulate(self.INVALID, HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 400)
+
+    @override_settings(SIMULATION_RATE_LIMIT=0)
+    def test_sim_form_is_not_throttled(self):
+        self.client = Client()
+        response = self.client.post('/ajax/receive_sim_form/', {
+            'action': 'post',
+            'selected': json.dumps(dict(self.WILDCARD, num_subs=None, include=None, exclude=None)),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('optimal_squad_table', response.json())
+
+
+class EntryCacheTtlTests(SimpleTestCase):
+    NOW = 1600000000.0
+
+    def state(self, current_event=5, current_finished=False, since_deadline=DEADLINE_UPDATE_WINDOW * 2,
+              until_deadline=ENTRY_MAX_TTL * 2):
+        return {
+            'current_event': current_event,
+            'current_finished': current_finished,
+            'current_deadline': self.NOW - since_deadline,
+            'next_deadline': self.NOW + until_deadline if until_deadline is not None else None,
+        }
+
+    def test_entry_ttl_is_short_without_a_next_deadline(self):
+        self.assertEqual(entry_ttl(None, self.NOW), ENTRY_SHORT_TTL)
+        self.assertEqual(entry_ttl(self.state(until_deadline=None), self.NOW), ENTRY_SHORT_TTL)
+        self.assertEqual(entry_ttl(self.state(until_deadline=-1), self.NOW), ENTRY_SHORT_TTL)
+
+    def test_entry_ttl_is_short_just_after_a_deadline(self):
+        self.assertEqual(entry_ttl(self.state(since_deadline=60), self.NOW), ENTRY_SHORT_TTL)
+
+    def test_entry_ttl_lasts_until_the_next_deadline(self):
+        self.assertEqual(entry_ttl(self.state(), self.NOW), ENTRY_MAX_TTL)
+        self.assertEqual(entry_ttl(self.state(until_deadline=1000.5), self.NOW), 1000)
+
+    def test_picks_ttl(self):
+        self.assertEqual(picks_ttl(4, self.state()), FINISHED_PICKS_TTL)
+        self.assertEqual(picks_ttl(5, self.state()), PICKS_TTL)
+        self.assertEqual(picks_ttl(5, self.state(current_finished=True)), FINISHED_PICKS_TTL)
+        self.assertEqual(picks_ttl(4, None), PICKS_TTL)
+
+
+class BulkUpsertTests(TestCase):
+
+    def setUp(self):
+        self.players = create_players(['M', 'M'])
+
+    def test_writes_only_new_and_changed_rows(self):
+        rows = [
+            {'player_id': 1, 'name': 'Player1', 'ep_next': 9.0},
+            # unchanged once converted to the field's type
+            {'player_id': 2, 'name': 'Player2', 'ep_next': '2.0'},
+            {'player_id': 3, 'name': 'Player3', 'position': 'F'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(_bulk_upsert(Player, 'player_id', rows), 2)
+
+        updated = {p.player_id: p for p in Player.objects.all()}
+        self.assertEqual(updated[1].ep_next, 9.0)
+        self.assertGreater(updated[1].updated, self.players[0].updated)
+        self.assertEqual(updated[2].updated, self.players[1].updated)
+        self.assertEqual(updated[3].position, 'F')
+
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"ep_next"', updates[0])
+        self.assertIn('"updated"', updates[0])
+        self.assertNotIn('"name"', updates[0])
+
+    def test_unchanged_rows_are_not_written(self):
+        rows = [{'player_id': p.player_id, 'name': p.name, 'ep_next': p.ep_next} for p in self.players]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(_bulk_upsert(Player, 'player_id', rows), 0)
+        self.assertEqual(len(queries.captured_queries), 1)
+
+
+class PlayerHistoryTests(TestCase):
+
+    def setUp(self):
+        create_players(['M'])
+
+    def ingest(self, gameweek, **stats):
+        # record_history runs before the rows are written to the Player table
+        recorded = record_history(gameweek, [dict(player_id=1, **stats)])
+        Player.objects.filter(player_id=1).update(**stats)
+        return recorded
+
+    def latest_stats(self):
+        return json.loads(PlayerHistory.objects.latest('id').stats)
+
+    def test_full_snapshot_then_changes(self):
+        self.assertEqual(self.ingest(5, ep_next=3.0, form=1.5), 1)
+        self.assertEqual(self.latest_stats(), {'ep_next': 3.0, 'form': 1.5})
+
+        self.assertEqual(self.ingest(5, ep_next=3.0, form=1.5), 0)
+
+        self.assertEqual(self.ingest(5, ep_next=4.0, form=1.5), 1)
+        self.assertEqual(self.latest_stats(), {'ep_next': 4.0})
+
+        # a new gameweek starts with a full snapshot again
+        self.assertEqual(self.ingest(6, ep_next=4.0, form=1.5), 1)
+        self.assertEqual(self.latest_stats(), {'ep_next': 4.0, 'form': 1.5})
+
+    def test_untracked_fields_are_left_out(self):
+        self.ingest(5, name='Renamed', ep_next=3.0)
+        self.assertEqual(self.latest_stats(), {'ep_next': 3.0})
+
+    def test_gameweek_history_rebuilds_each_gameweek(self):
+        self.ingest(5, ep_next=3.0, form=1.5)
+        self.ingest(5, ep_next=4.0, form=1.5)
+        self.ingest(6, ep_next=5.0, form=2.0)
+        self.ingest(7, ep_next=6.0, form=2.0)
+
+        self.assertEqual(gameweek_history([1], 5, 6), {1: {
+            5: {'ep_next': 4.0, 'form': 1.5},
+            6: {'ep_next': 5.0, 'form': 2.0},
+        }})
+        self.assertEqual(gameweek_history([1], 7), {1: {7: {'ep_next': 6.0, 'form': 2.0}}})
+        self.assertEqual(gameweek_history([2], 5), {})
+
+
+class BenchmarkTests(TestCase):
+
+    def test_measure_runs_setup_before_each_repeat(self):
+        calls = []
+        result = measure(calls.append, repeat=3, number=2, setup=lambda: (len(calls),))
+        self.assertEqual(calls, [0, 0, 2, 2, 4, 4])
+        self.assertEqual((result['repeat'], result['number']), (3, 2))
+        self.assertLessEqual(result['min'], result['median'])
+        self.assertLessEqual(result['median'], result['max'])
+
+    def test_compare_reports(self):
+        report = {'results': {'opt.wildcard': {'median': 0.3}, 'opt.transfers': {'median': 0.1}}}
+        baseline = {'results': {'opt.wildcard': {'median': 0.2}}}
+        self.assertEqual(compare_reports(report, baseline), [
+            ('opt.wildcard', 0.2, 0.3, 0.3 / 0.2 - 1),
+            ('opt.transfers', None, 0.1, None),
+        ])
+
+    @override_settings(SIMULATION_WORKERS=0, SIMULATION_RATE_LIMIT=1)
+    def test_simulations_repeat_past_the_rate_limit(self):
+        squad = compact_squad(fpl_picks(create_players()))
+        caches['upstream'].clear()
+        for _ in range(3):
+            _simulate(squad, None)
+
+
+class VirtualUserTests(SimpleTestCase):
+
+    def autocomplete(self, body):
+        user = VirtualUser('http://testserver/', 1, random.Random(0))
+        user.http = mock.Mock()
+        user.http.cookies = {'csrftoken': 'token'}
+        user.http.get.return_value = response = mock.Mock(status_code=200)
+        response.json.side_effect = lambda: json.loads(body)
+        return user.autocomplete(), user.http.get.call_args
+
+    def test_autocomplete_is_sent_as_ajax(self):
+        ok, call = self.autocomplete('[{"label": "Salah (LIV)", "player_id": 1}]')
+        self.assertTrue(ok)
+        self.assertEqual(call[0], ('http://testserver/ajax/get_autocomplete_players/',))
+        self.assertEqual(call[1]['headers']['X-Requested-With'], 'XMLHttpRequest')
+
+    def test_autocomplete_fail_body_is_an_error(self):
+        self.assertFalse(self.autocomplete('fail')[0])
+
+
+class MetricsTests(TestCase):
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_not_served_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True)
+    def test_served_without_a_token_in_development(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='metrics-token')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+def fixture(event, team_h, team_a, team_h_difficulty=3, team_a_difficulty=3):
+    return {
+        'event': event, 'team_h': team_h, 'team_a': team_a,
+        'team_h_difficulty': team_h_difficulty, 'team_a_difficulty': team_a_difficulty,
+    }
+
+
+class FixtureMatrixTests(SimpleTestCase):
+
+    def setUp(self):
+        self.matrix = FixtureMatrix([
+            fixture(1, 1, 2), fixture(1, 3, 4),
+            # clubs 2 and 4 blank
+            fixture(2, 1, 3),
+            # club 1 doubles and club 3 blanks
+            fixture(3, 1, 2, 2, 4), fixture(3, 4, 1, 3, 5),
+            # not scheduled yet
+            fixture(None, 2, 4),
+        ], version='v1', num_teams=5)
+
+    def test_blank_and_double_gameweeks(self):
+        self.assertEqual({gw: self.matrix.blank[gw] for gw in (2, 3)}, {2: [2, 4], 3: [3]})
+        self.assertNotIn(1, self.matrix.blank)
+        # every club blanks the gameweeks that have no fixtures yet
+        self.assertEqual(self.matrix.blank[4], [1, 2, 3, 4])
+        self.assertEqual(self.matrix.double, {3: [1]})
+        # club 5 has no fixtures at all so it isn't reported as blanking
+        self.assertEqual(self.matrix.teams, [1, 2, 3, 4])
+
+    def test_counts_and_mean_difficulty(self):
+        counts, difficulty = self.matrix.window([1, 2, 3])
+        self.assertEqual(counts.shape, (6, 3))
+        self.assertEqual(counts[1].tolist(), [1, 1, 2])
+        self.assertEqual(counts[4].tolist(), [1, 0, 1])
+        self.assertEqual(difficulty[1, 2], 3.5)
+        self.assertEqual(difficulty[2, 1], 0)
+
+    def test_fixtures_and_ticker(self):
+        self.assertEqual(self.matrix.fixtures(1, 3), [(2, True, 2), (4, False, 5)])
+        self.assertEqual(self.matrix.fixtures(3, 3), [])
+        self.assertEqual(self.matrix.ticker([2, 3])[2], [[], [(1, False, 4)]])
+
+
+class SquadTotalsTests(SimpleTestCase):
+    # a 4-4-2 starting eleven scoring 1 to 11 points, then the bench
+    POSITIONS = ['G'] + ['D'] * 4 + ['M'] * 4 + ['F'] * 2 + ['G', 'D', 'M', 'F']
+    BENCH_POINTS = [10, 20, 30, 40]
+    CAPTAIN = 10
+    VICE_CAPTAIN = 9
+
+    def totals(self, *absent):
+        # one scenario per tuple of squad indices who didn't play
+        points = np.array([list(range(1, 12)) + self.BENCH_POINTS] * len(absent), dtype=np.int16)
+        played = np.ones(points.shape, dtype=bool)
+        for scenario, players in enumerate(absent):
+            points[scenario, list(players)] = 0
+            played[scenario, list(players)] = False
+        return squad_totals(points, played, self.POSITIONS, self.CAPTAIN, self.VICE_CAPTAIN)
+
+    def test_no_subs_when_everyone_plays(self):
+        total, captain_bonus = self.totals(())
+        self.assertEqual(total.tolist(), [66])
+        self.assertEqual(captain_bonus.tolist(), [list(range(1, 12))])
+
+    def test_goalkeeper_only_replaced_by_goalkeeper(self):
+        total, _ = self.totals((0,), (0, 11))
+        self.assertEqual(total.tolist(), [66 - 1 + 10, 66 - 1])
+
+    def test_subs_keep_the_formation_valid(self):
+        total, _ = self.totals(
+            # the bench defender and forward come on, the midfielder would leave no forward
+            (9, 10),
+            # the midfielder comes on, the forward would leave two defenders
+            (1, 2, 12),
+            # subs come on in bench order
+            (5,),
+        )
+        self.assertEqual(total.tolist(), [66 - 10 - 11 + 20 + 40, 66 - 2 - 3 + 30, 66 - 6 + 20])
+
+    def test_captain_falls_back_to_vice_captain(self):
+        _, captain_bonus = self.totals(
+            (self.CAPTAIN,), (self.VICE_CAPTAIN,), (self.CAPTAIN, self.VICE_CAPTAIN), (0,))
+        self.assertEqual(captain_bonus[:, self.CAPTAIN].tolist(), [10, 11, 0, 11])
+        self.assertEqual(captain_bonus[:, self.VICE_CAPTAIN].tolist(), [10, 11, 0, 10])
+        # any other starter who didn't play falls back to the vice captain
+        self.assertEqual(captain_bonus[:, 0].tolist(), [1, 1, 1, 10])
+
+
+def element(player_id, transfers_in=0, transfers_out=0, cost_change=0, selected_by_percent=10.0):
+    return {
+        'id': player_id, 'transfers_in_event': transfers_in, 'transfers_out_event': transfers_out,
+        'cost_change_event': cost_change, 'selected_by_percent': selected_by_percent,
+    }
+
+
+@override_settings(PRICE_CHANGE_THRESHOLD=0.05, PRICE_CHANGE_MIN_TRANSFERS=5000, PRICE_RATE_HOURS=6,
+                   PRICE_CHANGE_HOUR=1, PRICE_TICK_GAMEWEEKS=3)
+class PriceTickTests(TestCase):
+    # three hours before the day's price changes
+    START = datetime(2020, 1, 1, 22, tzinfo=timezone.utc)
+    TOTAL_PLAYERS = 1000000
+
+    def record(self, elements, gameweek=5, hours=0):
+        with mock.patch('django.utils.timezone.now', return_value=self.START + timedelta(hours=hours)):
+            return record_tick(elements, gameweek, self.TOTAL_PLAYERS)
+
+    def test_packs_transfers_since_the_previous_tick(self):
+        self.record([element(2), element(1, 3000, 500)])
+        self.record([element(2, 6000, 0, cost_change=1), element(1, 4000, 500)], hours=1)
+
+        first, second = PriceTick.objects.order_by('id')
+        self.assertEqual(_unpack(first, 'player_ids').tolist(), [1, 2])
+        self.assertEqual(_unpack(first, 'transfers_in').tolist(), [3000, 0])
+        self.assertEqual(_unpack(first, 'net_transfers').tolist(), [2500, 0])
+        self.assertEqual(_unpack(second, 'transfers_in').tolist(), [1000, 6000])
+        self.assertEqual(_unpack(second, 'transfers_out').tolist(), [0, 0])
+        self.assertEqual(_unpack(second, 'cost_change').tolist(), [0, 1])
+        # net transfers restart when the price changes
+        self.assertEqual(_unpack(second, 'net_transfers').tolist(), [3500, 0])
+
+    def test_progress(self):
+        # 10% of a million players own them, so 5000 net transfers make a change
+        self.assertEqual(self.record([element(1, 3000, 500)]), {1: 50.0})
+        # 1000 an hour for the two hours left until the change
+        self.assertEqual(self.record([element(1, 4000, 500)], hours=1), {1: 110.0})
+
+    def test_counters_reset_at_a_new_gameweek(self):
+        self.record([element(1, 3000, 500)], gameweek=5)
+        self.record([element(1, 200, 0)], gameweek=6, hours=1)
+        tick = PriceTick.objects.latest('id')
+        self.assertEqual(_unpack(tick, 'transfers_in').tolist(), [200])
+        self.assertEqual(_unpack(tick, 'net_transfers').tolist(), [2700])
+
+    def test_old_gameweeks_are_pruned(self):
+        for hours, gameweek in enumerate((1, 2, 4)):
+            self.record([element(1)], gameweek=gameweek, hours=hours)
+        self.assertEqual(list(PriceTick.objects.order_by('id').values_list('gameweek', flat=True)), [2, 4])
+
+
+class OwnershipTests(SimpleTestCase):
+
+    def test_shares_of_the_squads(self):
+        squads = [
+            [{'element': 1, 'multiplier': 2}, {'element': 2, 'multiplier': 1}, {'element': 3, 'multiplier': 0}],
+            [{'element': 1, 'multiplier': 2}, {'element': 2, 'multiplier': 1}],
+            # triple captain
+            [{'element': 1, 'multiplier': 3}],
+            [{'element': 1, 'multiplier': 0}],
+        ]
+        player_ids, shares = ownership(squads)
+
+        self.assertEqual(player_ids.tolist(), [1, 2, 3])
+        self.assertEqual(shares['ownership'].tolist(), [100, 50, 25])
+        self.assertEqual(shares['starts'].tolist(), [75, 50, 0])
+        self.assertEqual(shares['captaincy'].tolist(), [75, 0, 0])
+        self.assertEqual(shares['effective_ownership'].tolist(), [175, 50, 0])
+
+    def test_no_squads(self):
+        player_ids, shares = ownership([])
+        self.assertEqual(player_ids.tolist(), [])
+        self.assertEqual(shares['effective_ownership'].tolist(), [])
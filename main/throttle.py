@@ -0,0 +1,38 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+
+def _client(request):
+    # the caller found by api_view, else the session, or the address of a client without one
+    return (getattr(request, 'api_client', None)
+            or request.session.session_key or request.META.get('REMOTE_ADDR', ''))
+
+
+def throttle_simulations(view):
+    """Answers 429 once a client has asked for SIMULATION_RATE_LIMIT simulations in SIMULATION_RATE_WINDOW seconds.
+
+    Counts are kept per API token or session and fixed window in the upstream cache, the one every
+    worker shares (see settings_common), so the limit holds across workers.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        window = settings.SIMULATION_RATE_WINDOW
+        now = time.time()
+        key = 'throttle:simulate:{}:{}'.format(_client(request), int(now // window))
+        cache = caches['upstream']
+        cache.add(key, 0, window)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # expired between add and incr
+            count = 1
+        if count > settings.SIMULATION_RATE_LIMIT:
+            response = JsonResponse({'error': 'Too many simulations, please wait a moment and try again.'}, status=429)
+            response['Retry-After'] = int(window - now % window) + 1
+            return response
+        return view(request, *args, **kwargs)
+    return wrapper
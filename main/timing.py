@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_local = threading.local()
+
+
+class RequestProfile:
+    """Total time and number of calls of each kind of work done for one request, e.g. db, http or template.
+
+    Work is added from whichever thread does it, see activate_profile().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.components = {}
+
+    def add(self, name, duration, count=1):
+        with self.lock:
+            total = self.components.setdefault(name, [0.0, 0])
+            total[0] += duration
+            total[1] += count
+
+    def merge(self, components):
+        # e.g. the components of a profile sent back from a worker process
+        for name, (duration, count) in components.items():
+            self.add(name, duration, count)
+
+    def as_dict(self):
+        with self.lock:
+            return {name: {'dur': round(duration * 1000, 1), 'count': count}
+                    for name, (duration, count) in self.components.items()}
+
+    def server_timing(self):
+        with self.lock:
+            return ', '.join(
+                '{};dur={:.1f};desc="{} call{}"'.format(name, duration * 1000, count, '' if count == 1 else 's')
+                for name, (duration, count) in self.components.items())
+
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def activate_profile(profile):
+    """Adds the work done by this thread inside the block to profile."""
+    previous = current_profile()
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
+
+
+@contextmanager
+def profile_step(name):
+    """Adds the time spent in the block to the current request's profile, does nothing outside a request."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def track_queries(profile):
+    """Adds every query made by this thread inside the block to profile as db."""
+    def execute(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            profile.add('db', time.perf_counter() - start)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(execute))
+        yield
+
+
+class StepTimer:
+    """Records how long each named step of a request took.
+
+    Steps may be timed from several threads at once, the results can be sent to the
+    browser as a Server-Timing header.
+    """
+
+    def __init__(self):
+        self.steps = []
+        # work handed to other threads through timed() still counts towards the request's profile
+        self.profile = current_profile()
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def timed(self, name, func, *args, **kwargs):
+        # runs func(*args, **kwargs) as a step, handy for handing to an executor
+        with activate_profile(self.profile), self.step(name):
+            return func(*args, **kwargs)
+
+    def as_dict(self):
+        return {name: round(duration * 1000, 1) for name, duration in self.steps}
+
+    def server_timing(self):
+        return ', '.join('{};dur={:.1f}'.format(name, duration * 1000) for name, duration in self.steps)
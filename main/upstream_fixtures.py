@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+import re
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import urlparse
+
+from .http_client import fpl_client
+
+
+def fixture_name(endpoint, url):
+    # the query string is left out, fplstatistics' URLs carry a cache buster
+    path = urlparse(url).path.strip('/')
+    return '{}__{}.json.gz'.format(endpoint, re.sub(r'[^A-Za-z0-9_-]+', '_', path))
+
+
+class RecordingClient:
+    """Fetches from upstream as normal and saves every JSON payload into directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recorded = []
+        os.makedirs(directory, exist_ok=True)
+
+    def get_json(self, endpoint, url, session=None, **kwargs):
+        data = fpl_client.request(endpoint, 'GET', url, session=session, **kwargs).json()
+        name = fixture_name(endpoint, url)
+        with gzip.open(os.path.join(self.directory, name), 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+        self.recorded.append(name)
+        return data
+
+
+class ReplayClient:
+    """Serves JSON payloads saved by RecordingClient, never touches the network."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.payloads = {}
+
+    def get_json(self, endpoint, url, session=None, **kwargs):
+        name = fixture_name(endpoint, url)
+        if name not in self.payloads:
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                raise FileNotFoundError('No recorded payload for {} {} ({})'.format(endpoint, url, path))
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                self.payloads[name] = f.read()
+        # parsed on every call, like a real response would be
+        return json.loads(self.payloads[name])
+
+
+@contextmanager
+def recording(directory):
+    client = RecordingClient(directory)
+    with mock.patch.object(fpl_client, 'get_json', client.get_json):
+        yield client
+
+
+@contextmanager
+def replaying(directory):
+    """Serves every upstream call from recorded payloads."""
+    client = ReplayClient(directory)
+    with mock.patch.object(fpl_client, 'get_json', client.get_json):
+        yield client
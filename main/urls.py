@@ -9,9 +9,14 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('logout/', views.logout, name='logout'),
     path('ajax/get_autocomplete_players/', views.get_autocomplete_players, name='get_autocomplete_players'),
+    path('ajax/player_index/<str:version>/', views.player_index, name='player_index'),
     path('ajax/receive_sim_form/', views.receive_sim_form, name='receive_sim_form'),
+    path('api/v1/simulate/', views.simulate_api, name='simulate_api'),
+    path('api/v1/fixtures/', views.fixture_ticker, name='fixture_ticker'),
+    path('api/v1/leagues/', views.league_ownership_api, name='league_ownership'),
     path('ajax/login_creds/', views.login_creds_ajax, name='login_creds'),
     path('ajax/login_id/', views.login_id_ajax, name='login_id'),
     path('db_operations_211091', views.db_operations, name='db_operations'),
     path('refresh_team/', views.refresh_team, name='refresh_team'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,34 +1,67 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.core import serializers
 from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
-from django.db.models import Q
-from django.db import transaction
+from django.db.models import Sum
+from django.db import DatabaseError, transaction
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST
 
 import json
 import requests
 from urllib.parse import urlparse, parse_qs
 
 from .opt import Opt
-from .models import Player, Team
+from .models import Fixture, Player, Team
 from .forms import LoginCredsForm, LoginIdForm, WildcardForm, TransferForm, LineupForm
 from .fpl import PlayerTable, TeamTable
+from .league import league_ownership
 from .lineup import Lineup
+from .montecarlo import MAX_RISK, RISK_PARAM, squad_distribution
+from .records import records_from_dicts
+from .squad import compact_squad, get_session_squad, load_squad
+from .search import get_player_index, rebuild_player_index
+from .data_version import get_data_version
+from .api_auth import api_view
+from .compression import compress_response
+from .http_client import fpl_client
+from .throttle import throttle_simulations
+from .timing import StepTimer
+from .entry_cache import get_entry, get_entry_picks, get_gameweek_state, set_gameweek_state
+from .fixture_matrix import LAST_GAMEWEEK, get_fixture_matrix
+from .history import HISTORY_FIELDS, record_history
+from .projection import add_projections, projection_gameweeks
+from .ingest_metrics import PROMETHEUS_CONTENT_TYPE, ingest_run, ingest_stage, prometheus_metrics
+from .price_tracker import record_tick
+from .solver_telemetry import prune_solves
 from .utils import OPT_PARAM_CHOICES
+from .workers import ClosingThreadPoolExecutor, run_cpu_bound
+
+AUTOCOMPLETE_LIMIT = 20
+PLAYER_INDEX_MAX_AGE = 60 * 60 * 24 * 365
+SIMULATION_API_VERSION = 1
+INFEASIBLE_ERROR = 'Unable to find a feasible solution with the provided parameters. Please check and try again.'
+
+# shared by the login views to make independent upstream calls at the same time
+upstream_executor = ClosingThreadPoolExecutor(max_workers=16, thread_name_prefix='upstream')
 
 
 def prepare_team_for_template(lineup, param):
     SORT_ORDER = {'G': 0, 'D': 1, 'M': 2, 'F': 3}
-    lineup['lineup'] = sorted(lineup['lineup'], key=lambda x: SORT_ORDER[x['position']])
-    lineup['subs'] = sorted(lineup['subs'], key=lambda x: SORT_ORDER[x['position']])
+    lineup = dict(lineup)
+    lineup['lineup'] = sorted(records_from_dicts(lineup['lineup']), key=lambda x: SORT_ORDER[x.position])
+    lineup['subs'] = sorted(records_from_dicts(lineup['subs']), key=lambda x: SORT_ORDER[x.position])
 
-    score_11 = sum(p[param] for p in lineup['lineup'])
-    score_subs = sum(p[param] for p in lineup['subs'])
+    score_11 = sum(getattr(p, param) for p in lineup['lineup'])
+    score_subs = sum(getattr(p, param) for p in lineup['subs'])
     score_tot = score_11 + score_subs
 
-    captain = max(lineup['lineup'], key=lambda x:x[param])
+    captain = max(lineup['lineup'], key=lambda x: getattr(x, param))
     lineup.update({
-        'captain': captain['name'],
+        'captain': captain.name,
+        'captain_id': captain.player_id,
         'param': param,
         'score_11': round(score_11, 1),
         'score_tot': round(score_tot, 1),
@@ -46,8 +79,7 @@ def login_id_ajax(request):
 
             if team_info:
                 request.session['team_name'] = team_info['team_name']
-                request.session['current_team'] = team_info['current_team']
-                request.session['current_lineup'] = team_info['current_lineup']
+                request.session['squad'] = team_info['squad']
                 request.session['total_money_available'] = team_info['total_money_available']
                 return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
             else:
@@ -69,10 +101,12 @@ def login_creds_ajax(request):
             # login success, save variables to session
             request.session['username'] = username
             request.session['password'] = password
-            request.session['current_team'] = team_info['current_team']
-            request.session['current_lineup'] = team_info['current_lineup']
+            request.session['team_name'] = team_info['team_name']
+            request.session['squad'] = team_info['squad']
             request.session['total_money_available'] = team_info['total_money_available']
-            return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
+            response = HttpResponseRedirect(request.META.get('HTTP_REFERER'))
+            response['Server-Timing'] = team_info['timer'].server_timing()
+            return response
         else:
             response = JsonResponse({
                 'error': 'Unable to login with the provided credentials.'
@@ -95,28 +129,20 @@ def receive_sim_form(request):
         exclude = simulation_data['exclude']
 
         # get current team and lineup
-        current_team = request.session['current_team']
-        current_lineup = request.session['current_lineup']
-        current_lineup = prepare_team_for_template(current_lineup, opt_param)
+        current_team, current_lineup = get_session_squad(request.session)
 
         # run optimisation
-        sim = Opt(opt_param, max_budget, current_team, num_subs, include, exclude)
+        results = run_cpu_bound(
+            run_simulation, opt_param, max_budget, current_team, current_lineup, num_subs, include, exclude)
 
         # check for optimisation error
-        if sim.prob.status != 1:
+        if not results:
             response = JsonResponse({
-                'error': 'Unable to find a feasible solution with the provided parameters. Please check and try again.'
+                'error': INFEASIBLE_ERROR
             })
             response.status_code = 500
             return response
-
-        # extract results from optimisation and generate lineup
-        optimal_team = sim.results
-        l = Lineup(optimal_team, opt_param)
-        lineup_opt = l.choose_optimal_lineup()
-
-        # extract subs based on difference between current and opt squad
-        outbound, inbound = extract_subs_from_lineups(current_team, l.team_serialized)
+        current_lineup, lineup_opt, outbound, inbound = results
 
         # convert opt_param into something more readable
         opt_param_verbose = OPT_PARAM_CHOICES[[x[0] for x in OPT_PARAM_CHOICES].index(opt_param)][1]
@@ -164,17 +190,124 @@ def receive_sim_form(request):
     return response
 
 
+def run_simulation(opt_param, max_budget, current_team, current_lineup, num_subs=None, include=None, exclude=None,
+                   risk=None):
+    # returns the current lineup, optimal lineup and the players out and in, or None if there is no feasible squad
+    current_team = current_team or []
+    sim = Opt(opt_param, max_budget, current_team, num_subs, include, exclude, risk)
+    if sim.prob.status != 1:
+        return None
+
+    # extract results from optimisation and generate lineup
+    l = Lineup(sim.results, opt_param)
+    lineup_opt = l.choose_optimal_lineup()
+
+    # extract subs based on difference between current and opt squad
+    outbound, inbound = extract_subs_from_lineups(current_team, l.team_serialized)
+
+    if current_lineup:
+        current_lineup = prepare_team_for_template(current_lineup, opt_param)
+    return current_lineup, lineup_opt, outbound, inbound
+
+
+def _lineup_summary(lineup):
+    return {
+        'formation': lineup['formation'],
+        'lineup': [p.player_id for p in lineup['lineup']],
+        'subs': [p.player_id for p in lineup['subs']],
+        'captain': lineup['captain_id'],
+        'score_11': lineup['score_11'],
+        'score_tot': lineup['score_tot'],
+        'cost': round(lineup['cost'], 1),
+    }
+
+
+@require_POST
+@api_view
+@throttle_simulations
+@compress_response
+def simulate_api(request):
+    """JSON version of receive_sim_form that returns player ids instead of rendered tables.
+
+    The request body is a JSON object with opt_param, max_budget and optionally num_subs,
+    include and exclude. Clients without a session can send their own squad as a list of
+    [player_id, selling_price, is_sub] picks. Player details are looked up by the client
+    from the player index. Callers authenticate with an API token or the site's session
+    instead of a CSRF token (see api_auth.py), so scripts can call it too. A risk up to
+    MAX_RISK trades expected points for a better CVaR (ep_next only), and risk or
+    distribution adds the sampled distribution of each lineup's points next gameweek.
+    """
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        opt_param = data['opt_param']
+        max_budget = float(data['max_budget'])
+        num_subs = float(data['num_subs']) if data.get('num_subs') else None
+        include = [int(p_id) for p_id in data.get('include') or ()] or None
+        exclude = [int(p_id) for p_id in data.get('exclude') or ()] or None
+        risk = float(data['risk']) if data.get('risk') else None
+        distribution = bool(data.get('distribution')) or bool(risk)
+        picks = [
+            [int(p_id), None if cost is None else float(cost), bool(is_sub)]
+            for p_id, cost, is_sub in data.get('squad') or ()
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid simulation parameters.'}, status=400)
+
+    if opt_param not in dict(OPT_PARAM_CHOICES):
+        return JsonResponse({'error': 'Unknown optimisation parameter.'}, status=400)
+
+    if risk is not None and not (0 < risk <= MAX_RISK and opt_param == RISK_PARAM):
+        return JsonResponse({'error': 'Risk must be between 0 and {}, with {}.'.format(MAX_RISK, RISK_PARAM)}, status=400)
+
+    if picks:
+        current_team, current_lineup = load_squad({'picks': picks, 'bank': 0.0})
+    else:
+        current_team, current_lineup = get_session_squad(request.session)
+
+    if num_subs and not current_team:
+        return JsonResponse({'error': 'A squad is required for a transfer simulation.'}, status=400)
+
+    results = run_cpu_bound(
+        run_simulation, opt_param, max_budget, current_team, current_lineup, num_subs, include, exclude, risk)
+    if not results:
+        return JsonResponse({'error': INFEASIBLE_ERROR}, status=422)
+    current_lineup, lineup_opt, outbound, inbound = results
+
+    # the chosen parameter's value for every player mentioned in the response
+    players = lineup_opt['lineup'] + lineup_opt['subs']
+    if current_lineup:
+        players += current_lineup['lineup'] + current_lineup['subs']
+
+    summaries = {
+        'current': _lineup_summary(current_lineup) if current_lineup else None,
+        'optimal': _lineup_summary(lineup_opt),
+    }
+    if distribution:
+        summaries['optimal']['distribution'] = squad_distribution(lineup_opt, opt_param)
+        if current_lineup:
+            summaries['current']['distribution'] = squad_distribution(current_lineup, opt_param)
+
+    return JsonResponse({
+        'api_version': SIMULATION_API_VERSION,
+        'data_version': get_data_version(),
+        'param': opt_param,
+        'risk': risk,
+        'max_budget': max_budget,
+        'current': summaries['current'],
+        'optimal': summaries['optimal'],
+        'transfers': {
+            'out': [p['player_id'] for p in outbound],
+            'in': [p['player_id'] for p in inbound],
+        },
+        'scores': {p.player_id: getattr(p, opt_param) for p in players},
+    })
+
+
 def get_autocomplete_players(request):
     if request.is_ajax():
         q = request.GET.get('term', '')
-        players = Player.objects.filter(
-            Q(name__icontains=q) | 
-            Q(name_raw__icontains=q)
-            )
         results = []
-        for pl in players:
-            label = pl.name + " (" + pl.team_name_short + ')'
-            player_id = pl.player_id
+        for player_id, label, keys, popularity in get_player_index().search(q, AUTOCOMPLETE_LIMIT):
             results.append({
                 'label': label,
                 'player_id': player_id,
@@ -186,52 +319,130 @@ def get_autocomplete_players(request):
     return HttpResponse(data, mimetype)
 
 
+@compress_response
+def player_index(request, version):
+    # compact list of every player used by the browser to filter autocomplete results locally
+    index = get_player_index()
+    response = HttpResponse(index.to_client_json(), content_type='application/json')
+    if version == index.version:
+        # the url changes with every ingest so the response can be cached indefinitely
+        patch_cache_control(response, public=True, max_age=PLAYER_INDEX_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+@compress_response
+def fixture_ticker(request):
+    """Every club's opponents and difficulties over the coming gameweeks, with the blank and double gameweeks.
+
+    Starts after the current gameweek unless from is given, and runs to the gameweek to, or
+    covers PROJECTION_GAMEWEEKS unless gameweeks is. Read from the fixture matrix, so it
+    doesn't query the database.
+    """
+    try:
+        first = int(request.GET['from']) if 'from' in request.GET else None
+        last = int(request.GET['to']) if 'to' in request.GET else None
+        horizon = int(request.GET.get('gameweeks') or settings.PROJECTION_GAMEWEEKS)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid gameweeks.'}, status=400)
+    if first is None:
+        first = ((get_gameweek_state() or {}).get('current_event') or 0) + 1
+    elif not 1 <= first <= LAST_GAMEWEEK:
+        return JsonResponse({'error': 'Invalid gameweeks.'}, status=400)
+    if last is not None:
+        # a range that runs backwards or past the end of the season
+        if not first <= last <= LAST_GAMEWEEK:
+            return JsonResponse({'error': 'Invalid gameweeks.'}, status=400)
+        horizon = last - first + 1
+    if horizon < 1:
+        return JsonResponse({'error': 'Invalid gameweeks.'}, status=400)
+
+    matrix = get_fixture_matrix()
+    gameweeks = projection_gameweeks({'current_event': first - 1}, horizon)
+    return JsonResponse({
+        'api_version': SIMULATION_API_VERSION,
+        'data_version': matrix.version,
+        'gameweeks': gameweeks,
+        # [opponent, is_home, difficulty] of each fixture in each gameweek
+        'teams': matrix.ticker(gameweeks),
+        'blank': {gw: matrix.blank[gw] for gw in gameweeks if gw in matrix.blank},
+        'double': {gw: matrix.double[gw] for gw in gameweeks if gw in matrix.double},
+    })
+
+
+@compress_response
+def league_ownership_api(request):
+    """Ownership, captaincy and effective ownership (in %) of every player in a classic league's squads this gameweek.
+
+    The league is given by league, and entry adds that squad's multiplier and exposure to
+    each player, for transfer and captaincy choices relative to the league. Player details
+    are looked up by the client from the player index, as for simulate_api.
+    """
+    try:
+        league_id = int(request.GET['league'])
+        entry = int(request.GET['entry']) if request.GET.get('entry') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Invalid league or entry.'}, status=400)
+
+    try:
+        result = league_ownership(league_id, entry)
+    except (requests.RequestException, ValueError):
+        # upstream unavailable or not returning JSON
+        return JsonResponse({'error': 'Unable to reach FPL, please try again.'}, status=502)
+    except DatabaseError:
+        # the upstream cache unavailable
+        return JsonResponse({'error': 'Unable to load the league, please try again.'}, status=503)
+    if result is None:
+        return JsonResponse({'error': 'League not found.'}, status=404)
+
+    result['api_version'] = SIMULATION_API_VERSION
+    return JsonResponse(result)
+
+
 def wildcard(request):
     squad = None
     wildcard_form = WildcardForm()
 
     # if user is logged in then populate max budget field with user's max budget and get current squad
-    if 'current_lineup' in request.session:
-        if request.session['current_lineup']:
-            wildcard_form.fields['max_budget'].initial = request.session['total_money_available']
-            current_lineup = request.session['current_lineup']
+    current_team, current_lineup = get_session_squad(request.session)
+    if current_lineup:
+        wildcard_form.fields['max_budget'].initial = request.session['total_money_available']
 
     context = {
         'wildcard_form': wildcard_form,
         'wildcard': 'active',
         'squad': squad,
+        'current_lineup': current_lineup,
+        'player_index_version': get_data_version(),
     }
 
     return render(request, 'wildcard.html', context)
 
 
 def transfers(request):
-    current_lineup = None
     transfer_form = TransferForm()
 
     # if user is logged in then populate max budget field with user's max budget and get current squad
-    if 'current_lineup' in request.session:
-        if request.session['current_lineup']:
-            transfer_form.fields['max_budget'].initial = request.session['total_money_available']
-            current_lineup = request.session['current_lineup']
+    current_team, current_lineup = get_session_squad(request.session)
+    if current_lineup:
+        transfer_form.fields['max_budget'].initial = request.session['total_money_available']
 
     context = {
         'transfer_form': transfer_form,
         'transfers': 'active',
         'current_lineup': current_lineup,
+        'player_index_version': get_data_version(),
     }
 
     return render(request, 'transfers.html', context)
 
 
 def lineup(request):
-    current_lineup = None
     lineup_form = LineupForm()
 
     # if user is logged in then get current squad
-    if 'current_lineup' in request.session:
-        if request.session['current_lineup']:
-            current_lineup = request.session['current_lineup']
+    current_team, current_lineup = get_session_squad(request.session)
 
     context = {
         'lineup_form': lineup_form,
@@ -265,20 +476,16 @@ def about(request):
     return render(request, 'about.html', context)
 
 
-def _get_is_sub_dict(t):
-    # extract subs from team_info
-    is_sub_dict = {}
-    for p in t:
-        if p['position'] >= 12:
-            is_sub_dict[p['element']] = True
-        else:
-            is_sub_dict[p['element']] = False
-    return is_sub_dict
-
-
 def get_team_info_from_creds(request, username, password):
-    session = requests.Session()
-    login, session = log_into_fpl(session, username, password)
+    timer = StepTimer()
+
+    # each login gets its own cookie jar but shares the client's connection pool
+    session = fpl_client.new_session()
+    try:
+        with timer.step('fpl_login'):
+            login, session = log_into_fpl(session, username, password)
+    except requests.RequestException:
+        return None
 
     if login.status_code == 200:
 
@@ -290,99 +497,77 @@ def get_team_info_from_creds(request, username, password):
 
         if login_status == 'success':
 
-            # get account specific info
+            # get account specific info. my-team holds both the picks and the bank balance so it is only
+            # downloaded once, and the public entry summary (for the team name) is fetched alongside it
             try:
-                account_id = get_unique_account_id(session)
+                with timer.step('fpl_me'):
+                    account_id = get_unique_account_id(session)
+                my_team = upstream_executor.submit(timer.timed, 'fpl_my_team', get_my_team, session, account_id)
+                entry = upstream_executor.submit(timer.timed, 'fpl_entry', _get_team_info, account_id)
+                my_team, entry = my_team.result(), entry.result()
+                team_info = my_team['picks']
+                bank_balance = my_team['transfers']['bank'] / 10
             except TypeError:
                 # return some sort of error
                 return None
+            except (requests.RequestException, ValueError, DatabaseError):
+                # upstream unavailable or not returning JSON, or the upstream cache unavailable
+                return None
 
-            team_info = get_team(session, account_id)
-            bank_balance = get_bank_balance(session, account_id)
-
-            # extract subs from team_info
-            is_sub_dict = _get_is_sub_dict(team_info)
-
-            # construct a player_id list for database lookup
-            lookup_ids = [p['element'] for p in team_info]
-            request.session['current_team_ids'] = lookup_ids
-
-            # perform database lookup
-            team_qs = Player.objects.filter(player_id__in=lookup_ids)
-
-            # look up player selling price by player_id and add to team list
-            for player in team_qs:
-                player.opt_cost = next(
-                    (p['selling_price'] for p in team_info if str(p['element']) == player.player_id), None) / 10
+            # only the ids, selling prices and bench flags are kept in the session
+            squad = compact_squad(team_info, bank_balance)
 
             # get total money available based on squad and bank balance
-            squad_value = round(sum(p.opt_cost for p in team_qs), 1)
+            squad_value = round(sum(cost for p_id, cost, is_sub in squad['picks']), 1)
             total_money_available = round(squad_value + bank_balance, 1)
 
-            # sort team into a usable form
-            l = Lineup(team_qs, 'ep_next')
-            current_team = l.get_full_squad_sorted_by_position()
-            current_lineup = l.lineup_from_serialized_team(is_sub_dict)
-
             return {
-                'current_team': current_team,
-                'current_lineup': current_lineup,
+                'team_name': entry.get('name', '') if isinstance(entry, dict) else '',
+                'squad': squad,
                 'bank_balance': bank_balance,
                 'squad_value': squad_value,
                 'total_money_available': total_money_available,
+                'timer': timer,
                 }
     
 
-def _get_team_info(session, unique_id):
-    url_template = 'https://fantasy.premierleague.com/api/entry/{}/'
-    return json.loads(session.get(url_template.format(unique_id)).text)
+def _get_team_info(unique_id):
+    return get_entry(unique_id)
 
 
-def _get_last_event_info(session, unique_id, event):
-    squad_url_template = 'https://fantasy.premierleague.com/api/entry/{u_id}/event/{ev}/picks/#/'
-    return json.loads(session.get(squad_url_template.format(u_id=unique_id, ev=event)).text)
+def _get_last_event_info(unique_id, event):
+    return get_entry_picks(unique_id, event)
 
 
 def get_squad_from_id(request, unique_id):
     # 475068
-    session = requests.Session()
-    team_info = _get_team_info(session, unique_id)
-    
     try:
+        unique_id = int(unique_id)
+    except ValueError:
+        return None
+
+    try:
+        team_info = _get_team_info(unique_id)
         current_event = team_info['current_event']
+        last_event_info = _get_last_event_info(unique_id, current_event)
     except TypeError:
         # GAME UPDATING ERROR CATCHING
         return None
     except KeyError:
         # ID NOT FOUND
         return None
+    except (requests.RequestException, ValueError, DatabaseError):
+        # upstream unavailable or not returning JSON, or the upstream cache unavailable
+        return None
 
-    last_event_info = _get_last_event_info(session, unique_id, current_event)
-    lookup_ids = [p['element'] for p in last_event_info['picks']]
-    request.session['current_team_ids'] = lookup_ids
-
-    is_sub_dict = _get_is_sub_dict(last_event_info['picks'])
-
-    # perform database lookup
-    team_qs = Player.objects.filter(player_id__in=lookup_ids)
-
-    # look up player selling price by player_id and add to team list
-    tot = 0
-    for player in team_qs:
-        player.opt_cost = player.now_cost
-        tot += player.now_cost
-
-    l = Lineup(team_qs, 'ep_next')
-    current_team = l.get_full_squad_sorted_by_position()
-    current_lineup = l.lineup_from_serialized_team(is_sub_dict)
-
-    # serialize queryset so that it can be pass to template
-    team = json.loads(serializers.serialize('json', team_qs))
+    # selling prices are not public so the players' current prices are used instead
+    squad = compact_squad(last_event_info['picks'])
+    lookup_ids = [p_id for p_id, cost, is_sub in squad['picks']]
+    tot = Player.objects.filter(player_id__in=lookup_ids).aggregate(tot=Sum('now_cost'))['tot'] or 0
 
     return {
         'team_name': team_info['name'],
-        'current_team': current_team,
-        'current_lineup': current_lineup,
+        'squad': squad,
         'total_money_available': tot if tot > 100 else 100,
     }
 
@@ -416,112 +601,234 @@ def refresh_team(request):
         password = request.session['password']
         team_info = get_team_info_from_creds(request, username, password)
         if team_info:
-            request.session['current_team'] = team_info['current_team']
-            request.session['current_lineup'] = team_info['current_lineup']
+            request.session['squad'] = team_info['squad']
             request.session['total_money_available'] = team_info['total_money_available']
     else:
         print('refresh team error')
     return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
 
 
+UPSERT_BATCH_SIZE = 100
+
+
+def _bulk_upsert(model, key, rows):
+    """Inserts or updates model instances from dicts of field values, matched on the unique field key.
+
+    The existing rows are read in one query on key's index and written back with
+    bulk_update and bulk_create, instead of a select and a write per row. Rows that
+    haven't changed are left alone, and only the fields that changed in some row are
+    written, as bulk_update builds a CASE expression per row for every field.
+    """
+    existing = model.objects.in_bulk([row[key] for row in rows], field_name=key)
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    changed_fields = set()
+    for row in rows:
+        instance = existing.get(row[key])
+        if instance is None:
+            to_create.append(model(**row))
+            continue
+        changed = False
+        for name, value in row.items():
+            value = model._meta.get_field(name).to_python(value)
+            if getattr(instance, name) != value:
+                setattr(instance, name, value)
+                changed_fields.add(name)
+                changed = True
+        if changed:
+            # bulk_update skips auto_now, and the data version is read from updated
+            instance.updated = now
+            to_update.append(instance)
+
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(changed_fields | {'updated'}), batch_size=UPSERT_BATCH_SIZE)
+    if to_create:
+        model.objects.bulk_create(to_create, batch_size=UPSERT_BATCH_SIZE)
+    return len(to_update) + len(to_create)
+
+
 @transaction.atomic
 def update_players():
     player_table = PlayerTable()
-    for p in player_table.table:
-        Player.objects.update_or_create(
-            player_id=p['id'],
-            defaults={
-                'name': p['web_name'],
-                'name_raw': p['name_raw'],
-                'team_id': p['team'],
-                'team_code': p['team_code'],
-                'position': p['position'],
-                'assists': p['assists'],
-                'bonus': p['bonus'],
-                'bps': p['bps'],
-                'clean_sheets': p['clean_sheets'],
-                'cost_change_event': p['cost_change_event'],
-                'dreamteam_count': p['dreamteam_count'],
-                'event_points': p['event_points'],
-                'goals_conceded': p['goals_conceded'],
-                'goals_scored': p['goals_scored'],
-                'minutes': p['minutes'],
-                'own_goals': p['own_goals'],
-                'penalties_missed': p['penalties_missed'],
-                'penalties_saved': p['penalties_saved'],
-                'red_cards': p['red_cards'],
-                'saves': p['saves'],
-                'total_points': p['total_points'],
-                'transfers_in': p['transfers_in'],
-                'transfers_in_event': p['transfers_in_event'],
-                'transfers_out': p['transfers_out'],
-                'transfers_out_event': p['transfers_out_event'],
-                'yellow_cards': p['yellow_cards'],
-                'creativity': float(p['creativity']),
-                'ep_next': float(p['ep_next']),
-                'ep_this': float(p['ep_this']),
-                'form': float(p['form']),
-                'ict_index': float(p['ict_index']),
-                'influence': float(p['influence']),
-                'now_cost': float(p['now_cost']),
-                'points_per_game': float(p['points_per_game']),
-                'selected_by_percent': float(p['selected_by_percent']),
-                'threat': float(p['threat']),
-                'value_form': float(p['value_form']),
-                'value_season': float(p['value_season']),
-                'kpi': float(p['kpi']),
-                'top_50_count': int(p['top_50_count']),
-                'price_change': float(p['price_change']),
-            }
-        )
-        try:
-            Player.objects.update_or_create(
-                player_id=p['id'],
-                defaults={
-                    'team_name': p['team_name'],
-                    'team_name_short': p['team_name_short'],
-                }
-            )
-        except KeyError:
-            pass
+    gameweek_state = set_gameweek_state(player_table.events)
+    with ingest_stage('rows', len(player_table.table)):
+        rows = [_player_row(p) for p in player_table.table]
+    with ingest_stage('projection', len(rows)):
+        add_projections(rows, player_table.fixtures, gameweek_state)
+    with ingest_stage('price_tracker', len(rows)):
+        progress = record_tick(player_table.table, gameweek_state['current_event'] or 0, player_table.total_players)
+        for row in rows:
+            row['price_change'] = progress[row['player_id']]
+    # compared against the rows being replaced, so it has to happen first
+    with ingest_stage('history') as stage:
+        stage.rows = record_history(gameweek_state['current_event'] or 0, rows)
+    with ingest_stage('upsert') as stage:
+        stage.rows = _bulk_upsert(Player, 'player_id', rows)
+    with ingest_stage('fixtures_upsert') as stage:
+        stage.rows = _bulk_upsert(Fixture, 'fixture_id', [_fixture_row(f) for f in player_table.fixtures])
+    with ingest_stage('prune_solves') as stage:
+        stage.rows = prune_solves()
+
+    # the autocomplete index is derived from the Player table so rebuild it once the new data is visible
+    transaction.on_commit(rebuild_player_index)
+
+
+def _player_row(p):
+    row = {
+        'player_id': p['id'],
+        'name': p['web_name'],
+        'name_raw': p['name_raw'],
+        'team_id': p['team'],
+        'team_code': p['team_code'],
+        'position': p['position'],
+        'assists': p['assists'],
+        'bonus': p['bonus'],
+        'bps': p['bps'],
+        'clean_sheets': p['clean_sheets'],
+        'cost_change_event': p['cost_change_event'],
+        'dreamteam_count': p['dreamteam_count'],
+        'event_points': p['event_points'],
+        'goals_conceded': p['goals_conceded'],
+        'goals_scored': p['goals_scored'],
+        'minutes': p['minutes'],
+        'own_goals': p['own_goals'],
+        'penalties_missed': p['penalties_missed'],
+        'penalties_saved': p['penalties_saved'],
+        'red_cards': p['red_cards'],
+        'saves': p['saves'],
+        'total_points': p['total_points'],
+        'transfers_in': p['transfers_in'],
+        'transfers_in_event': p['transfers_in_event'],
+        'transfers_out': p['transfers_out'],
+        'transfers_out_event': p['transfers_out_event'],
+        'yellow_cards': p['yellow_cards'],
+        'creativity': float(p['creativity']),
+        'ep_next': float(p['ep_next']),
+        'chance_of_playing': p['chance_of_playing_next_round'],
+        'ep_this': float(p['ep_this']),
+        'form': float(p['form']),
+        'ict_index': float(p['ict_index']),
+        'influence': float(p['influence']),
+        'now_cost': float(p['now_cost']),
+        'points_per_game': float(p['points_per_game']),
+        'selected_by_percent': float(p['selected_by_percent']),
+        'threat': float(p['threat']),
+        'value_form': float(p['value_form']),
+        'value_season': float(p['value_season']),
+        'kpi': float(p['kpi']),
+        'top_50_count': int(p['top_50_count']),
+    }
+    # team names are only known once the Team table has been populated
+    if p.get('team_name') is not None:
+        row['team_name'] = p['team_name']
+        row['team_name_short'] = p['team_name_short']
+    return row
+
+
+# the Player fields a price tick refreshes from bootstrap-static, besides price_change
+PRICE_FIELDS = ('transfers_in', 'transfers_in_event', 'transfers_out', 'transfers_out_event', 'cost_change_event')
+
+
+@transaction.atomic
+def update_prices():
+    """Records a price tick and updates every player's transfers, price and price_change, without a full ingest.
+
+    Only bootstrap-static is fetched, so it can run far more often than update_players.
+    Players new to bootstrap-static are left for the next full ingest.
+    """
+    with ingest_stage('bootstrap_static') as stage:
+        master_table = fpl_client.get_json('bootstrap_static', PlayerTable.PLAYER_TABLE_URL)
+        stage.rows = len(master_table['elements'])
+    gameweek_state = set_gameweek_state(master_table['events'])
+    gameweek = gameweek_state['current_event'] or 0
+    with ingest_stage('price_tracker', len(master_table['elements'])):
+        progress = record_tick(master_table['elements'], gameweek, master_table.get('total_players', 0))
+
+    elements = {e['id']: e for e in master_table['elements']}
+    with ingest_stage('rows') as stage:
+        # every tracked field, so record_history can start a player's snapshots for a new gameweek
+        rows = []
+        for values in Player.objects.filter(player_id__in=list(elements)).values_list('player_id', *HISTORY_FIELDS):
+            row = dict(zip(('player_id',) + HISTORY_FIELDS, values))
+            p = elements[row['player_id']]
+            row.update({field: p[field] for field in PRICE_FIELDS})
+            row['now_cost'] = p['now_cost'] / 10
+            row['selected_by_percent'] = float(p['selected_by_percent'])
+            row['price_change'] = progress[row['player_id']]
+            rows.append(row)
+        stage.rows = len(rows)
+    with ingest_stage('history') as stage:
+        stage.rows = record_history(gameweek, rows)
+    with ingest_stage('upsert') as stage:
+        stage.rows = _bulk_upsert(Player, 'player_id', rows)
+
+    transaction.on_commit(rebuild_player_index)
+
+
+def _fixture_row(f):
+    return {
+        'fixture_id': f['id'],
+        'event': f['event'],
+        'kickoff_time': f['kickoff_time'],
+        'team_h': f['team_h'],
+        'team_a': f['team_a'],
+        'team_h_difficulty': f['team_h_difficulty'],
+        'team_a_difficulty': f['team_a_difficulty'],
+        'team_h_score': f['team_h_score'],
+        'team_a_score': f['team_a_score'],
+        'finished': f['finished'],
+    }
 
 
 @transaction.atomic
 def update_teams():
     team_table = TeamTable()
+    rows = []
     for t in team_table.table:
-        Team.objects.update_or_create(
-            team_id=t['id'],
-            defaults={
-                'team_code': t['code'],
-                'team_name': t['name'],
-                'team_name_short': t['short_name'],
-            }
-        )
-        try:
-            Team.objects.update_or_create(
-                team_id=t['id'],
-                defaults={
-                    'next_game_team_id': t['next_team_id'],
-                    'next_game_team_name': t['next_team_name'],
-                    'next_game_difficulty': t['next_team_diff'],
-                }
-            )
-        except KeyError:
-            pass
+        row = {
+            'team_id': t['id'],
+            'team_code': t['code'],
+            'team_name': t['name'],
+            'team_name_short': t['short_name'],
+        }
+        # next game details are only known once the Fixture table has been populated
+        if 'next_team_id' in t:
+            row['next_game_team_id'] = t['next_team_id']
+            row['next_game_team_name'] = t['next_team_name']
+            row['next_game_difficulty'] = t['next_team_diff']
+        rows.append(row)
+    with ingest_stage('upsert') as stage:
+        stage.rows = _bulk_upsert(Team, 'team_id', rows)
 
 
 def db_operations(request):
 
     if request.method == 'POST':
         if 'update_database' in request.POST:
-            update_players()
-            update_teams()
+            with ingest_run('players'):
+                update_players()
+            with ingest_run('teams'):
+                update_teams()
             return render(request, 'database_operations.html')
 
     return render(request, 'database_operations.html')
 
 
+def metrics(request):
+    # per-stage timings of the latest ingest runs for Prometheus to scrape
+    token = settings.METRICS_TOKEN
+    if not token:
+        # only served without a token to local development
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        return HttpResponse(status=401)
+    response = HttpResponse(prometheus_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+    patch_cache_control(response, no_store=True)
+    return response
+
+
 def landing(request):
     context = {
         'homepage': 'active',
@@ -531,24 +838,14 @@ def landing(request):
     return render(request, 'index.html', context)
 
 
-def get_bank_balance(session, account_id):
-    # gets the player's remaining bank balance
-    team_data_url = 'https://fantasy.premierleague.com/api/my-team/{0}/'.format(
-        account_id)
-    team_data_s = session.get(team_data_url).text
-    return json.loads(team_data_s)['transfers']['bank'] / 10
-
-
-def get_team(session, account_id):
-    # gets the player's team based on the provided account ID
-    team_data_url = 'https://fantasy.premierleague.com/api/my-team/{0}/'.format(
-        account_id)
-    team_data_s = session.get(team_data_url).text
-    return json.loads(team_data_s)['picks']
+def get_my_team(session, account_id):
+    # gets the player's team (picks) and transfer info (bank balance) based on the provided account ID
+    team_data_url = settings.FPL_API_URL + '/api/my-team/{0}/'.format(account_id)
+    return fpl_client.get_json('my_team', team_data_url, session=session)
 
 
 def get_unique_account_id(session):
-    data = json.loads(session.get('https://fantasy.premierleague.com/api/me/').text)
+    data = fpl_client.get_json('me', settings.FPL_API_URL + '/api/me/', session=session)
     return data['player']['entry']
 
 
@@ -557,9 +854,8 @@ def log_into_fpl(session, username, password):
         'login': username,
         'password': password,
         'app': 'plfpl-web',
-        'redirect_uri': 'https://fantasy.premierleague.com/a/login'
+        'redirect_uri': settings.FPL_API_URL + '/a/login'
     }
 
-    login_url = 'https://users.premierleague.com/accounts/login/'
-    login_status = session.post(login_url, data=payload)
+    login_status = fpl_client.post('login', settings.FPL_LOGIN_URL, session=session, data=payload)
     return login_status, session
@@ -0,0 +1,120 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connections
+
+from .timing import RequestProfile, activate_profile, current_profile, track_queries
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # spawned workers start with a fresh interpreter, so Django has to be set up before they import any models
+    import django
+    django.setup()
+
+
+def simulation_pool():
+    """Returns the process pool for the optimiser, or None if SIMULATION_WORKERS is 0."""
+    global _pool
+    if not settings.SIMULATION_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork, a forked child would share the parent's database connection
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.SIMULATION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def shutdown_simulation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _profiled_call(func, args, kwargs):
+    # runs in a worker, the work done there is sent back to be added to the request's profile
+    profile = RequestProfile()
+    with activate_profile(profile), track_queries(profile):
+        result = func(*args, **kwargs)
+    return result, profile.components
+
+
+def run_cpu_bound(func, *args, **kwargs):
+    """Calls func in the simulation pool and waits for its result.
+
+    func and its arguments must be picklable. Falls back to calling func in the current
+    thread when the pool is disabled, or once if a worker died and took the pool with it.
+    """
+    pool = simulation_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+    profile = current_profile()
+    try:
+        if profile is None:
+            return pool.submit(func, *args, **kwargs).result()
+        result, components = pool.submit(_profiled_call, func, args, kwargs).result()
+        profile.merge(components)
+        return result
+    except BrokenProcessPool:
+        logger.exception('Simulation pool broke, restarting it')
+        shutdown_simulation_pool()
+        return func(*args, **kwargs)
+
+
+def map_cpu_bound(func, calls):
+    """Calls func(*args) for each args in calls across the simulation pool and returns the results in order.
+
+    Like run_cpu_bound, but the calls run at the same time, one per free worker. Runs them
+    one after another in the current thread when the pool is disabled or broken.
+    """
+    calls = list(calls)
+    pool = simulation_pool()
+    if pool is None:
+        return [func(*args) for args in calls]
+    profile = current_profile()
+    try:
+        if profile is None:
+            return [future.result() for future in [pool.submit(func, *args) for args in calls]]
+        results = []
+        for future in [pool.submit(_profiled_call, func, args, {}) for args in calls]:
+            result, components = future.result()
+            profile.merge(components)
+            results.append(result)
+        return results
+    except BrokenProcessPool:
+        logger.exception('Simulation pool broke, restarting it')
+        shutdown_simulation_pool()
+        return [func(*args) for args in calls]
+
+
+def _closing_connections(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+class ClosingThreadPoolExecutor(ThreadPoolExecutor):
+    """A thread pool for calls made outside the request cycle, which close the database connections they open.
+
+    Django only closes a thread's connections when a request it serves finishes, so a pool
+    thread reading the database (e.g. the upstream cache's DatabaseCache) would otherwise
+    hold a connection open for as long as the process lives.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(_closing_connections, fn, args, kwargs)